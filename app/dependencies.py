@@ -1,33 +1,26 @@
 """Shared application dependencies."""
-from functools import lru_cache
+from typing import Iterator
 
 # Absolute import from project root
+from inference.florence.florence_service import Florence2InferenceService
+from inference.registry.model_residency import residency
+from inference.registry.model_types import ModelType
 from inference.rexomni.rexomni_service import RexOmniService
 
 
-@lru_cache(maxsize=1)
-def get_rexomni_service() -> RexOmniService:
-    """Return a single RexOmniService instance for reuse across requests."""
-    return RexOmniService(
-        model_path="IDEA-Research/Rex-Omni",
-        use_awq=False,
-        cache_dir=None,
-    )
-
-
-"""Shared application dependencies."""
-from functools import lru_cache
-
-from inference.florence.florence_service import Florence2InferenceService
+def get_rexomni_service() -> Iterator[RexOmniService]:
+    """
+    Yield the process-wide RexOmniService.
+    The model stays referenced for the lifetime of the request.
+    """
+    with residency.use(ModelType.REXOMNI) as adapter:
+        yield adapter.service
 
 
-@lru_cache(maxsize=1)
-def get_florence_service() -> Florence2InferenceService:
+def get_florence_service() -> Iterator[Florence2InferenceService]:
     """
-    Return a single Florence-2 service instance
-    reused across all requests.
+    Yield the Florence-2 service shared with the job runner.
+    The model stays referenced for the lifetime of the request.
     """
-    return Florence2InferenceService(
-        model_name="microsoft/Florence-2-large",
-        device="cuda",  # or "cpu" if needed
-    )
+    with residency.use(ModelType.FLORENCE) as adapter:
+        yield adapter.service
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -5,7 +7,19 @@ from app.routers.rexomni_endpoints import router as rexomni_router
 from app.routers.florence_endpoints import router as florence_router
 #from app.health import router as health_router
 from app.routers.jobs import router as jobs_router
+from app.routers.models import router as models_router
+from app.routers.datasets import router as datasets_router
+from app.routers.renders import router as renders_router
+from app.services.job_manager import ARTIFACT_ROOT, job_store, recover_jobs
+from app.services.job_store import start_janitor
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Once per worker: fail the jobs of dead workers, then keep the store tidy
+    recover_jobs()
+    start_janitor(job_store, ARTIFACT_ROOT)
+    yield
 
 
 app = FastAPI(
@@ -17,6 +31,7 @@ app = FastAPI(
         "Model selection is handled at the application layer."
     ),
     version="2.0",
+    lifespan=lifespan,
 )
 
 # -----------------------------
@@ -36,6 +51,9 @@ app.add_middleware(
 app.include_router(rexomni_router)
 app.include_router(florence_router)
 app.include_router(jobs_router)
+app.include_router(models_router)
+app.include_router(datasets_router)
+app.include_router(renders_router)
 #app.include_router(health_router)
 
 
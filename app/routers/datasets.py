@@ -0,0 +1,92 @@
+# app/routers/datasets.py
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.services.dataset_jobs import DATASET_TASK, cancel_dataset_job, submit_dataset_job
+from app.services.job_manager import get_job
+from app.services.job_scheduler import QueueFullError
+from inference.florence.generation_profiles import PROFILES
+from inference.registry.model_registry import ModelRegistry, TaskType, ModelType
+
+router = APIRouter(prefix="/api/datasets", tags=["Datasets"])
+
+
+class ManifestEntry(BaseModel):
+    path: str
+    category: str | None = None
+
+
+class DatasetJobRequest(BaseModel):
+    task: str
+    model: str
+    output_dir: str
+    directory: str | None = None
+    manifest: list[ManifestEntry] | None = None
+    # Fixed categories for every image; defaults to the class folder name
+    categories: list[str] | None = None
+    text_input: str | None = None
+    visualize: bool = False
+    # Florence generation profile (fast | quality); default per task
+    profile: str | None = None
+
+
+@router.post("")
+def create_dataset_job(request: DatasetJobRequest):
+    try:
+        task_enum = TaskType(request.task.lower())
+        model_enum = ModelType(request.model.lower())
+    except ValueError:
+        raise HTTPException(400, detail="Invalid task or model")
+
+    allowed_models, _ = ModelRegistry().get_task_config(task_enum)
+    if model_enum not in allowed_models:
+        raise HTTPException(400, detail="Model not supported for task")
+
+    if request.profile is not None and (model_enum != ModelType.FLORENCE or request.profile not in PROFILES):
+        raise HTTPException(400, detail=f"profile must be one of {sorted(PROFILES)} and needs the florence model")
+
+    if not request.directory and not request.manifest:
+        raise HTTPException(400, detail="Either directory or manifest is required")
+
+    config = request.model_dump()
+    config["task"] = task_enum.value
+    config["model"] = model_enum.value
+    if request.manifest:
+        config["manifest"] = [entry.model_dump() for entry in request.manifest]
+
+    try:
+        job = submit_dataset_job(config)
+    except QueueFullError as exc:
+        raise HTTPException(429, detail=str(exc), headers={"Retry-After": "5"})
+    except (ValueError, OSError) as exc:
+        raise HTTPException(400, detail=str(exc))
+
+    return {"job_id": job["id"], "total": job["dataset"]["total"], "queue_position": job["queue_position"]}
+
+
+def _get_dataset_job(job_id: str) -> dict:
+    job = get_job(job_id)
+    if not job or job["task"] != DATASET_TASK:
+        raise HTTPException(404, detail="Dataset job not found")
+    return job
+
+
+@router.get("/{job_id}")
+def read_dataset_job(job_id: str):
+    job = _get_dataset_job(job_id)
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "dataset": job.get("dataset"),
+        "result": job["result"],
+    }
+
+
+@router.post("/{job_id}/cancel")
+def cancel_dataset(job_id: str):
+    _get_dataset_job(job_id)
+    if not cancel_dataset_job(job_id):
+        raise HTTPException(409, detail="Dataset job is not running")
+    return {"id": job_id, "cancelling": True}
@@ -2,40 +2,126 @@ from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 import io
 import json
+import os
+import zipfile
+from pathlib import Path
 from typing import List, Union
 
 from app.dependencies import get_florence_service
+from app.services.inference_executor import QUEUE_WAIT_HEADER, inference_executor
+from app.services.job_scheduler import QueueFullError
+from app.services.responses import RESPONSE_MODE_FORM, FastJSONResponse, check_mode, result_response
 from inference.florence.florence_service import Florence2InferenceService
+from inference.florence.generation_profiles import PROFILES
+from inference.image_ingest import ImageIngestError, probe
+
+PROFILE_FORM = "Generation profile: fast | quality (default chosen per task)"
+BATCH_FORMAT_FORM = "Several files: json (results array) | zip (overlays + results.json); default zip when visualizing"
+BATCH_FORMATS = ("json", "zip")
+# Uploads accepted by one request
+MAX_FILES = int(os.getenv("FLORENCE_MAX_FILES", "64"))
 
 router = APIRouter(prefix="/vision/florence", tags=["florence"])
 
 
-def _run_task(
+async def _infer(fn, *args, **kwargs):
+    """
+    Run a blocking Florence call on the model's inference executor, keeping
+    the event loop free. Returns (result, queue wait in ms).
+    """
+    try:
+        return await inference_executor.run("florence", fn, *args, **kwargs)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "5"})
+
+
+async def _run_task(
     service: Florence2InferenceService,
     image_bytes: bytes,
     task_name: str,
     text_input: Union[str, None] = None,
     visualize: bool = True,
+    profile: Union[str, None] = None,
+    response_mode: str = "multipart",
 ):
     """
-    Run a single task and return either StreamingResponse (if image) or JSON results.
+    Run a single task; the results and rendered image (if any) are sent as
+    `response_mode` (see app.services.responses).
     """
-    result = service.run_task_from_bytes(
+    result, wait_ms = await _infer(
+        service.run_task_from_bytes,
         image_bytes=image_bytes,
         task_name=task_name,
         text_input=text_input,
         visualize=visualize,
+        profile=profile,
+    )
+    cache = result.get("cache", "miss")
+    return result_response(
+        response_mode,
+        {"results": result["results"], "cache": cache},
+        result["image_bytes"] if visualize else None,
+        "image/png",
+        legacy_header="X-Florence-Results",
+        headers={"X-Cache": cache, QUEUE_WAIT_HEADER: f"{wait_ms:.1f}"},
     )
 
-    # Stream image if exists
-    if result.get("image_bytes") and visualize:
-        headers = {"X-Florence-Results": json.dumps(result["results"])}
+
+def _zip_results(names: List[str], outputs: List[dict]) -> io.BytesIO:
+    """Overlays as NNN_<name>.png plus results.json, in upload order."""
+    buffer = io.BytesIO()
+    # PNGs are already compressed
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        entries = []
+        for index, (name, output) in enumerate(zip(names, outputs)):
+            entry = {"filename": name, "results": output["results"], "cache": output.get("cache", "miss")}
+            if output.get("image_bytes"):
+                entry["overlay"] = f"{index:03d}_{Path(name).stem}.png"
+                archive.writestr(entry["overlay"], output["image_bytes"])
+            entries.append(entry)
+        archive.writestr("results.json", json.dumps(entries))
+    buffer.seek(0)
+    return buffer
+
+
+async def _run_task_batch(
+    service: Florence2InferenceService,
+    names: List[str],
+    images_bytes: List[bytes],
+    task_name: str,
+    text_input: Union[str, None] = None,
+    visualize: bool = True,
+    profile: Union[str, None] = None,
+    batch_format: Union[str, None] = None,
+):
+    """
+    Run a task over several images in one batched model call and return a
+    JSON array of results or a zip of overlays.
+    """
+    batch_format = batch_format or ("zip" if visualize else "json")
+    outputs, wait_ms = await _infer(
+        service.run_task_batch_from_bytes,
+        images_bytes,
+        task_name=task_name,
+        text_input=text_input,
+        visualize=visualize and batch_format == "zip",
+        profile=profile,
+    )
+    wait_header = {QUEUE_WAIT_HEADER: f"{wait_ms:.1f}"}
+
+    if batch_format == "zip":
         return StreamingResponse(
-            io.BytesIO(result["image_bytes"]),
-            media_type="image/png",
-            headers=headers,
+            _zip_results(names, outputs),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="florence_results.zip"', **wait_header},
         )
-    return {"results": result["results"]}
+    return FastJSONResponse(
+        [
+            {"filename": name, "results": output["results"], "cache": output.get("cache", "miss")}
+            for name, output in zip(names, outputs)
+        ],
+        headers=wait_header,
+    )
 
 
 async def _process_files(
@@ -44,15 +130,49 @@ async def _process_files(
     task_name: str,
     text_input: Union[str, None] = None,
     visualize: bool = True,
+    profile: Union[str, None] = None,
+    batch_format: Union[str, None] = None,
+    response_mode: Union[str, None] = None,
 ):
     """
     Batch processing: supports single or multiple files.
     """
-    responses = []
-    for file in files:
+    if profile is not None and profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Invalid profile; expected one of {sorted(PROFILES)}")
+    if batch_format is not None and batch_format not in BATCH_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid batch_format; expected one of {list(BATCH_FORMATS)}")
+    try:
+        response_mode = check_mode(response_mode)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if len(files) > MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_FILES} files per request")
+
+    if len(files) == 1:
+        try:
+            return await _run_task(
+                service, await files[0].read(), task_name, text_input, visualize, profile, response_mode
+            )
+        except ImageIngestError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=f"{files[0].filename}: {exc}")
+
+    # Reject the whole batch up front on a bad upload (header check only)
+    names, images_bytes = [], []
+    for index, file in enumerate(files):
         image_bytes = await file.read()
-        responses.append(_run_task(service, image_bytes, task_name, text_input, visualize))
-    return responses if len(responses) > 1 else responses[0]
+        try:
+            probe(image_bytes)
+        except ImageIngestError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=f"{file.filename}: {exc}")
+        names.append(file.filename or f"image_{index}")
+        images_bytes.append(image_bytes)
+
+    try:
+        return await _run_task_batch(
+            service, names, images_bytes, task_name, text_input, visualize, profile, batch_format
+        )
+    except ImageIngestError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
 
 
 # -----------------------------
@@ -62,30 +182,48 @@ async def _process_files(
 async def caption(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Caption", visualize=visualize)
+    return await _process_files(
+        service, files, "Caption", visualize=visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/caption_detailed")
 async def caption_detailed(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Detailed Caption", visualize=visualize)
+    return await _process_files(
+        service, files, "Detailed Caption", visualize=visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/caption_more_detailed")
 async def caption_more_detailed(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "More Detailed Caption", visualize=visualize)
+    return await _process_files(
+        service, files, "More Detailed Caption", visualize=visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 # -----------------------------
@@ -96,10 +234,16 @@ async def caption_grounding(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     text_input: str = Form(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Caption + Grounding", text_input, visualize)
+    return await _process_files(
+        service, files, "Caption + Grounding", text_input, visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/caption_grounding_detailed")
@@ -107,10 +251,16 @@ async def caption_grounding_detailed(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     text_input: str = Form(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Detailed Caption + Grounding", text_input, visualize)
+    return await _process_files(
+        service, files, "Detailed Caption + Grounding", text_input, visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/caption_grounding_more_detailed")
@@ -118,10 +268,16 @@ async def caption_grounding_more_detailed(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     text_input: str = Form(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "More Detailed Caption + Grounding", text_input, visualize)
+    return await _process_files(
+        service, files, "More Detailed Caption + Grounding", text_input, visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/caption_to_phrase_grounding")
@@ -129,10 +285,16 @@ async def caption_to_phrase_grounding(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     text_input: str = Form(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Caption to Phrase Grounding", text_input, visualize)
+    return await _process_files(
+        service, files, "Caption to Phrase Grounding", text_input, visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 # -----------------------------
@@ -142,10 +304,16 @@ async def caption_to_phrase_grounding(
 async def object_detection(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Object Detection", visualize=visualize)
+    return await _process_files(
+        service, files, "Object Detection", visualize=visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/open_vocab_detection")
@@ -153,10 +321,16 @@ async def open_vocab_detection(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     text_input: str = Form(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Open Vocabulary Detection", text_input, visualize)
+    return await _process_files(
+        service, files, "Open Vocabulary Detection", text_input, visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 # -----------------------------
@@ -167,10 +341,16 @@ async def referring_expression_segmentation(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     text_input: str = Form(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Referring Expression Segmentation", text_input, visualize)
+    return await _process_files(
+        service, files, "Referring Expression Segmentation", text_input, visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/region_segmentation")
@@ -178,10 +358,16 @@ async def region_segmentation(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     text_input: str = Form(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Region to Segmentation", text_input, visualize)
+    return await _process_files(
+        service, files, "Region to Segmentation", text_input, visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 # -----------------------------
@@ -192,10 +378,16 @@ async def region_category(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     text_input: str = Form(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Region to Category", text_input, visualize)
+    return await _process_files(
+        service, files, "Region to Category", text_input, visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/region_description")
@@ -203,30 +395,48 @@ async def region_description(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     text_input: str = Form(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Region to Description", text_input, visualize)
+    return await _process_files(
+        service, files, "Region to Description", text_input, visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/region_proposal")
 async def region_proposal(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Region Proposal", visualize=visualize)
+    return await _process_files(
+        service, files, "Region Proposal", visualize=visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/dense_region_caption")
 async def dense_region_caption(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "Dense Region Caption", visualize=visualize)
+    return await _process_files(
+        service, files, "Dense Region Caption", visualize=visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 # -----------------------------
@@ -236,17 +446,64 @@ async def dense_region_caption(
 async def ocr(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "OCR", visualize=visualize)
+    return await _process_files(
+        service, files, "OCR", visualize=visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
 
 
 @router.post("/ocr_with_region")
 async def ocr_with_region(
     file: Union[UploadFile, List[UploadFile]] = File(...),
     visualize: bool = Form(True),
+    batch_format: Union[str, None] = Form(None, description=BATCH_FORMAT_FORM),
+    response_mode: Union[str, None] = Form(None, description=RESPONSE_MODE_FORM),
+    profile: Union[str, None] = Form(None, description=PROFILE_FORM),
     service: Florence2InferenceService = Depends(get_florence_service),
 ):
     files = file if isinstance(file, list) else [file]
-    return await _process_files(service, files, "OCR with Region", visualize=visualize)
+    return await _process_files(
+        service, files, "OCR with Region", visualize=visualize, profile=profile,
+        batch_format=batch_format, response_mode=response_mode,
+    )
+
+
+# -----------------------------
+# Multi-task (one image, many prompts)
+# -----------------------------
+@router.post("/multi_task")
+async def multi_task(
+    file: UploadFile = File(...),
+    tasks: str = Form(..., description='JSON list, e.g. [{"task": "Caption"}, {"task": "Open Vocabulary Detection", "text_input": "person"}]'),
+    service: Florence2InferenceService = Depends(get_florence_service),
+):
+    """
+    Run several Florence tasks on one image.
+    The image is decoded and encoded once; every task reuses the vision features.
+    """
+    try:
+        task_specs = json.loads(tasks)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="tasks must be valid JSON")
+
+    if not isinstance(task_specs, list) or not all(isinstance(t, dict) and "task" in t for t in task_specs):
+        raise HTTPException(status_code=400, detail='tasks must be a list of {"task": ..., "text_input": ...}')
+
+    image_bytes = await file.read()
+    try:
+        outputs, wait_ms = await _infer(service.run_tasks_from_bytes, image_bytes, task_specs, visualize=False)
+    except ImageIngestError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    return FastJSONResponse(
+        {"results": [{"task": o["task"], "results": o["results"]} for o in outputs]},
+        headers={QUEUE_WAIT_HEADER: f"{wait_ms:.1f}"},
+    )
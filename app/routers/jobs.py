@@ -1,10 +1,22 @@
 # app/routers/jobs.py
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse
-from pathlib import Path
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
 
-from app.services.job_runner import submit_job
-from app.services.job_manager import get_job
+from app.services.job_events import job_events
+from app.services.job_runner import submit_job, submit_multi_job
+from app.services.job_manager import ARTIFACT_ROOT, MULTI_TASK, get_job
+from app.services.job_scheduler import QueueFullError, scheduler
+from app.services.job_store import FINISHED_STATES
+from app.services.overlays import is_overlay, overlay_cache
+from inference.florence.generation_profiles import PROFILES
+from inference.image_ingest import ImageIngestError
 from inference.registry.model_registry import (
     ModelRegistry,
     TaskType,
@@ -12,8 +24,6 @@ from inference.registry.model_registry import (
     TASK_INPUTS,
 )
 
-ARTIFACT_ROOT = Path("job_artifacts")
-
 router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
 
 
@@ -25,28 +35,123 @@ def get_available_tasks(model: str = "florence"):
         raise HTTPException(400, detail="Invalid model")
 
     registry = ModelRegistry()
-    supported = registry.adapters[model_enum].supported_tasks()
+    try:
+        supported = registry.supported_tasks(model_enum)
+    except ValueError:
+        raise HTTPException(400, detail="Model not enabled")
 
     return {
         "tasks": [t.value for t in supported],
         "required_inputs": {
             t.value: TASK_INPUTS.get(t, []) for t in supported
         },
+        "profiles": sorted(PROFILES) if model_enum == ModelType.FLORENCE else [],
     }
 
 
+def _check_profile(profile: str | None, model: ModelType):
+    if profile is None:
+        return
+    if model != ModelType.FLORENCE:
+        raise HTTPException(400, detail="profile is only supported by the florence model")
+    if profile not in PROFILES:
+        raise HTTPException(400, detail=f"Invalid profile; expected one of {sorted(PROFILES)}")
+
+
+# RexOmni inputs each task accepts (see the /vision/rexomni routes)
+REXOMNI_TASK_PARAMS = {
+    TaskType.DETECTION: {"categories"},
+    TaskType.OCR: set(),
+    TaskType.VISUAL_PROMPTING: {"categories", "visual_prompt_boxes"},
+    TaskType.KEYPOINT: {"categories", "keypoint_type"},
+    TaskType.DETECTION_KEYPOINT: {"categories", "keypoint_type", "crop_padding", "max_boxes"},
+}
+REXOMNI_PARAMS = ("categories", "visual_prompt_boxes", "keypoint_type", "crop_padding", "max_boxes")
+
+
+def _split_categories(value):
+    """Category names from repeated fields and/or comma-separated ones ("person,car")."""
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise HTTPException(400, detail="categories must be a list of names")
+    return [name.strip() for v in value for name in v.split(",") if name.strip()]
+
+
+def _rexomni_params(task: TaskType, model: ModelType, values: dict) -> dict:
+    """
+    Validate the RexOmni inputs given for `task` and return the ones to put
+    in the job params. `visual_prompt_boxes` may be a JSON string (form field),
+    `categories` comma-separated names. Florence tasks ignore `categories`,
+    as they always have (the web UI sends it for detection tasks).
+    """
+    values = dict(values)
+    if model != ModelType.REXOMNI:
+        values.pop("categories", None)
+    elif values.get("categories") is not None:
+        values["categories"] = _split_categories(values["categories"])
+
+    given = {name: values[name] for name in REXOMNI_PARAMS if values.get(name) not in (None, [], "")}
+    if given and model != ModelType.REXOMNI:
+        raise HTTPException(400, detail=f"{', '.join(given)} only supported by the rexomni model")
+
+    unexpected = set(given) - REXOMNI_TASK_PARAMS.get(task, set())
+    if unexpected:
+        raise HTTPException(400, detail=f"{task.value} does not take {', '.join(sorted(unexpected))}")
+
+    boxes = given.get("visual_prompt_boxes")
+    if isinstance(boxes, str):
+        try:
+            boxes = json.loads(boxes)
+        except ValueError:
+            raise HTTPException(400, detail="visual_prompt_boxes must be valid JSON")
+    if task == TaskType.VISUAL_PROMPTING:
+        if not boxes:
+            raise HTTPException(400, detail="visual_prompt_boxes is required")
+        if not isinstance(boxes, list) or not all(
+            isinstance(box, list) and len(box) == 4 and all(isinstance(v, (int, float)) for v in box)
+            for box in boxes
+        ):
+            raise HTTPException(400, detail="Each visual_prompt_box must be [x0, y0, x1, y1]")
+        given["visual_prompt_boxes"] = boxes
+
+    if "keypoint_type" in given and not isinstance(given["keypoint_type"], str):
+        raise HTTPException(400, detail="keypoint_type must be a string")
+    if "crop_padding" in given:
+        padding = given["crop_padding"]
+        if not isinstance(padding, (int, float)) or not 0.0 <= padding <= 1.0:
+            raise HTTPException(400, detail="crop_padding must be between 0 and 1")
+    if "max_boxes" in given:
+        if not isinstance(given["max_boxes"], int) or given["max_boxes"] < 1:
+            raise HTTPException(400, detail="max_boxes must be a positive integer")
+
+    return given
+
+
+@router.get("/queue")
+def get_queue_stats():
+    return {"lanes": scheduler.stats()}
+
+
 @router.post("")
 async def create_job(
     file: UploadFile = File(...),
     task: str = Form(...),
     model: str = Form(...),
     text_input: str | None = Form(None),
+    profile: str | None = Form(None, description="Generation profile (florence): fast | quality; default per task"),
+    categories: list[str] | None = Form(None, description="rexomni: detection, visual_prompting, keypoint, detection_keypoint"),
+    visual_prompt_boxes: str | None = Form(None, description="rexomni visual_prompting: JSON list of [x0, y0, x1, y1]"),
+    keypoint_type: str | None = Form(None, description="rexomni keypoint tasks: human_pose | hand | animal"),
+    crop_padding: float | None = Form(None, description="rexomni detection_keypoint: padding around each box (0-1)"),
+    max_boxes: int | None = Form(None, description="rexomni detection_keypoint: most boxes sent to the keypoint pass"),
 ):
     try:
         task_enum = TaskType(task.lower())
         model_enum = ModelType(model.lower())
     except ValueError:
         raise HTTPException(400, detail="Invalid task or model")
+    _check_profile(profile, model_enum)
 
     registry = ModelRegistry()
     allowed_models, required_args = registry.get_task_config(task_enum)
@@ -57,33 +162,120 @@ async def create_job(
     if "text_input" in required_args and not text_input:
         raise HTTPException(400, detail="text_input is required")
 
+    rexomni_params = _rexomni_params(task_enum, model_enum, {
+        "categories": categories,
+        "visual_prompt_boxes": visual_prompt_boxes,
+        "keypoint_type": keypoint_type,
+        "crop_padding": crop_padding,
+        "max_boxes": max_boxes,
+    })
+
     image_bytes = await file.read()
 
-    job = submit_job(
-        task=task_enum.value,
-        model=model_enum.value,
-        image_bytes=image_bytes,
-        params={
-            "text_input": text_input,
-            "visualize": True,
-        },
-    )
+    # Overlays are rendered on demand (GET .../artifacts/overlay)
+    params = {
+        "text_input": text_input,
+        "visualize": False,
+    }
+    if profile is not None:
+        params["profile"] = profile
+    params.update(rexomni_params)
 
-    return {"job_id": job["id"]}
+    try:
+        job = submit_job(
+            task=task_enum.value,
+            model=model_enum.value,
+            image_bytes=image_bytes,
+            params=params,
+        )
+    except QueueFullError as exc:
+        raise HTTPException(
+            429,
+            detail=str(exc),
+            headers={"Retry-After": "5"},
+        )
+    except ImageIngestError as exc:
+        raise HTTPException(exc.status_code, detail=str(exc))
 
+    return {"job_id": job["id"], "queue_position": job["queue_position"]}
 
-@router.get("/{job_id}")
-def read_job(job_id: str):
-    job = get_job(job_id)
-    if not job:
-        raise HTTPException(404, detail="Job not found")
 
-    # Include artifact info dynamically
-    job_dir = ARTIFACT_ROOT / job_id
-    artifacts = []
-    for name in ["overlay", "mask"]:
-        if (job_dir / f"{name}.png").exists():
-            artifacts.append(name)
+@router.post("/multi")
+async def create_multi_job(
+    file: UploadFile = File(...),
+    model: str = Form(...),
+    tasks: str = Form(..., description='JSON list, e.g. [{"task": "caption"}, {"task": "open_vocab_detection", "text_input": "person"}]; rexomni tasks also take categories, visual_prompt_boxes, keypoint_type, crop_padding, max_boxes'),
+    profile: str | None = Form(None, description="Generation profile for every task (florence); a task's own \"profile\" wins"),
+):
+    try:
+        model_enum = ModelType(model.lower())
+        task_specs = json.loads(tasks)
+    except ValueError:
+        raise HTTPException(400, detail="Invalid model or tasks JSON")
+    _check_profile(profile, model_enum)
+
+    if not isinstance(task_specs, list) or not task_specs:
+        raise HTTPException(400, detail="tasks must be a non-empty list")
+
+    registry = ModelRegistry()
+    normalized_specs = []
+    for spec in task_specs:
+        if not isinstance(spec, dict) or "task" not in spec:
+            raise HTTPException(400, detail='Each task must be {"task": ..., "text_input": ...}')
+        try:
+            task_enum = TaskType(str(spec["task"]).lower())
+        except ValueError:
+            raise HTTPException(400, detail=f"Invalid task {spec['task']}")
+
+        allowed_models, required_args = registry.get_task_config(task_enum)
+        if model_enum not in allowed_models:
+            raise HTTPException(400, detail=f"Model not supported for task {task_enum.value}")
+        if "text_input" in required_args and not spec.get("text_input"):
+            raise HTTPException(400, detail=f"text_input is required for task {task_enum.value}")
+
+        normalized = {"task": task_enum.value, "text_input": spec.get("text_input")}
+        task_profile = spec.get("profile", profile)
+        _check_profile(task_profile, model_enum)
+        if task_profile is not None:
+            normalized["profile"] = task_profile
+        normalized.update(_rexomni_params(task_enum, model_enum, spec))
+        normalized_specs.append(normalized)
+
+    image_bytes = await file.read()
+
+    try:
+        job = submit_multi_job(
+            model=model_enum.value,
+            image_bytes=image_bytes,
+            tasks=normalized_specs,
+        )
+    except QueueFullError as exc:
+        raise HTTPException(
+            429,
+            detail=str(exc),
+            headers={"Retry-After": "5"},
+        )
+    except ImageIngestError as exc:
+        raise HTTPException(exc.status_code, detail=str(exc))
+
+    return {"job_id": job["id"], "queue_position": job["queue_position"]}
+
+
+# Seconds between keep-alives on idle event streams
+EVENT_HEARTBEAT = 15.0
+
+
+def _job_view(job: dict) -> dict:
+    """Public job status. Artifacts come from the job record, not the filesystem."""
+    # Queue metrics for the lane this job runs on
+    lane = scheduler.stats(job["model"])
+    queue_position = scheduler.position(job["model"], job["id"]) if job["status"] == "queued" else None
+    if job["wait_time"] is not None:
+        wait_time = job["wait_time"]
+    elif job["status"] == "queued":
+        wait_time = time.time() - job["created_at"]
+    else:
+        wait_time = None
 
     return {
         "id": job["id"],
@@ -91,35 +283,245 @@ def read_job(job_id: str):
         "progress": job["progress"],
         "error": job["error"],
         "has_result": job["status"] == "completed",
-        "artifacts": artifacts,
+        "artifacts": job.get("artifacts") or [],
+        "queue_position": queue_position,
+        "queue_depth": lane["queue_depth"],
+        "wait_time": round(wait_time, 3) if wait_time is not None else None,
+        "avg_wait_time": lane["avg_wait_seconds"],
+        "tasks": job.get("tasks"),
+        "generation": job.get("generation"),
     }
 
 
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\nid: {event.get('seq', 0)}\ndata: {json.dumps(event)}\n\n"
+
+
+def _snapshot(job_id: str) -> dict:
+    job = get_job(job_id)
+    if job is None:
+        return {"type": "error", "job_id": job_id, "detail": "Job not found"}
+    return {"type": "snapshot", "job_id": job_id, **_job_view(job)}
+
+
+def _is_final(event: dict) -> bool:
+    if event["type"] == "error":
+        return True
+    return event["type"] in ("state", "snapshot") and event["status"] in FINISHED_STATES
+
+
+async def _event_stream(request: Request, job_ids: list[str] | None):
+    """
+    SSE body: a snapshot per followed job, then live events. Ends once every
+    followed job has finished; with no job ids it follows all jobs forever.
+    """
+    # Subscribe before the snapshot so nothing between the two is lost
+    subscription = job_events.subscribe(job_ids)
+    try:
+        open_jobs = set()
+        for job_id in job_ids or []:
+            # Job store reads block; keep them off the event loop
+            event = await run_in_threadpool(_snapshot, job_id)
+            yield _sse(event)
+            if not _is_final(event):
+                open_jobs.add(job_id)
+        if job_ids is not None and not open_jobs:
+            return
+
+        while not await request.is_disconnected():
+            event = await subscription.get(EVENT_HEARTBEAT)
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(event)
+            if job_ids is not None and _is_final(event):
+                open_jobs.discard(event["job_id"])
+                if not open_jobs:
+                    return
+    finally:
+        job_events.unsubscribe(subscription)
+
+
+def _sse_response(request: Request, job_ids: list[str] | None) -> StreamingResponse:
+    return StreamingResponse(
+        _event_stream(request, job_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/events")
+async def stream_jobs(
+    request: Request,
+    ids: str | None = Query(None, description="Comma-separated job ids; omit to follow every job"),
+):
+    """Multiplexed Server-Sent Events stream for many jobs at once."""
+    job_ids = [job_id for job_id in ids.split(",") if job_id] if ids else None
+    return _sse_response(request, job_ids)
+
+
+def _message_ids(message: dict, key: str) -> list[str]:
+    ids = message.get(key, [])
+    if not isinstance(ids, list) or not all(isinstance(job_id, str) for job_id in ids):
+        raise ValueError(f"{key} must be a list of job ids")
+    return ids
+
+
+@router.websocket("/ws")
+async def jobs_socket(websocket: WebSocket, ids: str | None = None):
+    """
+    WebSocket variant of /events. Send {"subscribe": [...]} or
+    {"unsubscribe": [...]} at any time; the socket stays open until the client
+    closes it. A malformed message is answered with an "error" event.
+    """
+    await websocket.accept()
+    subscription = job_events.subscribe(set())
+
+    async def _follow(job_ids):
+        for job_id in job_ids:
+            job_events.follow(subscription, job_id)
+            subscription.put(await run_in_threadpool(_snapshot, job_id))
+
+    async def _handle(text: str):
+        try:
+            message = json.loads(text)
+            if not isinstance(message, dict):
+                raise ValueError("message must be a JSON object")
+            subscribe = _message_ids(message, "subscribe")
+            unsubscribe = _message_ids(message, "unsubscribe")
+        except ValueError as exc:
+            await websocket.send_json({"type": "error", "detail": f"Invalid message: {exc}"})
+            return
+        await _follow(subscribe)
+        for job_id in unsubscribe:
+            job_events.unfollow(subscription, job_id)
+
+    await _follow([job_id for job_id in (ids or "").split(",") if job_id])
+    # Wait on the client and the event queue together, whichever comes first
+    receiver = asyncio.create_task(websocket.receive_text())
+    next_event = asyncio.create_task(subscription.get(EVENT_HEARTBEAT))
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiver, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                await _handle(receiver.result())
+                receiver = asyncio.create_task(websocket.receive_text())
+            if next_event in done:
+                event = next_event.result()
+                await websocket.send_json(event if event is not None else {"type": "ping"})
+                next_event = asyncio.create_task(subscription.get(EVENT_HEARTBEAT))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        next_event.cancel()
+        job_events.unsubscribe(subscription)
+
+
+@router.get("/{job_id}")
+def read_job(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(404, detail="Job not found")
+    return _job_view(job)
+
+
+@router.get("/{job_id}/events")
+async def stream_job(job_id: str, request: Request):
+    """Server-Sent Events for one job: state, progress, task and artifact events."""
+    if not await run_in_threadpool(get_job, job_id):
+        raise HTTPException(404, detail="Job not found")
+    return _sse_response(request, [job_id])
+
+
+# Inline base64 fields written by older versions; stripped from results
+LEGACY_BINARY_FIELDS = ("image_bytes", "mask_bytes")
+
+
+def _compact(result):
+    """Result without embedded binaries (multi-task results nest one level)."""
+    if not isinstance(result, dict):
+        return result
+    result = {k: v for k, v in result.items() if k not in LEGACY_BINARY_FIELDS}
+    if result.get("task") == MULTI_TASK and isinstance(result.get("results"), list):
+        result["results"] = [_compact(step) for step in result["results"]]
+    return result
+
+
+def _etag(stat) -> str:
+    return '"' + hashlib.md5(f"{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest() + '"'
+
+
+def _artifact_ref(job_id: str, name: str) -> dict:
+    """
+    URL plus size/ETag of an artifact. Overlays not rendered yet have no
+    size or ETag: they are drawn when first fetched.
+    """
+    path = ARTIFACT_ROOT / job_id / f"{name}.png"
+    ref = {"url": f"/api/jobs/{job_id}/artifacts/{name}", "media_type": "image/png", "size": None, "etag": None}
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return ref
+    ref["size"] = stat.st_size
+    ref["etag"] = _etag(stat)
+    return ref
+
+
+def _read_artifact(job: dict, name: str):
+    """(bytes, stat) of an artifact, read from one open file."""
+    if not job or name not in (job.get("artifacts") or []):
+        raise HTTPException(404, detail=f"{name} artifact not found")
+
+    if is_overlay(name):
+        # Drawn from the original + annotations on first request, then cached
+        try:
+            return overlay_cache.read(job, name)
+        except FileNotFoundError as exc:
+            raise HTTPException(404, detail=str(exc))
+
+    try:
+        with (ARTIFACT_ROOT / job["id"] / f"{name}.png").open("rb") as f:
+            return f.read(), os.fstat(f.fileno())
+    except FileNotFoundError:
+        raise HTTPException(404, detail=f"{name} artifact not found")
+
+
 @router.get("/{job_id}/result")
-def get_job_result(job_id: str):
+def get_job_result(
+    job_id: str,
+    include: str | None = Query(None, description="Comma-separated artifact names to inline as base64, e.g. overlay,mask"),
+):
     job = get_job(job_id)
     if not job or job["status"] != "completed":
         raise HTTPException(400, detail="Job not completed")
 
-    # Check which artifacts actually exist
-    job_dir = ARTIFACT_ROOT / job_id
-    artifacts = {}
-    for name in ["overlay", "mask"]:
-        if (job_dir / f"{name}.png").exists():
-            artifacts[name] = f"/api/jobs/{job_id}/artifacts/{name}"
-
-    return {
+    names = job.get("artifacts") or []
+    response = {
         "job_id": job["id"],
         "task": job["task"],
         "model": job["model"],
-        "annotations": job["result"],
-        "artifacts": artifacts,
+        "annotations": _compact(job["result"]),
+        "artifacts": {name: _artifact_ref(job_id, name) for name in names},
     }
 
+    if include:
+        inline = {}
+        for name in filter(None, (n.strip() for n in include.split(","))):
+            if name not in names:
+                raise HTTPException(400, detail=f"Unknown artifact {name!r}; job has {names}")
+            content, stat = _read_artifact(job, name)
+            inline[name] = base64.b64encode(content).decode()
+            response["artifacts"][name] = {**response["artifacts"][name], "size": stat.st_size, "etag": _etag(stat)}
+        response["inline"] = inline
+
+    return response
+
 
 @router.get("/{job_id}/artifacts/{name}")
-def get_artifact(job_id: str, name: str):
-    path = ARTIFACT_ROOT / job_id / f"{name}.png"
-    if not path.exists():
-        raise HTTPException(404, detail=f"{name} artifact not found")
-    return FileResponse(path, media_type="image/png")
+def get_artifact(job_id: str, name: str, request: Request):
+    content, stat = _read_artifact(get_job(job_id), name)
+    etag = _etag(stat)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content, media_type="image/png", headers={"ETag": etag})
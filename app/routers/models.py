@@ -0,0 +1,76 @@
+# app/routers/models.py
+from fastapi import APIRouter, HTTPException
+
+from app.services.inference_executor import inference_executor
+from app.services.overlays import overlay_cache
+from app.services.responses import render_store
+from inference.image_ingest import decoded_images
+from inference.memory_governor import memory_governor
+from inference.registry.model_residency import residency
+from inference.registry.model_types import ModelType
+from inference.result_cache import result_cache
+
+router = APIRouter(prefix="/api/models", tags=["Models"])
+
+
+def _parse_model(model: str) -> ModelType:
+    try:
+        model_enum = ModelType(model.lower())
+    except ValueError:
+        raise HTTPException(400, detail="Invalid model")
+    if model_enum not in residency.registered():
+        raise HTTPException(404, detail="Model not registered")
+    return model_enum
+
+
+@router.get("")
+def list_models():
+    return {
+        "models": residency.status(),
+        "result_cache": result_cache.stats(),
+        "overlay_cache": overlay_cache.stats(),
+        "decoded_images": decoded_images.stats(),
+        "memory": memory_governor.stats(),
+        "inference": inference_executor.stats(),
+        "renders": render_store.stats(),
+    }
+
+
+@router.post("/{model}/load")
+def load_model(model: str):
+    model_enum = _parse_model(model)
+    residency.get(model_enum)
+    return {"model": model_enum.value, "loaded": True}
+
+
+@router.post("/{model}/unload")
+def unload_model(model: str, force: bool = False):
+    model_enum = _parse_model(model)
+    if not residency.is_loaded(model_enum):
+        return {"model": model_enum.value, "unloaded": False, "reason": "not loaded"}
+    if not residency.unload(model_enum, force=force):
+        raise HTTPException(409, detail="Model is in use")
+    return {"model": model_enum.value, "unloaded": True}
+
+
+@router.post("/evict")
+def evict_models():
+    evicted = residency.evict()
+    return {"evicted": [m.value for m in evicted]}
+
+
+@router.get("/memory")
+def memory_stats():
+    return memory_governor.stats()
+
+
+@router.post("/memory/release")
+def release_memory():
+    memory_governor.release("manual")
+    return memory_governor.stats()
+
+
+@router.post("/cache/clear")
+def clear_result_cache():
+    result_cache.clear()
+    return {"cleared": True}
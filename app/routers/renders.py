@@ -0,0 +1,17 @@
+# app/routers/renders.py
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+
+from app.services.responses import RENDERS_PREFIX, render_store
+
+router = APIRouter(prefix=RENDERS_PREFIX, tags=["renders"])
+
+
+@router.get("/{render_id}")
+def get_render(render_id: str):
+    """Image of a response_mode=json /vision response, kept until evicted."""
+    stored = render_store.get(render_id)
+    if stored is None:
+        raise HTTPException(404, detail="Render not found or expired")
+    image_bytes, media_type = stored
+    return Response(image_bytes, media_type=media_type, headers={"Cache-Control": "private, max-age=300"})
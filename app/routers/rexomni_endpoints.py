@@ -5,6 +5,7 @@ Merged endpoints:
 - Detection
 - OCR
 - Keypoint
+- Detection -> Keypoint cascade
 - Visual Prompting
 
 Behavior and signatures preserved exactly.
@@ -22,13 +23,26 @@ from fastapi import (
     HTTPException,
     UploadFile,
 )
-from fastapi.responses import StreamingResponse
 
 from app.dependencies import get_rexomni_service
-from inference.rexomni.rexomni_service import RexOmniService
+from app.services.inference_executor import QUEUE_WAIT_HEADER, inference_executor
+from app.services.job_scheduler import QueueFullError
+from app.services.responses import RESPONSE_MODE_FORM, FastJSONResponse, check_mode, result_response
+from inference.image_ingest import ImageIngestError
+from inference.rexomni.rexomni_service import CASCADE_CROP_PADDING, CASCADE_MAX_BOXES, RexOmniService
 
 router = APIRouter(prefix="/vision/rexomni", tags=["rexomni"])
 
+
+async def _infer(fn, *args, **kwargs):
+    """Run a blocking RexOmni call off the event loop; returns (result, {queue wait header})."""
+    try:
+        result, wait_ms = await inference_executor.run("rexomni", fn, *args, **kwargs)
+    except QueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "5"})
+    return result, {QUEUE_WAIT_HEADER: f"{wait_ms:.1f}"}
+
+
 # --------------------------------------------------
 # Detection
 # --------------------------------------------------
@@ -37,30 +51,48 @@ router = APIRouter(prefix="/vision/rexomni", tags=["rexomni"])
 async def detection(
     file: UploadFile = File(...),
     categories: Optional[List[str]] = Form(default=[]),
+    response_mode: Optional[str] = Form(None, description=RESPONSE_MODE_FORM),
     service: RexOmniService = Depends(get_rexomni_service),
 ):
-    """Detect objects in an image and stream back the annotated JPEG."""
+    """Detect objects in an image; returns the detections and the annotated JPEG."""
+    try:
+        response_mode = check_mode(response_mode)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
     try:
         image_bytes = await file.read()
-        raw_results = service.run_detection(image_bytes, categories=categories)
-        results = service.postprocess_detection(raw_results)
 
-        drawn_pil = service.draw_detections(
-            image_bytes,
-            results,
-            return_pil=True,
-        )
+        def _detect():
+            raw_results = service.run_detection(image_bytes, categories=categories)
+            results = service.postprocess_detection(raw_results)
+
+            drawn_pil = service.draw_detections(
+                image_bytes,
+                results,
+                return_pil=True,
+            )
+
+            img_buffer = io.BytesIO()
+            drawn_pil.save(img_buffer, format="JPEG")
+            return results, img_buffer.getvalue()
 
-        img_buffer = io.BytesIO()
-        drawn_pil.save(img_buffer, format="JPEG")
-        img_buffer.seek(0)
+        (results, jpeg_bytes), headers = await _infer(_detect)
 
-        return StreamingResponse(
-            img_buffer,
-            media_type="image/jpeg",
-            headers={"X-Rex-Detections": json.dumps(results)},
+        return result_response(
+            response_mode,
+            {"task": "Detection", "results": results},
+            jpeg_bytes,
+            "image/jpeg",
+            legacy_header="X-Rex-Detections",
+            headers=headers,
         )
 
+    except HTTPException:
+        raise
+
+    except ImageIngestError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
@@ -79,13 +111,19 @@ async def ocr(
     """Run OCR on an uploaded image."""
     try:
         image_bytes = await file.read()
-        results = service.run_ocr(
+        results, headers = await _infer(
+            service.run_ocr,
             image_bytes,
             ocr_output_format=ocr_output_format,
             ocr_granularity=ocr_granularity,
         )
-        return {"task": "OCR", "results": results}
+        return FastJSONResponse({"task": "OCR", "results": results}, headers=headers)
+
+    except HTTPException:
+        raise
 
+    except ImageIngestError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
@@ -116,14 +154,61 @@ async def keypoint(
         image_bytes = await file.read()
         chosen_categories = categories or _default_categories(keypoint_type)
 
-        results = service.run_keypoint(
+        results, headers = await _infer(
+            service.run_keypoint,
             image_bytes,
             keypoint_type=keypoint_type,
             categories=chosen_categories,
         )
 
-        return {"task": "Keypoint", "results": results}
+        return FastJSONResponse({"task": "Keypoint", "results": results}, headers=headers)
+
+    except HTTPException:
+        raise
 
+    except ImageIngestError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+# --------------------------------------------------
+# Detection -> Keypoint cascade
+# --------------------------------------------------
+
+@router.post("/detection_keypoint")
+async def detection_keypoint(
+    file: UploadFile = File(...),
+    keypoint_type: str = Form("human_pose"),
+    categories: Optional[List[str]] = Form(None),
+    crop_padding: float = Form(CASCADE_CROP_PADDING, ge=0.0, le=1.0),
+    max_boxes: int = Form(CASCADE_MAX_BOXES, ge=1),
+    service: RexOmniService = Depends(get_rexomni_service),
+):
+    """
+    Detect objects, then keypoints inside every detected box, in one request.
+    Each detection carries a "persons" list in full-image coordinates.
+    """
+    try:
+        image_bytes = await file.read()
+        chosen_categories = categories or _default_categories(keypoint_type)
+
+        results, headers = await _infer(
+            service.run_detection_keypoint,
+            image_bytes,
+            categories=chosen_categories,
+            keypoint_type=keypoint_type,
+            crop_padding=crop_padding,
+            max_boxes=max_boxes,
+        )
+
+        return FastJSONResponse({"task": "Detection Keypoint", "results": results}, headers=headers)
+
+    except HTTPException:
+        raise
+
+    except ImageIngestError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
@@ -150,26 +235,37 @@ async def visual_prompting(
                 detail="Each visual_prompt_box must be [x0, y0, x1, y1]",
             )
 
-        results = service.run_visual_prompting(
-            image_bytes=image_bytes,
-            visual_prompt_boxes=boxes,
-            categories=categories,
-        )
+        def _prompt():
+            results = service.run_visual_prompting(
+                image_bytes=image_bytes,
+                visual_prompt_boxes=boxes,
+                categories=categories,
+            )
 
-        processed_results = service.postprocess_visual_prompting(results)
-        drawn_image_path = service.draw_visual_prompting(
-            image_bytes=image_bytes,
-            results=processed_results,
-            save_name="visual_prompting_result.jpg",
-        )
+            processed_results = service.postprocess_visual_prompting(results)
+            drawn_image_path = service.draw_visual_prompting(
+                image_bytes=image_bytes,
+                results=processed_results,
+                save_name="visual_prompting_result.jpg",
+            )
+            return processed_results, drawn_image_path
 
-        return {
-            "task": "Visual Prompting",
-            "results": processed_results,
-            "drawn_image_path": drawn_image_path,
-        }
+        (processed_results, drawn_image_path), headers = await _infer(_prompt)
+
+        return FastJSONResponse(
+            {
+                "task": "Visual Prompting",
+                "results": processed_results,
+                "drawn_image_path": drawn_image_path,
+            },
+            headers=headers,
+        )
 
+    except HTTPException:
+        raise
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="visual_prompt_boxes must be valid JSON")
+    except ImageIngestError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
@@ -0,0 +1,153 @@
+# app/services/annotation_sink.py
+"""
+Streaming annotation sink for auto-labeling runs.
+
+Per-image records are appended to <name>.jsonl. Every `checkpoint_every`
+records the JSONL is fsync'd and the record keys plus the byte offset they
+end at are appended (and fsync'd) to <name>.index. On reopen, anything past
+the last checkpoint is truncated, so a resumed run skips exactly the images
+whose records are durable and redoes the rest.
+
+compact() streams the records into the final COCO-style <name>.json without
+holding the class in memory. Stdlib only, so the labeling scripts can use it too.
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+class AnnotationSink:
+
+    def __init__(self, directory, name: str, meta: dict | None = None, checkpoint_every: int = 1):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.meta = meta or {}
+        self.checkpoint_every = max(1, checkpoint_every)
+
+        self.records_path = self.dir / f"{name}.jsonl"
+        self.index_path = self.dir / f"{name}.index"
+        self.json_path = self.dir / f"{name}.json"
+
+        self._done: set[str] = set()
+        self._offset = 0
+        self._pending_keys: list[str] = []
+        self._records = None
+        self._index = None
+        self._recover()
+
+    # -----------------------------
+    # Recovery
+    # -----------------------------
+    def _recover(self):
+        if self.index_path.exists():
+            durable = 0
+            with open(self.index_path, "rb") as f:
+                for line in f:
+                    # Only newline-terminated lines are complete; a torn last
+                    # line may still hold a tab and part of a key
+                    if not line.endswith(b"\n"):
+                        break
+                    offset, sep, key = line.decode().rstrip("\n").partition("\t")
+                    if not sep:
+                        break
+                    self._offset = int(offset)
+                    self._done.add(key)
+                    durable += len(line)
+            # The checkpoint before a torn line still holds; drop the rest so
+            # the next checkpoint starts on a fresh line
+            if self.index_path.stat().st_size != durable:
+                with open(self.index_path, "r+b") as f:
+                    f.truncate(durable)
+
+        # Drop records written after the last durable checkpoint
+        if self.records_path.exists() and self.records_path.stat().st_size != self._offset:
+            with open(self.records_path, "r+b") as f:
+                f.truncate(self._offset)
+
+    def _open(self):
+        if self._records is None:
+            self._records = open(self.records_path, "ab")
+            self._index = open(self.index_path, "a")
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    def __contains__(self, key: str) -> bool:
+        return key in self._done or key in self._pending_keys
+
+    def __len__(self) -> int:
+        return len(self._done) + len(self._pending_keys)
+
+    def next_image_id(self) -> int:
+        return len(self) + 1
+
+    def write(self, key: str, image: dict, annotations: list[dict]):
+        """Append one image record. `key` identifies the image for resume (e.g. its path)."""
+        self._open()
+        line = json.dumps({"key": key, "image": image, "annotations": annotations}) + "\n"
+        self._records.write(line.encode())
+        self._pending_keys.append(key)
+        if len(self._pending_keys) >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        if self._records is None or not self._pending_keys:
+            return
+        self._records.flush()
+        os.fsync(self._records.fileno())
+        offset = self._records.tell()
+
+        # One index line per key, all pointing at the durable end offset
+        self._index.write("".join(f"{offset}\t{key}\n" for key in self._pending_keys))
+        self._index.flush()
+        os.fsync(self._index.fileno())
+
+        self._done.update(self._pending_keys)
+        self._pending_keys.clear()
+        self._offset = offset
+
+    def close(self):
+        self.checkpoint()
+        if self._records is not None:
+            self._records.close()
+            self._index.close()
+            self._records = None
+            self._index = None
+
+    # -----------------------------
+    # Compaction
+    # -----------------------------
+    def _iter_records(self):
+        if not self.records_path.exists():
+            return
+        with open(self.records_path) as f:
+            for line in f:
+                yield json.loads(line)
+
+    def compact(self) -> Path:
+        """Stream the checkpointed records into <name>.json (COCO-style)."""
+        self.close()
+        tmp = self.json_path.with_suffix(".json.tmp")
+        with open(tmp, "w") as out:
+            out.write("{")
+            for key, value in self.meta.items():
+                out.write(f"{json.dumps(key)}: {json.dumps(value)}, ")
+
+            out.write('"images": [')
+            for index, record in enumerate(self._iter_records()):
+                out.write(("," if index else "") + json.dumps(record["image"]))
+
+            out.write('], "annotations": [')
+            annotation_id = 0
+            for record in self._iter_records():
+                for annotation in record["annotations"]:
+                    annotation_id += 1
+                    out.write(("," if annotation_id > 1 else "") + json.dumps({**annotation, "id": annotation_id}))
+            out.write("]}")
+            out.flush()
+            os.fsync(out.fileno())
+
+        os.replace(tmp, self.json_path)
+        return self.json_path
@@ -0,0 +1,378 @@
+# app/services/dataset_jobs.py
+"""
+Server-side dataset labeling jobs.
+
+Replaces the client-side loops in label_testing_scripts: the server walks a
+dataset (class sub-folders or an explicit manifest), streams images through
+
+    prefetch (read + header decode) -> model lane (registry.run) -> writer
+
+with bounded queues between stages (inference waits its turn on the
+model's scheduler lane, like any interactive job), and writes the same
+per-class JSON the scripts used to build by hand. Every finished image is recorded in an
+AnnotationSink under <output_dir>/<class>/, so a resubmitted job skips
+exactly the images that were already labeled.
+"""
+
+import os
+import queue
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from app.services.annotation_sink import AnnotationSink
+from app.services.job_manager import create_job, delete_job, get_job, update_job, mark_failed, mark_running
+from app.services.job_scheduler import QueueFullError, scheduler
+from app.services.result_serializer import extract_detections
+from inference.image_ingest import probe
+from inference.registry.model_registry import ModelRegistry, TaskType, ModelType, TASK_INPUTS
+
+DATASET_TASK = "dataset"
+# Scheduler lane dataset jobs queue on (workers: JOB_LANE_WORKERS, bound: JOB_QUEUE_SIZE)
+DATASET_LANE = "dataset"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Allowlist root for server-local dataset paths; dataset jobs are refused without it
+DATASET_ROOT = os.getenv("DATASET_ROOT")
+PREFETCH_WORKERS = int(os.getenv("DATASET_PREFETCH_WORKERS", "2"))
+# Images a run keeps queued on the model's scheduler lane at once; >1 lets the
+# micro-batchers group them, and interactive jobs still get lane slots between
+MODEL_WORKERS = int(os.getenv("DATASET_MODEL_WORKERS", "4"))
+# Seconds to wait before resubmitting to a full model lane
+LANE_RETRY_SECONDS = 0.5
+QUEUE_SIZE = int(os.getenv("DATASET_QUEUE_SIZE", "16"))
+PROGRESS_INTERVAL = 1.0
+
+_STOP = object()
+_runs: dict[str, "DatasetRun"] = {}
+
+
+def _check_path(path: str) -> Path:
+    if not DATASET_ROOT:
+        raise ValueError("Dataset jobs are disabled: DATASET_ROOT is not set")
+    resolved = Path(path).expanduser().resolve()
+    if not resolved.is_relative_to(Path(DATASET_ROOT).resolve()):
+        raise ValueError(f"{path} is outside DATASET_ROOT")
+    return resolved
+
+
+def _check_class_name(name: str) -> str:
+    """Class names become directories under output_dir."""
+    if not name or name == "." or ".." in name or "/" in name or "\\" in name:
+        raise ValueError(f"Invalid category name {name!r}")
+    return name
+
+
+def collect_items(directory: str | None = None, manifest: list[dict] | None = None) -> list[tuple[str, Path]]:
+    """
+    Return [(class_name, image_path), ...] sorted by class then file name.
+    A directory with class sub-folders yields one class per folder; a flat
+    directory is a single class named after it. Manifest entries are
+    {"path": ..., "category": ...}.
+    """
+    items = []
+    if manifest:
+        for entry in manifest:
+            path = _check_path(entry["path"])
+            items.append((_check_class_name(entry.get("category") or path.parent.name), path))
+    elif directory:
+        root = _check_path(directory)
+        if not root.is_dir():
+            raise ValueError(f"{directory} is not a directory")
+        folders = [p for p in sorted(root.iterdir()) if p.is_dir()] or [root]
+        for folder in folders:
+            for path in sorted(folder.iterdir()):
+                if path.suffix.lower() in IMAGE_SUFFIXES and not path.name.startswith("._"):
+                    items.append((folder.name, path))
+    else:
+        raise ValueError("Either directory or manifest is required")
+
+    return sorted(items, key=lambda item: (item[0], str(item[1])))
+
+
+class DatasetRun:
+
+    def __init__(self, job_id: str, items: list[tuple[str, Path]], config: dict):
+        self.job_id = job_id
+        self.items = items
+        self.config = config
+        self.output_dir = Path(config["output_dir"])
+        self.task = TaskType(config["task"])
+        self.model = ModelType(config["model"])
+        self.registry = ModelRegistry()
+        self.cancelled = threading.Event()
+
+        self.outputs: dict[str, AnnotationSink] = {}
+        self.remaining: dict[str, int] = {}
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self._last_progress = 0.0
+
+    # -----------------------------
+    # Stages
+    # -----------------------------
+    def _prefetch(self, work_q: queue.Queue, model_q: queue.Queue):
+        while not self.cancelled.is_set():
+            entry = work_q.get()
+            if entry is _STOP:
+                break
+            image_id, class_name, path = entry
+            try:
+                image_bytes = path.read_bytes()
+                # Header-only: validates the file and gives COCO width/height
+                info = probe(image_bytes)
+                size = (info.width, info.height)
+                model_q.put((image_id, class_name, path, image_bytes, size, None))
+            except Exception as exc:
+                model_q.put((image_id, class_name, path, None, None, exc))
+
+    def _task_kwargs(self, class_name: str) -> dict:
+        categories = self.config.get("categories") or [class_name]
+        text_input = self.config.get("text_input")
+        if text_input is None and "text_input" in TASK_INPUTS.get(self.task, []):
+            text_input = class_name
+        kwargs = {
+            "categories": categories,
+            "text_input": text_input,
+            "visualize": self.config.get("visualize", False),
+        }
+        if self.config.get("profile"):
+            kwargs["profile"] = self.config["profile"]
+        return kwargs
+
+    def _infer_on_lane(self, class_name: str, image_bytes: bytes):
+        """
+        registry.run on the scheduler lane of the model, so the run shares the
+        model's workers with interactive jobs. Waits for a slot while the lane
+        is full; None when cancelled before the image got one.
+        """
+        done = threading.Event()
+        outcome = {}
+
+        def _run(job_id):
+            try:
+                outcome["result"] = self.registry.run(
+                    task=self.task,
+                    model=self.model,
+                    image_bytes=image_bytes,
+                    **self._task_kwargs(class_name),
+                )
+            except Exception as exc:
+                outcome["error"] = exc
+            finally:
+                done.set()
+
+        while True:
+            if self.cancelled.is_set():
+                return None
+            try:
+                scheduler.submit(self.model.value, self.job_id, _run)
+                break
+            except QueueFullError:
+                time.sleep(LANE_RETRY_SECONDS)
+
+        done.wait()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def _infer(self, model_q: queue.Queue, write_q: queue.Queue):
+        while True:
+            entry = model_q.get()
+            if entry is _STOP:
+                break
+            image_id, class_name, path, image_bytes, size, error = entry
+            if error is not None or self.cancelled.is_set():
+                write_q.put((image_id, class_name, path, None, None, error))
+                continue
+            try:
+                raw_result = self._infer_on_lane(class_name, image_bytes)
+                write_q.put((image_id, class_name, path, size, raw_result, None))
+            except Exception as exc:
+                write_q.put((image_id, class_name, path, None, None, exc))
+
+    def _write(self, image_id, class_name, path, size, raw_result, error):
+        output = self.outputs[class_name]
+        if error is not None:
+            self.failed += 1
+            print(f"[Dataset {self.job_id}] {path}: {error}")
+        elif raw_result is None:
+            # Dropped by cancellation; a resubmitted job picks it up
+            pass
+        else:
+            width, height = size
+            annotations = []
+            for det in extract_detections(raw_result):
+                x0, y0, x1, y1 = det["bbox"][:4]
+                annotations.append({
+                    "image_id": image_id,
+                    "bbox": det["bbox"],
+                    "label": det["label"],
+                    "confidence": det["score"],
+                    "area": (x1 - x0) * (y1 - y0),
+                })
+            output.write(
+                str(path),
+                {"id": image_id, "file_name": str(path), "width": width, "height": height},
+                annotations,
+            )
+            overlay = raw_result.get("image_bytes") if isinstance(raw_result, dict) else None
+            if overlay:
+                (output.dir / f"vis_{image_id}.png").write_bytes(overlay)
+            self.processed += 1
+
+        self.remaining[class_name] -= 1
+        if self.remaining[class_name] == 0:
+            output.compact()
+            print(f"[Dataset {self.job_id}] Saved JSON -> {output.json_path}")
+
+    # -----------------------------
+    # Orchestration
+    # -----------------------------
+    def _publish_progress(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        total = len(self.items)
+        finished = self.processed + self.skipped + self.failed
+        update_job(
+            self.job_id,
+            # mark_running starts the bar at 20, like the other jobs
+            progress=20 + int(79 * finished / total) if total else 99,
+            dataset={
+                "total": total,
+                "processed": self.processed,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "classes": {name: {"remaining": n} for name, n in self.remaining.items()},
+            },
+        )
+
+    def run(self):
+        try:
+            mark_running(self.job_id)
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+
+            # Per-class image ids follow sorted order, so they are stable across resumes
+            work = []
+            class_counters: dict[str, int] = {}
+            for class_name, path in self.items:
+                if class_name not in self.outputs:
+                    self.outputs[class_name] = AnnotationSink(
+                        self.output_dir / class_name,
+                        class_name,
+                        meta={"class": class_name},
+                    )
+                    self.remaining[class_name] = 0
+                class_counters[class_name] = class_counters.get(class_name, 0) + 1
+                if str(path) in self.outputs[class_name]:
+                    self.skipped += 1
+                    continue
+                self.remaining[class_name] += 1
+                work.append((class_counters[class_name], class_name, path))
+
+            # Classes that were fully labeled before still get a fresh JSON
+            for class_name, count in self.remaining.items():
+                if count == 0:
+                    self.outputs[class_name].compact()
+
+            work_q: queue.Queue = queue.Queue()
+            model_q: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+            write_q: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+            for entry in work:
+                work_q.put(entry)
+
+            prefetchers = [
+                threading.Thread(target=self._prefetch, args=(work_q, model_q), daemon=True)
+                for _ in range(PREFETCH_WORKERS)
+            ]
+            inferers = [
+                threading.Thread(target=self._infer, args=(model_q, write_q), daemon=True)
+                for _ in range(MODEL_WORKERS)
+            ]
+            for _ in prefetchers:
+                work_q.put(_STOP)
+            for thread in prefetchers + inferers:
+                thread.start()
+
+            def _close_model_stage():
+                for thread in prefetchers:
+                    thread.join()
+                for _ in inferers:
+                    model_q.put(_STOP)
+                for thread in inferers:
+                    thread.join()
+                write_q.put(_STOP)
+
+            threading.Thread(target=_close_model_stage, daemon=True).start()
+
+            # Writer stage runs on this thread
+            while True:
+                entry = write_q.get()
+                if entry is _STOP:
+                    break
+                self._write(*entry)
+                self._publish_progress()
+
+            for output in self.outputs.values():
+                output.close()
+
+            self._publish_progress(force=True)
+            status = "cancelled" if self.cancelled.is_set() else "completed"
+            update_job(
+                self.job_id,
+                status=status,
+                progress=100 if status == "completed" else get_job(self.job_id)["progress"],
+                finished_at=time.time(),
+                result={
+                    "output_dir": str(self.output_dir),
+                    "classes": {name: str(out.json_path) for name, out in self.outputs.items()},
+                    "processed": self.processed,
+                    "skipped": self.skipped,
+                    "failed": self.failed,
+                },
+            )
+        except Exception as exc:
+            mark_failed(self.job_id, str(exc))
+            traceback.print_exc()
+        finally:
+            _runs.pop(self.job_id, None)
+
+
+def submit_dataset_job(config: dict) -> dict:
+    """
+    config: task, model, output_dir, and either directory or manifest;
+    optional categories, text_input, visualize, profile.
+    The run waits on the dataset scheduler lane; QueueFullError when it is full.
+    """
+    items = collect_items(config.get("directory"), config.get("manifest"))
+    config = {**config, "output_dir": str(_check_path(config["output_dir"]))}
+
+    job = create_job(DATASET_TASK, config["model"], {k: v for k, v in config.items() if k != "manifest"})
+    job = update_job(job["id"], dataset={"total": len(items), "processed": 0, "skipped": 0, "failed": 0})
+
+    _runs[job["id"]] = DatasetRun(job["id"], items, config)
+    try:
+        job["queue_position"] = scheduler.submit(DATASET_LANE, job["id"], _run_dataset)
+    except QueueFullError:
+        _runs.pop(job["id"], None)
+        delete_job(job["id"])
+        raise
+    return job
+
+
+def _run_dataset(job_id: str):
+    run = _runs.get(job_id)
+    if run is not None:
+        run.run()
+
+
+def cancel_dataset_job(job_id: str) -> bool:
+    run = _runs.get(job_id)
+    if run is None:
+        return False
+    run.cancelled.set()
+    return True
@@ -0,0 +1,123 @@
+# app/services/inference_executor.py
+"""
+Runs blocking model calls from async routes.
+
+Each model gets its own thread pool sized to its concurrency limit, so an
+inference never runs on the event loop and a slow model cannot starve the
+others. Calls beyond the limit wait in the pool's queue; the time spent
+there is returned to the route (X-Queue-Wait-Ms). A full queue raises
+QueueFullError, the same backpressure signal the job scheduler uses.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.services.job_scheduler import QueueFullError
+from inference.pipeline import parse_workers
+
+# Concurrent inferences per model. Both need several in flight for their
+# batchers to form batches.
+INFERENCE_CONCURRENCY = parse_workers(
+    os.getenv("INFERENCE_CONCURRENCY"),
+    {"florence": 8, "rexomni": 4},
+)
+# Calls allowed to wait per model before requests are rejected with 429
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+
+QUEUE_WAIT_HEADER = "X-Queue-Wait-Ms"
+
+
+class _ModelPool:
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"infer-{name}")
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.wait_ms: deque = deque(maxlen=200)
+
+
+class InferenceExecutor:
+
+    def __init__(self, concurrency: dict[str, int] | None = None, max_queue: int = INFERENCE_QUEUE_SIZE):
+        self.concurrency = concurrency if concurrency is not None else INFERENCE_CONCURRENCY
+        self.max_queue = max_queue
+        self._pools: dict[str, _ModelPool] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, model: str) -> _ModelPool:
+        with self._lock:
+            pool = self._pools.get(model)
+            if pool is None:
+                pool = _ModelPool(model, self.concurrency.get(model, 1), self.max_queue)
+                self._pools[model] = pool
+            return pool
+
+    async def run(self, model: str, fn: Callable, *args, **kwargs):
+        """
+        Await fn(*args, **kwargs) on `model`'s pool.
+        Returns (result, queue_wait_ms).
+        """
+        pool = self._pool(model)
+        with pool.lock:
+            if pool.waiting >= pool.max_queue:
+                raise QueueFullError(model, pool.waiting)
+            pool.waiting += 1
+        submitted = time.monotonic()
+        state = {"started": False, "abandoned": False}
+
+        def _call():
+            wait_ms = (time.monotonic() - submitted) * 1000.0
+            with pool.lock:
+                if state["abandoned"]:
+                    return None, wait_ms
+                state["started"] = True
+                pool.waiting -= 1
+                pool.running += 1
+                pool.wait_ms.append(wait_ms)
+            try:
+                return fn(*args, **kwargs), wait_ms
+            finally:
+                with pool.lock:
+                    pool.running -= 1
+                    pool.completed += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(pool.pool, _call)
+        except asyncio.CancelledError:
+            # Client went away: skip the call if it has not started yet
+            with pool.lock:
+                if not state["started"]:
+                    state["abandoned"] = True
+                    pool.waiting -= 1
+            raise
+
+    def stats(self) -> dict:
+        stats = {}
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            with pool.lock:
+                waits = list(pool.wait_ms)
+                stats[pool.name] = {
+                    "workers": pool.workers,
+                    "waiting": pool.waiting,
+                    "max_queue": pool.max_queue,
+                    "running": pool.running,
+                    "completed": pool.completed,
+                    "avg_wait_ms": round(sum(waits) / len(waits), 1) if waits else 0.0,
+                }
+        return stats
+
+
+inference_executor = InferenceExecutor()
@@ -0,0 +1,95 @@
+# app/services/job_events.py
+"""
+In-process pub/sub for job events.
+
+job_manager publishes state transitions, progress and artifact-ready events
+as it writes job records; the jobs router fans them out to SSE and WebSocket
+subscribers so clients stop polling GET /api/jobs/{id}. Publishing happens on
+worker threads, delivery on the subscriber's event loop.
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+
+# Per-subscriber buffer; a slow client drops its oldest events (it can resync from a snapshot)
+JOB_EVENT_QUEUE_SIZE = int(os.getenv("JOB_EVENT_QUEUE_SIZE", "256"))
+
+
+class Subscription:
+
+    def __init__(self, job_ids: set[str] | None, loop: asyncio.AbstractEventLoop):
+        # None follows every job
+        self.job_ids = job_ids
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=JOB_EVENT_QUEUE_SIZE)
+        self.dropped = 0
+
+    def wants(self, job_id: str) -> bool:
+        return self.job_ids is None or job_id in self.job_ids
+
+    def put(self, event: dict):
+        """Enqueue on the subscriber's loop (call from that loop)."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> dict | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class JobEventBus:
+
+    def __init__(self):
+        self._subscriptions: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+
+    def subscribe(self, job_ids=None) -> Subscription:
+        """Must be called from the event loop that will consume the events."""
+        subscription = Subscription(set(job_ids) if job_ids is not None else None, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def follow(self, subscription: Subscription, job_id: str):
+        with self._lock:
+            if subscription.job_ids is not None:
+                subscription.job_ids.add(job_id)
+
+    def unfollow(self, subscription: Subscription, job_id: str):
+        with self._lock:
+            if subscription.job_ids is not None:
+                subscription.job_ids.discard(job_id)
+
+    def publish(self, job_id: str, event_type: str, **data):
+        event = {"seq": next(self._seq), "type": event_type, "job_id": job_id, "ts": time.time(), **data}
+        with self._lock:
+            targets = [s for s in self._subscriptions if s.wants(job_id)]
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # Subscriber's loop is gone
+                self.unsubscribe(subscription)
+        return event
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscriptions),
+                "dropped": sum(s.dropped for s in self._subscriptions),
+            }
+
+
+job_events = JobEventBus()
@@ -1,13 +1,50 @@
 # app/services/job_manager.py
+import os
+import threading
+import time
 import uuid
+from pathlib import Path
 
-job_store: dict[str, dict] = {}
+from app.services.job_events import job_events
+from app.services.job_store import build_job_store, create_artifact_dir, worker_alive, worker_id
+
+ARTIFACT_ROOT = Path("job_artifacts")
+
+# Task name recorded on jobs that carry a list of tasks (see submit_multi_job)
+MULTI_TASK = "multi"
+
+job_store = build_job_store()
+
+# Record fields that ride along on progress events
+PROGRESS_FIELDS = ("tasks", "dataset")
+
+# Minimum seconds between job store writes of in-generation progress; every
+# report is still published as an event
+PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1.0"))
+# job id -> (monotonic time of the last progress write, last published progress)
+_progress_state: dict[str, tuple[float, int]] = {}
+_progress_lock = threading.Lock()
+
+
+def _publish_state(job: dict):
+    job_events.publish(
+        job["id"],
+        "state",
+        status=job["status"],
+        progress=job["progress"],
+        error=job["error"],
+    )
+
+
+def _publish_artifacts(job_id: str, names):
+    for name in names:
+        job_events.publish(job_id, "artifact", name=name, url=f"/api/jobs/{job_id}/artifacts/{name}")
 
 
 def create_job(task: str, model: str, params: dict):
     job_id = str(uuid.uuid4())
 
-    job_store[job_id] = {
+    job = {
         "id": job_id,
         "task": task,
         "model": model,
@@ -16,27 +53,166 @@ def create_job(task: str, model: str, params: dict):
         "progress": 0,
         "result": None,
         "error": None,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "wait_time": None,
+        "artifacts": [],
+        # Jobs run in the worker process that accepted them
+        "worker": worker_id(),
     }
+    job_store.put(job)
+    _publish_state(job)
 
-    return job_store[job_id]
+    return job
+
+
+def create_job_dir(job_id: str) -> Path:
+    """Artifact dir of a job, marked so the orphan sweep may reclaim it."""
+    return create_artifact_dir(job_store, ARTIFACT_ROOT, job_id)
 
 
 def get_job(job_id: str):
     return job_store.get(job_id)
 
 
+def delete_job(job_id: str):
+    job_store.delete(job_id)
+
+
+def update_job(job_id: str, **fields):
+    job = job_store.update(job_id, **fields)
+    if job is None:
+        return None
+    if "status" in fields:
+        _publish_state(job)
+    elif "progress" in fields or any(k in fields for k in PROGRESS_FIELDS):
+        job_events.publish(
+            job_id,
+            "progress",
+            progress=job["progress"],
+            **{k: fields[k] for k in PROGRESS_FIELDS if k in fields},
+        )
+    return job
+
+
 def mark_running(job_id: str):
-    job_store[job_id]["status"] = "running"
-    job_store[job_id]["progress"] = 20
+    job = job_store.get(job_id)
+    started_at = time.time()
+    job = job_store.update(
+        job_id,
+        status="running",
+        progress=20,
+        started_at=started_at,
+        wait_time=started_at - job["created_at"],
+    )
+    _publish_state(job)
+
+
+def update_progress(job_id: str, info: dict):
+    """
+    Record in-generation progress. `info` is a model progress report
+    ({"tokens", "max_new_tokens", "tokens_per_second"}, "text" under greedy
+    decoding only); the bar moves
+    through the 20-99 range by tokens generated and never goes backwards.
+    """
+    job = job_store.get(job_id)
+    if job is None or job["status"] != "running":
+        return
+    fraction = min(1.0, info["tokens"] / max(1, info["max_new_tokens"]))
+    now = time.monotonic()
+    with _progress_lock:
+        # The stored progress lags behind while writes are throttled
+        written_at, published = _progress_state.get(job_id, (0.0, job["progress"]))
+        progress = max(published, job["progress"], 20 + int(79 * fraction))
+        write = now - written_at >= PROGRESS_INTERVAL
+        _progress_state[job_id] = (now if write else written_at, progress)
+    generation = {
+        "tokens": info["tokens"],
+        "max_new_tokens": info["max_new_tokens"],
+        "tokens_per_second": info.get("tokens_per_second"),
+        "partial": info.get("text"),
+    }
+    if write:
+        job_store.update(job_id, progress=progress, generation=generation)
+    job_events.publish(job_id, "progress", progress=progress, **generation)
+
+
+def _forget_progress(job_id: str):
+    with _progress_lock:
+        _progress_state.pop(job_id, None)
 
 
 def save_result(job_id: str, result: dict):
-    job_store[job_id]["result"] = result
-    job_store[job_id]["status"] = "completed"
-    job_store[job_id]["progress"] = 100
-    job_store[job_id]["artifacts"] = result.get("artifacts", [])
+    _forget_progress(job_id)
+    previous = job_store.get(job_id)
+    job = job_store.update(
+        job_id,
+        result=result,
+        status="completed",
+        progress=100,
+        artifacts=result.get("artifacts", []),
+        finished_at=time.time(),
+    )
+    # Multi-task jobs already announced their artifacts task by task
+    announced = set(previous.get("artifacts") or []) if previous else set()
+    _publish_artifacts(job_id, [name for name in job["artifacts"] if name not in announced])
+    _publish_state(job)
+
+
+def mark_task_done(job_id: str, index: int, artifacts: list[str] = ()):
+    """Mark one task of a multi-task job completed and advance overall progress."""
+    job = job_store.get(job_id)
+    tasks = list(job["tasks"])
+    tasks[index] = {**tasks[index], "status": "completed", "progress": 100}
+    done = sum(1 for t in tasks if t["status"] == "completed")
+    job = job_store.update(
+        job_id,
+        tasks=tasks,
+        progress=20 + int(79 * done / len(tasks)),
+        artifacts=list(job.get("artifacts") or []) + list(artifacts),
+    )
+    _publish_artifacts(job_id, artifacts)
+    job_events.publish(job_id, "task", index=index, task=tasks[index]["task"], status="completed")
+    job_events.publish(job_id, "progress", progress=job["progress"], tasks=tasks)
 
 
 def mark_failed(job_id: str, error: str):
-    job_store[job_id]["status"] = "failed"
-    job_store[job_id]["error"] = error
+    _forget_progress(job_id)
+    job = job_store.get(job_id)
+    fields = {}
+    if job and job.get("tasks"):
+        fields["tasks"] = [
+            t if t["status"] == "completed" else {**t, "status": "failed", "error": error}
+            for t in job["tasks"]
+        ]
+    job = job_store.update(
+        job_id,
+        status="failed",
+        error=error,
+        finished_at=time.time(),
+        **fields,
+    )
+    if job is not None:
+        _publish_state(job)
+
+
+def recover_jobs() -> list[str]:
+    """
+    Fail queued/running jobs whose worker process is gone; they can never
+    finish. Run once per worker at startup, before it accepts jobs: a record
+    that already names this worker was left by an earlier process that had
+    the same pid.
+    """
+    current = worker_id()
+    interrupted = []
+    for job_id in job_store.unfinished():
+        job = job_store.get(job_id)
+        owner = job.get("worker") if job else None
+        if owner != current and worker_alive(owner):
+            continue
+        mark_failed(job_id, "Interrupted by server restart")
+        interrupted.append(job_id)
+    if interrupted:
+        print(f"[JobManager] Failed {len(interrupted)} jobs interrupted by a restart")
+    return interrupted
@@ -1,11 +1,12 @@
 # app/services/job_result_store.py
-
-result_store: dict[str, dict] = {}
+# Results live on the job record in the shared job store.
+from app.services.job_manager import get_job, update_job
 
 
 def save_job_result(job_id: str, result: dict):
-    result_store[job_id] = result
+    update_job(job_id, result=result)
 
 
 def get_job_result_data(job_id: str):
-    return result_store.get(job_id)
+    job = get_job(job_id)
+    return job["result"] if job else None
@@ -1,30 +1,100 @@
 # app/services/job_runner.py
-import threading
+import shutil
 import traceback
-from pathlib import Path
 
-from app.services.job_manager import create_job, save_result, mark_running, mark_failed
-from app.services.result_serializer import normalize_result
+from app.services.job_manager import (
+    ARTIFACT_ROOT,
+    MULTI_TASK,
+    create_job,
+    create_job_dir,
+    delete_job,
+    save_result,
+    mark_running,
+    mark_failed,
+    mark_task_done,
+    update_job,
+    update_progress,
+)
+from app.services.job_scheduler import QueueFullError, scheduler
+from app.services.overlays import OVERLAY, write_annotations
+from app.services.result_serializer import NO_OVERLAY_TASKS, normalize_result
+from inference.image_ingest import probe
 from inference.registry.model_registry import ModelRegistry, TaskType, ModelType
 
-ARTIFACT_ROOT = Path("job_artifacts")
+
+def _store_task_result(job_dir, task: str, model: str, raw_result: dict, prefix: str = ""):
+    """
+    Write the annotations and mask artifact for one task and return its
+    normalized result. The overlay is only listed: it is drawn from the
+    original and the annotations the first time it is requested.
+    """
+    overlay_bytes = raw_result.get("image_bytes")
+    mask_bytes = raw_result.get("mask_bytes")
+    write_annotations(job_dir, task, model, raw_result.get("results", {}), prefix=prefix)
+
+    # Save artifacts dynamically
+    artifacts = []
+    if overlay_bytes:
+        # Rendered eagerly (visualize=True); serve it as the cached overlay
+        (job_dir / f"{prefix}{OVERLAY}.png").write_bytes(overlay_bytes)
+    if overlay_bytes or (ModelRegistry.supports_overlay(ModelType(model)) and task not in NO_OVERLAY_TASKS):
+        artifacts.append(f"{prefix}{OVERLAY}")
+    if mask_bytes:
+        mask_path = job_dir / f"{prefix}mask.png"
+        mask_path.write_bytes(mask_bytes)
+        artifacts.append(f"{prefix}mask")
+
+    # Normalize results; artifacts are referenced by name only
+    normalized = normalize_result(
+        result=raw_result.get("results", {}),
+        task=task,
+        model=model,
+        artifacts=artifacts,
+    )
+    normalized["cache"] = raw_result.get("cache")
+    return normalized
 
 
 def submit_job(task: str, model: str, image_bytes: bytes, params: dict):
     job = create_job(task, model, params)
+    return _enqueue(job, image_bytes, run_job)
 
-    ARTIFACT_ROOT.mkdir(exist_ok=True)
-    job_dir = ARTIFACT_ROOT / job["id"]
-    job_dir.mkdir(exist_ok=True)
-    (job_dir / "original.png").write_bytes(image_bytes)
 
-    thread = threading.Thread(
-        target=run_job,
-        args=(job["id"], image_bytes),
-        daemon=True,
-    )
-    thread.start()
+def submit_multi_job(model: str, image_bytes: bytes, tasks: list[dict]):
+    """
+    One upload, several tasks. `tasks` is [{"task": ..., "text_input": ...}, ...];
+    the image is stored and decoded once and all tasks run together on the model.
+    """
+    job = create_job(MULTI_TASK, model, {"tasks": tasks, "visualize": False})
+    task_states = [
+        {"task": spec["task"], "status": "queued", "progress": 0, "error": None}
+        for spec in tasks
+    ]
+    job = update_job(job["id"], tasks=task_states)
+    return _enqueue(job, image_bytes, run_multi_job)
+
 
+def _enqueue(job: dict, image_bytes: bytes, runner):
+    model = job["model"]
+    try:
+        info = probe(image_bytes)
+    except ValueError:
+        delete_job(job["id"])
+        raise
+
+    job_dir = create_job_dir(job["id"])
+    # Stored as uploaded, under the extension of its real format
+    (job_dir / f"original{info.extension}").write_bytes(image_bytes)
+
+    try:
+        position = scheduler.submit(model, job["id"], runner, image_bytes)
+    except QueueFullError:
+        # Backpressure: leave no trace of a job that never got queued
+        delete_job(job["id"])
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+
+    job["queue_position"] = position
     return job
 
 
@@ -39,43 +109,74 @@ def run_job(job_id: str, image_bytes: bytes):
         mark_running(job_id)
         registry = ModelRegistry()
 
-        # Run the task
+        # Run the task, reporting tokens/partial text while the model generates
         raw_result = registry.run(
             task=TaskType(job["task"]),
             model=ModelType(job["model"]),
             image_bytes=image_bytes,
+            on_progress=lambda info: update_progress(job_id, info),
             **job["params"],
         )
 
         job_dir = ARTIFACT_ROOT / job_id
+        normalized = _store_task_result(job_dir, job["task"], job["model"], raw_result)
 
-        overlay_bytes = raw_result.get("image_bytes")
-        mask_bytes = raw_result.get("mask_bytes")
-
-        # Save artifacts dynamically
-        artifacts = []
-        if overlay_bytes:
-            overlay_path = job_dir / "overlay.png"
-            overlay_path.write_bytes(overlay_bytes)
-            artifacts.append("overlay")
-        if mask_bytes:
-            mask_path = job_dir / "mask.png"
-            mask_path.write_bytes(mask_bytes)
-            artifacts.append("mask")
-
-        # Normalize results
-        normalized = normalize_result(
-            result=raw_result.get("results", {}),
-            task=job["task"],
-            model=job["model"],
-            image_bytes=overlay_bytes,
-            mask_bytes=mask_bytes,
-        )
+        save_result(job_id, normalized)
 
-        # Include artifact names
-        normalized["artifacts"] = artifacts
+    except Exception as e:
+        mark_failed(job_id, str(e))
+        traceback.print_exc()
 
-        save_result(job_id, normalized)
+
+def run_multi_job(job_id: str, image_bytes: bytes):
+    from app.services.job_manager import get_job
+
+    job = get_job(job_id)
+    if not job:
+        return
+
+    try:
+        mark_running(job_id)
+        update_job(job_id, tasks=[{**t, "status": "running"} for t in job["tasks"]])
+        registry = ModelRegistry()
+        job_dir = ARTIFACT_ROOT / job_id
+        visualize = job["params"].get("visualize", False)
+
+        specs = job["params"]["tasks"]
+        tasks = [
+            (
+                TaskType(spec["task"]),
+                # text_input, plus profile (florence) or the rexomni inputs when given
+                {**{k: v for k, v in spec.items() if k != "task"}, "visualize": visualize},
+            )
+            for spec in specs
+        ]
+
+        # One entry per step, in request order; a task may appear more than
+        # once (e.g. with different prompts), so artifacts are named by step
+        per_step = [None] * len(specs)
+
+        def _on_result(index, raw_result):
+            per_step[index] = _store_task_result(
+                job_dir, specs[index]["task"], job["model"], raw_result, prefix=f"{index}_"
+            )
+            mark_task_done(job_id, index, per_step[index]["artifacts"])
+
+        registry.run_many(
+            tasks,
+            image_bytes=image_bytes,
+            model=ModelType(job["model"]),
+            on_result=_on_result,
+        )
+
+        artifacts = [name for result in per_step for name in result["artifacts"]]
+        save_result(job_id, {
+            "ok": True,
+            "task": MULTI_TASK,
+            "model": job["model"],
+            "results": per_step,
+            "artifacts": artifacts,
+        })
 
     except Exception as e:
         mark_failed(job_id, str(e))
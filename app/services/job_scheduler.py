@@ -0,0 +1,162 @@
+# app/services/job_scheduler.py
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable
+
+
+def _parse_workers(spec: str) -> dict[str, int]:
+    """Parse "florence=1,rexomni=2" into {"florence": 1, "rexomni": 2}."""
+    workers = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        lane, count = item.split("=", 1)
+        workers[lane.strip()] = max(1, int(count))
+    return workers
+
+
+# Max jobs waiting per lane before submissions are rejected
+MAX_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "64"))
+# Inference workers per lane (one lane per model/device). Florence and
+# RexOmni get several so concurrent jobs can be grouped into batched calls.
+DEFAULT_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+LANE_WORKERS = _parse_workers(os.getenv("JOB_LANE_WORKERS", "florence=4,rexomni=4"))
+
+
+class QueueFullError(Exception):
+    def __init__(self, lane: str, depth: int):
+        super().__init__(f"Job queue for {lane} is full ({depth} waiting)")
+        self.lane = lane
+        self.depth = depth
+
+
+class _Lane:
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending: deque = deque()
+        self.cond = threading.Condition()
+        self.running = 0
+        self.completed = 0
+        self.wait_times: deque = deque(maxlen=200)
+        self.threads: list[threading.Thread] = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work,
+                name=f"job-worker-{self.name}-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def _work(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                job_id, fn, args, enqueued_at = self.pending.popleft()
+                self.running += 1
+                self.wait_times.append(time.monotonic() - enqueued_at)
+
+            try:
+                fn(job_id, *args)
+            except Exception:
+                # fn is expected to record its own failure; never kill the worker
+                traceback.print_exc()
+            finally:
+                with self.cond:
+                    self.running -= 1
+                    self.completed += 1
+
+    def position(self, job_id: str) -> int | None:
+        with self.cond:
+            for index, entry in enumerate(self.pending):
+                if entry[0] == job_id:
+                    return index + 1
+        return None
+
+    def stats(self) -> dict:
+        with self.cond:
+            waits = list(self.wait_times)
+            return {
+                "lane": self.name,
+                "workers": self.workers,
+                "queue_depth": len(self.pending),
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "completed": self.completed,
+                "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            }
+
+
+class JobScheduler:
+    """
+    Bounded job queue with a fixed pool of inference workers per lane.
+
+    A lane is one model/device pair; its workers are the only threads that
+    call into that model, so a burst of submissions queues up instead of
+    running concurrently on the device.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = MAX_QUEUE_SIZE,
+        default_workers: int = DEFAULT_WORKERS,
+        lane_workers: dict[str, int] | None = None,
+    ):
+        self.max_queue = max_queue
+        self.default_workers = default_workers
+        self.lane_workers = lane_workers if lane_workers is not None else LANE_WORKERS
+        self._lanes: dict[str, _Lane] = {}
+        self._lock = threading.Lock()
+
+    def _lane(self, name: str) -> _Lane:
+        with self._lock:
+            lane = self._lanes.get(name)
+            if lane is None:
+                workers = self.lane_workers.get(name, self.default_workers)
+                lane = _Lane(name, workers, self.max_queue)
+                lane.start()
+                self._lanes[name] = lane
+            return lane
+
+    def submit(self, lane_name: str, job_id: str, fn: Callable, *args) -> int:
+        """
+        Queue fn(job_id, *args) on the lane.
+        Returns the 1-based queue position; raises QueueFullError when full.
+        """
+        lane = self._lane(lane_name)
+        with lane.cond:
+            if len(lane.pending) >= lane.max_queue:
+                raise QueueFullError(lane_name, len(lane.pending))
+            lane.pending.append((job_id, fn, args, time.monotonic()))
+            position = len(lane.pending)
+            lane.cond.notify()
+        return position
+
+    def position(self, lane_name: str, job_id: str) -> int | None:
+        lane = self._lanes.get(lane_name)
+        return lane.position(job_id) if lane else None
+
+    def stats(self, lane_name: str | None = None) -> dict:
+        if lane_name is not None:
+            lane = self._lanes.get(lane_name)
+            return lane.stats() if lane else {
+                "lane": lane_name,
+                "workers": self.lane_workers.get(lane_name, self.default_workers),
+                "queue_depth": 0,
+                "max_queue": self.max_queue,
+                "running": 0,
+                "completed": 0,
+                "avg_wait_seconds": 0.0,
+            }
+        return {name: lane.stats() for name, lane in self._lanes.items()}
+
+
+scheduler = JobScheduler()
@@ -0,0 +1,328 @@
+# app/services/job_store.py
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+
+# Backend for job records: "sqlite" (persistent) or "memory"
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "sqlite")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "job_artifacts/jobs.sqlite3")
+# Number of job records kept hot in RAM in front of the backend
+JOB_CACHE_SIZE = int(os.getenv("JOB_CACHE_SIZE", "256"))
+# Finished jobs (and their artifacts) older than this are evicted
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+JOB_EVICT_INTERVAL = float(os.getenv("JOB_EVICT_INTERVAL", "600"))
+# Artifact dirs without a job record are removed once untouched this long
+JOB_ORPHAN_GRACE_SECONDS = float(os.getenv("JOB_ORPHAN_GRACE_SECONDS", "3600"))
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+# Written into every artifact dir a store creates, holding the store's name;
+# the orphan sweep never touches dirs without it (committed samples etc.)
+ARTIFACT_MARKER = ".job-store"
+
+
+def worker_id() -> str:
+    """Identity of the current worker process: "<host>:<pid>"."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def worker_alive(worker: str | None) -> bool:
+    """
+    Whether the worker process is still running. Workers on other hosts
+    can't be checked and count as alive; records without one as dead.
+    """
+    if not worker:
+        return False
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore(ABC):
+    """Storage for job records. Records are plain JSON-serializable dicts."""
+
+    # Identifies the records' home; stores with the same name share records
+    name: str
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict | None:
+        pass
+
+    @abstractmethod
+    def put(self, job: dict):
+        pass
+
+    @abstractmethod
+    def update(self, job_id: str, **fields) -> dict | None:
+        pass
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        pass
+
+    @abstractmethod
+    def expired(self, before: float) -> list[str]:
+        """Ids of finished jobs created before the `before` timestamp."""
+        pass
+
+    @abstractmethod
+    def unfinished(self) -> list[str]:
+        pass
+
+
+class MemoryJobStore(JobStore):
+
+    def __init__(self):
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        # Records live and die with this process
+        self.name = f"memory:{worker_id()}"
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def put(self, job):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            return dict(job)
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def expired(self, before):
+        with self._lock:
+            return [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in FINISHED_STATES and job["created_at"] < before
+            ]
+
+    def unfinished(self):
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if job["status"] not in FINISHED_STATES]
+
+
+class SQLiteJobStore(JobStore):
+    """Embedded SQLite backend (WAL) indexed by status and created_at."""
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.name = f"sqlite:{Path(path).resolve()}"
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at)")
+
+    def _write(self, job: dict):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+            (job["id"], job["status"], job["created_at"], time.time(), json.dumps(job)),
+        )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, job):
+        with self._lock:
+            self._write(job)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = json.loads(row[0])
+            job.update(fields)
+            self._write(job)
+            return job
+
+    def delete(self, job_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def expired(self, before):
+        placeholders = ",".join("?" for _ in FINISHED_STATES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE created_at < ? AND status IN ({placeholders})",
+                (before, *FINISHED_STATES),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def unfinished(self):
+        placeholders = ",".join("?" for _ in FINISHED_STATES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE status NOT IN ({placeholders})",
+                FINISHED_STATES,
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+class LRUJobStore(JobStore):
+    """Write-through LRU cache of recent job records in front of a backend."""
+
+    def __init__(self, backend: JobStore, capacity: int = JOB_CACHE_SIZE):
+        self.backend = backend
+        self.name = backend.name
+        self.capacity = capacity
+        self._cache: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, job: dict):
+        self._cache[job["id"]] = job
+        self._cache.move_to_end(job["id"])
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._cache.get(job_id)
+            if job is not None:
+                self._cache.move_to_end(job_id)
+                return dict(job)
+
+        job = self.backend.get(job_id)
+        if job is not None:
+            with self._lock:
+                self._remember(job)
+            return dict(job)
+        return None
+
+    def put(self, job):
+        self.backend.put(job)
+        with self._lock:
+            self._remember(dict(job))
+
+    def update(self, job_id, **fields):
+        job = self.backend.update(job_id, **fields)
+        if job is None:
+            return None
+        with self._lock:
+            self._remember(dict(job))
+        return dict(job)
+
+    def delete(self, job_id):
+        self.backend.delete(job_id)
+        with self._lock:
+            self._cache.pop(job_id, None)
+
+    def expired(self, before):
+        return self.backend.expired(before)
+
+    def unfinished(self):
+        return self.backend.unfinished()
+
+
+def build_job_store(backend: str = JOB_STORE_BACKEND) -> JobStore:
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "sqlite":
+        return LRUJobStore(SQLiteJobStore(JOB_STORE_PATH))
+    raise ValueError(f"Unknown job store backend: {backend}")
+
+
+def evict_expired(store: JobStore, artifact_root: Path, ttl: float = JOB_TTL_SECONDS) -> list[str]:
+    """Delete finished jobs older than `ttl` seconds together with their artifact dirs."""
+    evicted = store.expired(time.time() - ttl)
+    for job_id in evicted:
+        store.delete(job_id)
+        shutil.rmtree(artifact_root / job_id, ignore_errors=True)
+    if evicted:
+        print(f"[JobStore] Evicted {len(evicted)} expired jobs")
+    return evicted
+
+
+def create_artifact_dir(store: JobStore, artifact_root: Path, job_id: str) -> Path:
+    """Create a job's artifact dir, marked as belonging to `store`."""
+    job_dir = artifact_root / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+    (job_dir / ARTIFACT_MARKER).write_text(store.name)
+    return job_dir
+
+
+def _owned(store: JobStore, owner: str) -> bool:
+    if owner == store.name:
+        return True
+    # The memory store of a worker that has exited left no records behind
+    return owner.startswith("memory:") and not worker_alive(owner.removeprefix("memory:"))
+
+
+def sweep_orphans(store: JobStore, artifact_root: Path, grace: float = JOB_ORPHAN_GRACE_SECONDS) -> list[str]:
+    """
+    Delete artifact dirs created by this store that no job record points at
+    (records removed by hand, interrupted deletes) and dirs left by the memory
+    store of an exited worker. Dirs without the marker are never touched.
+    """
+    if not artifact_root.is_dir():
+        return []
+    cutoff = time.time() - grace
+    swept = []
+    for path in artifact_root.iterdir():
+        try:
+            if not path.is_dir() or path.stat().st_mtime > cutoff:
+                continue
+            owner = (path / ARTIFACT_MARKER).read_text()
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        if not _owned(store, owner):
+            continue
+        if owner != store.name or store.get(path.name) is None:
+            shutil.rmtree(path, ignore_errors=True)
+            swept.append(path.name)
+    if swept:
+        print(f"[JobStore] Removed {len(swept)} orphaned artifact dirs")
+    return swept
+
+
+def start_janitor(store: JobStore, artifact_root: Path, interval: float = JOB_EVICT_INTERVAL):
+    def _loop():
+        while True:
+            try:
+                evict_expired(store, artifact_root)
+                sweep_orphans(store, artifact_root)
+            except Exception as exc:
+                print(f"[JobStore] Eviction failed: {exc}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_loop, name="job-store-janitor", daemon=True)
+    thread.start()
+    return thread
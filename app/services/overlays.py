@@ -0,0 +1,167 @@
+# app/services/overlays.py
+"""
+Lazily rendered job overlays.
+
+Jobs store only their annotations ({prefix}annotations.json next to the
+uploaded original). An overlay artifact is drawn the first time it is
+requested and kept as {name}.png in the job directory. Rendered files are
+tracked least-recently-used and deleted once together they exceed
+OVERLAY_CACHE_BYTES; the next request draws them again. Files left by a
+previous process are picked up at startup, oldest first.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.services.job_manager import ARTIFACT_ROOT
+from inference.registry.model_registry import ModelRegistry, ModelType, TaskType
+
+OVERLAY_CACHE_BYTES = int(os.getenv("OVERLAY_CACHE_BYTES", str(512 * 1024 ** 2)))
+
+OVERLAY = "overlay"
+
+
+def is_overlay(name: str) -> bool:
+    return name == OVERLAY or name.endswith(f"_{OVERLAY}")
+
+
+def annotations_path(job_dir: Path, prefix: str = "") -> Path:
+    return job_dir / f"{prefix}annotations.json"
+
+
+def write_annotations(job_dir: Path, task: str, model: str, results, prefix: str = ""):
+    """Persist what an overlay needs: the task, the model and its raw results."""
+    annotations_path(job_dir, prefix).write_text(
+        json.dumps({"task": task, "model": model, "results": results}, default=str)
+    )
+
+
+def original_path(job_dir: Path) -> Path:
+    """The uploaded image, stored as original.<ext> (original.png by older versions)."""
+    for path in sorted(job_dir.glob("original.*")):
+        return path
+    raise FileNotFoundError(f"No original image in {job_dir}")
+
+
+class OverlayCache:
+
+    def __init__(self, max_bytes: int = OVERLAY_CACHE_BYTES, root: Path = ARTIFACT_ROOT):
+        self.max_bytes = max_bytes
+        self.root = root
+        # rendered file -> size, least recently used first
+        self._files: OrderedDict[Path, int] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # One render per file at a time; later callers wait and reuse it
+        self._rendering: dict[Path, threading.Lock] = {}
+
+        self.hits = 0
+        self.renders = 0
+        self.evictions = 0
+
+        self._scan()
+
+    def _scan(self):
+        """Track overlays already on disk, least recently modified first."""
+        found = []
+        for path in self.root.glob(f"*/*{OVERLAY}.png"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, path, stat.st_size))
+        with self._lock:
+            for _, path, size in sorted(found):
+                self._files[path] = size
+                self._bytes += size
+            self._evict()
+
+    def get(self, job: dict, name: str) -> Path:
+        """
+        Path of overlay `name` for `job`, rendering it on first request.
+        The file may be evicted once this returns; use read() to serve it.
+        """
+        path = self.root / job["id"] / f"{name}.png"
+        with self._lock:
+            render_lock = self._rendering.setdefault(path, threading.Lock())
+
+        try:
+            with render_lock:
+                if path.exists():
+                    self._remember(path, hit=True)
+                    return path
+                self._render(job, name, path)
+                self._remember(path, hit=False)
+                return path
+        finally:
+            with self._lock:
+                self._rendering.pop(path, None)
+
+    def read(self, job: dict, name: str, attempts: int = 3) -> tuple[bytes, os.stat_result]:
+        """
+        Bytes and stat of overlay `name`. An open file survives eviction, and
+        one evicted between lookup and open is drawn again.
+        """
+        for _ in range(attempts):
+            path = self.get(job, name)
+            try:
+                with path.open("rb") as f:
+                    return f.read(), os.fstat(f.fileno())
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(f"{name} was evicted while being read")
+
+    def _render(self, job: dict, name: str, path: Path):
+        job_dir = path.parent
+        prefix = name[: -len(OVERLAY)]
+        try:
+            annotations = json.loads(annotations_path(job_dir, prefix).read_text())
+            image_bytes = original_path(job_dir).read_bytes()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No annotations stored for {name}")
+
+        png = ModelRegistry.render_overlay(
+            TaskType(annotations["task"]),
+            ModelType(annotations["model"]),
+            image_bytes,
+            annotations["results"],
+        )
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(png)
+        tmp.replace(path)
+
+    def _remember(self, path: Path, hit: bool):
+        size = path.stat().st_size
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.renders += 1
+            self._bytes += size - self._files.pop(path, 0)
+            self._files[path] = size
+            self._evict()
+
+    def _evict(self):
+        # Never evict the most recently used file, the one about to be served
+        while self._bytes > self.max_bytes and len(self._files) > 1:
+            victim, victim_size = self._files.popitem(last=False)
+            self._bytes -= victim_size
+            self.evictions += 1
+            victim.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "renders": self.renders,
+                "evictions": self.evictions,
+            }
+
+
+overlay_cache = OverlayCache()
@@ -0,0 +1,144 @@
+# app/services/responses.py
+"""
+Response bodies for the synchronous /vision routes.
+
+Results used to travel in a response header (X-Florence-Results,
+X-Rex-Detections) next to the rendered image, which breaks on busy images
+once the header outgrows proxy/uvicorn limits. Routes now pick a
+`response_mode`:
+
+- "image": the legacy image body with results in a header (default, so
+  existing clients keep working)
+- "multipart": multipart/mixed body, a JSON part with the results followed
+  by the image part
+- "json": JSON body; the image is kept briefly in memory and referenced by
+  URL (GET /vision/renders/{id})
+
+New clients opt in to "multipart" or "json".
+
+JSON goes through dumps(), which uses orjson when it is installed.
+"""
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+RESPONSE_MODES = ("multipart", "json", "image")
+DEFAULT_RESPONSE_MODE = os.getenv("VISION_RESPONSE_MODE", "image")
+RESPONSE_MODE_FORM = "multipart (JSON + image parts) | json (image by URL) | image (legacy, results in a header)"
+# Budget for images held for "json" mode responses
+RENDER_STORE_BYTES = int(os.getenv("RENDER_STORE_BYTES", str(128 * 1024 ** 2)))
+RENDERS_PREFIX = "/vision/renders"
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=str, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def check_mode(mode: str | None) -> str:
+    """Resolve a requested response_mode; ValueError for unknown ones."""
+    mode = mode or DEFAULT_RESPONSE_MODE
+    if mode not in RESPONSE_MODES:
+        raise ValueError(f"Invalid response_mode; expected one of {list(RESPONSE_MODES)}")
+    return mode
+
+
+class RenderStore:
+    """Rendered images awaiting download, least recently stored evicted first."""
+
+    def __init__(self, max_bytes: int = RENDER_STORE_BYTES):
+        self.max_bytes = max_bytes
+        self._images: OrderedDict[str, tuple[bytes, str]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, image_bytes: bytes, media_type: str) -> str:
+        render_id = uuid.uuid4().hex
+        with self._lock:
+            self._images[render_id] = (image_bytes, media_type)
+            self._bytes += len(image_bytes)
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, (evicted, _) = self._images.popitem(last=False)
+                self._bytes -= len(evicted)
+        return render_id
+
+    def get(self, render_id: str) -> tuple[bytes, str] | None:
+        with self._lock:
+            return self._images.get(render_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"images": len(self._images), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+render_store = RenderStore()
+
+
+def _multipart(payload, image_bytes: bytes, media_type: str, boundary: str):
+    body = dumps(payload)
+    yield (
+        f"--{boundary}\r\n"
+        "Content-Type: application/json\r\n"
+        'Content-Disposition: inline; name="results"\r\n'
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode()
+    yield body
+    yield (
+        f"\r\n--{boundary}\r\n"
+        f"Content-Type: {media_type}\r\n"
+        'Content-Disposition: inline; name="image"\r\n'
+        f"Content-Length: {len(image_bytes)}\r\n\r\n"
+    ).encode()
+    yield image_bytes
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+def result_response(
+    mode: str,
+    payload: dict,
+    image_bytes: bytes | None,
+    media_type: str,
+    legacy_header: str,
+    headers: dict | None = None,
+):
+    """
+    Build the response for `payload` (the JSON results) and an optional
+    rendered image. Without an image every mode answers with plain JSON.
+    `legacy_header` names the header carrying the results in "image" mode.
+    """
+    headers = dict(headers or {})
+    if not image_bytes:
+        return FastJSONResponse(payload, headers=headers)
+
+    if mode == "image":
+        headers[legacy_header] = dumps(payload["results"]).decode()
+        return StreamingResponse(iter([image_bytes]), media_type=media_type, headers=headers)
+
+    if mode == "json":
+        render_id = render_store.put(image_bytes, media_type)
+        image = {"url": f"{RENDERS_PREFIX}/{render_id}", "media_type": media_type, "size": len(image_bytes)}
+        return FastJSONResponse({**payload, "image": image}, headers=headers)
+
+    boundary = uuid.uuid4().hex
+    return StreamingResponse(
+        _multipart(payload, image_bytes, media_type, boundary),
+        media_type=f"multipart/mixed; boundary={boundary}",
+        headers=headers,
+    )
@@ -1,30 +1,38 @@
 # app/services/result_serializer.py
-import base64
+# Tasks whose results are not drawn as an overlay
+NO_OVERLAY_TASKS = {"region_category", "region_proposal"}
 
-def normalize_result(result: dict, task: str, model: str, image_bytes: bytes | None = None, mask_bytes: bytes | None = None):
+def normalize_result(result: dict, task: str, model: str, artifacts=()):
     """
     Converts Florence raw output into a unified format for all tasks.
+    Binary outputs are never embedded; `artifacts` names them and they are
+    served from /api/jobs/{id}/artifacts/{name}.
     """
     normalized = {
         "ok": True,
         "task": task,
         "model": model,
-        "image_bytes": base64.b64encode(image_bytes).decode() if image_bytes else None,
-        "mask_bytes": base64.b64encode(mask_bytes).decode() if mask_bytes else None,
         "results": {},
-        "artifacts": [],
+        "artifacts": list(artifacts),
     }
 
-    if image_bytes:
-        normalized["artifacts"].append("overlay")
-    if mask_bytes:
-        normalized["artifacts"].append("mask")
-
     if not result:
         return normalized
 
     task_lower = task.lower()
 
+    # RexOmni: a flat list of entries ({"label", "bbox", "score", ...})
+    if isinstance(result, list):
+        if task_lower == "detection":
+            normalized["results"] = {
+                "bboxes": [d.get("bbox", []) for d in result],
+                "labels": [d.get("label") for d in result],
+                "scores": [d.get("score") for d in result],
+            }
+        else:
+            normalized["results"] = result
+        return normalized
+
     # Detection tasks
     if task_lower in {"detection", "object_detection", "open_vocab_detection", "open_vocabulary_detection"}:
         normalized["results"] = {
@@ -42,7 +50,7 @@ def normalize_result(result: dict, task: str, model: str, image_bytes: bytes | N
             "masks": result.get("masks", {}),
         }
 
-    elif task_lower in {"region_category", "region_proposal"}:
+    elif task_lower in NO_OVERLAY_TASKS:
         # No image output by default
         normalized["results"] = result["results"]
         normalized["artifacts"] = []  # ensure no overlay/mask
@@ -53,3 +61,34 @@ def normalize_result(result: dict, task: str, model: str, image_bytes: bytes | N
         normalized["results"] = result
 
     return normalized
+
+
+def extract_detections(raw_result) -> list[dict]:
+    """
+    Flatten a raw adapter result into [{"label", "bbox", "score"}, ...].
+    Handles RexOmni's {"results": [...]} (or bare list) output and Florence's {"results": {"<TASK>": {...}}} dicts.
+    """
+    if isinstance(raw_result, dict) and isinstance(raw_result.get("results"), list):
+        raw_result = raw_result["results"]
+    if isinstance(raw_result, list):
+        return [
+            {"label": d.get("label"), "bbox": d.get("bbox", []), "score": d.get("score")}
+            for d in raw_result
+            if isinstance(d, dict) and d.get("bbox")
+        ]
+
+    detections = []
+    results = raw_result.get("results", raw_result) if isinstance(raw_result, dict) else {}
+    for value in results.values():
+        if not isinstance(value, dict):
+            continue
+        bboxes = value.get("bboxes", [])
+        labels = value.get("labels", value.get("bboxes_labels", []))
+        scores = value.get("scores", [])
+        for index, bbox in enumerate(bboxes):
+            detections.append({
+                "label": labels[index] if index < len(labels) else None,
+                "bbox": list(bbox),
+                "score": scores[index] if index < len(scores) else None,
+            })
+    return detections
@@ -1,4 +1,5 @@
 // src/hooks/useJobPoll.js
+// Follows a job over its SSE stream (see waitForJob); polls only as a fallback
 import { useEffect, useRef, useState } from "react";
 import { waitForJob } from "../services/api";
 
@@ -38,12 +39,12 @@ export default function useJobPoll(jobId, options = {}) {
       } catch (err) {
         if (cancelledRef.current) return;
 
-        console.error("[useJobPoll] Polling failed:", err);
+        console.error("[useJobPoll] Waiting for job failed:", err);
 
         setError(
           err?.response?.data?.detail ||
           err?.message ||
-          "Network error while polling job"
+          "Network error while waiting for job"
         );
         setStatus("failed");
       }
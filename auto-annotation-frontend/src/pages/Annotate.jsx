@@ -15,7 +15,12 @@ export default function Annotate() {
       {error && <p className="text-red-600 mb-4">{error}</p>}
 
       {status === "running" && (
-        <p className="text-gray-600">Processing…</p>
+        <div className="space-y-2">
+          <p className="text-gray-600">Processing… {job?.progress ?? 0}%</p>
+          {job?.partial && (
+            <p className="text-gray-800 italic whitespace-pre-wrap">{job.partial}</p>
+          )}
+        </div>
       )}
 
       {status === "completed" && result && (
@@ -65,6 +65,8 @@ function normalizeJob(raw) {
       raw.status === "completed" ??
       false,
     artifacts: raw.artifacts ?? [],
+    // Text decoded so far while the model is still generating
+    partial: raw.partial ?? raw.generation?.partial ?? null,
     raw,
   };
 }
@@ -81,9 +83,15 @@ function normalizeJobResult(payload) {
   // Florence sometimes returns direct dict results
   const annotations = payload.annotations ?? payload.results ?? payload;
 
+  const artifacts = payload.artifacts ?? {};
+
+  // Binary artifacts are referenced by URL ({url, size, etag}); the
+  // overlay is rendered by the server on first request
   let imageUrl = null;
-  if (annotations?.image_bytes) {
-    imageUrl = `data:image/png;base64,${annotations.image_bytes}`;
+  if (payload.inline?.overlay) {
+    imageUrl = `data:image/png;base64,${payload.inline.overlay}`;
+  } else if (artifacts.overlay) {
+    imageUrl = `${BASE_URL}${artifacts.overlay.url}`;
   }
 
   return {
@@ -93,8 +101,8 @@ function normalizeJobResult(payload) {
     ok: annotations?.ok ?? true,
     results: annotations?.results ?? annotations,
     imageUrl,
-    maskBytes: annotations?.mask_bytes ?? null,
-    artifacts: payload.artifacts ?? {},
+    maskUrl: artifacts.mask ? `${BASE_URL}${artifacts.mask.url}` : null,
+    artifacts,
     raw: payload,
   };
 }
@@ -124,6 +132,11 @@ export async function submitJob(file, task, model, dynamicInputs = {}) {
     formData.append("text_input", dynamicInputs.text_input);
   }
 
+  if (dynamicInputs.profile) {
+    // Florence generation profile: "fast" | "quality"
+    formData.append("profile", dynamicInputs.profile);
+  }
+
   if (dynamicInputs.categories) {
     const csv = Array.isArray(dynamicInputs.categories)
       ? dynamicInputs.categories.join(",")
@@ -150,13 +163,124 @@ export function getArtifactUrl(jobId, name) {
 }
 
 /* ------------------------------------------------------------------ */
-/* Polling                                                            */
+/* Event stream (SSE)                                                 */
+/* ------------------------------------------------------------------ */
+
+const JOB_EVENT_TYPES = ["snapshot", "state", "progress", "task", "artifact", "error"];
+
+/**
+ * Subscribe to server-pushed events for one or more jobs.
+ * onEvent receives the parsed event ({ type, job_id, ... }).
+ * Returns an unsubscribe function.
+ */
+export function streamJobs(jobIds, { onEvent, onError } = {}) {
+  const ids = Array.isArray(jobIds) ? jobIds : [jobIds];
+  const url =
+    ids.length === 1
+      ? `${BASE_URL}/api/jobs/${ids[0]}/events`
+      : `${BASE_URL}/api/jobs/events?ids=${ids.map(encodeURIComponent).join(",")}`;
+
+  const source = new EventSource(url);
+  const handler = (e) => onEvent?.(JSON.parse(e.data));
+  JOB_EVENT_TYPES.forEach((type) => source.addEventListener(type, handler));
+  source.onerror = (err) => onError?.(err, source);
+
+  return () => source.close();
+}
+
+/**
+ * Fold an event into the last known job metadata
+ */
+function applyJobEvent(job, event) {
+  if (event.type === "snapshot") {
+    return normalizeJob(event);
+  }
+
+  const raw = { ...(job?.raw ?? {}), id: event.job_id };
+  if (event.status) raw.status = event.status;
+  if (event.progress !== undefined) raw.progress = event.progress;
+  if (event.error !== undefined) raw.error = event.error;
+  if (event.tasks) raw.tasks = event.tasks;
+  if (event.partial !== undefined) raw.partial = event.partial;
+  if (event.type === "artifact") {
+    raw.artifacts = [...new Set([...(raw.artifacts ?? []), event.name])];
+  }
+  raw.status = raw.status ?? "queued";
+  return normalizeJob(raw);
+}
+
+function waitForJobEvents(jobId, { timeout, onProgress }) {
+  return new Promise((resolve, reject) => {
+    let job = null;
+    let settled = false;
+
+    const finish = (fn, value) => {
+      if (settled) return;
+      settled = true;
+      clearTimeout(timer);
+      close();
+      fn(value);
+    };
+
+    const timer = setTimeout(
+      () => finish(reject, new Error("Job stream timeout")),
+      timeout
+    );
+
+    const close = streamJobs(jobId, {
+      onEvent: async (event) => {
+        if (event.type === "error") {
+          finish(reject, new Error(event.detail || "Job not found"));
+          return;
+        }
+
+        job = applyJobEvent(job, event);
+        onProgress?.(job);
+
+        if (job.status === "failed") {
+          finish(reject, new Error(job.error || "Job failed"));
+        } else if (job.status === "completed") {
+          try {
+            const result = await getJobResult(jobId);
+            finish(resolve, { job, result });
+          } catch (err) {
+            finish(reject, err);
+          }
+        }
+      },
+      onError: () => {
+        // Stream never opened (proxy, old backend): let the caller poll instead
+        if (!job) {
+          const err = new Error("Job event stream unavailable");
+          err.fallback = true;
+          finish(reject, err);
+        }
+        // Otherwise EventSource reconnects on its own
+      },
+    });
+  });
+}
+
+/* ------------------------------------------------------------------ */
+/* Waiting (events first, polling fallback)                           */
 /* ------------------------------------------------------------------ */
 
 export async function waitForJob(
   jobId,
   { interval = 2000, timeout = 120000, onProgress } = {}
 ) {
+  if (typeof EventSource !== "undefined") {
+    try {
+      return await waitForJobEvents(jobId, { timeout, onProgress });
+    } catch (err) {
+      if (!err.fallback) throw err;
+      console.warn("[API] Event stream unavailable, falling back to polling");
+    }
+  }
+  return pollJob(jobId, { interval, timeout, onProgress });
+}
+
+async function pollJob(jobId, { interval, timeout, onProgress }) {
   const start = Date.now();
 
   while (true) {
@@ -0,0 +1,11 @@
+from labeling_client.client import LabelingClient, JobFailed
+from labeling_client.models import Detection, DetectionResult, Job, JobResult, TaskResult
+from labeling_client.retry import APIError, RetryPolicy
+
+
+def __getattr__(name):
+    # httpx is an optional dependency; only import the async client on demand
+    if name == "AsyncLabelingClient":
+        from labeling_client.aio import AsyncLabelingClient
+        return AsyncLabelingClient
+    raise AttributeError(name)
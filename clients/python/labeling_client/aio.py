@@ -0,0 +1,243 @@
+"""
+asyncio client (requires the `async` extra: httpx).
+
+Same surface as LabelingClient; a single httpx.AsyncClient keeps a bounded
+connection pool and a semaphore caps requests in flight.
+"""
+
+import asyncio
+import json
+from typing import Awaitable, Callable, Iterable
+
+import httpx
+
+from labeling_client.client import DEFAULT_BASE_URL, JobFailed, parse_sse, parse_vision_response, read_image
+from labeling_client.models import DetectionResult, Job, JobResult, TaskResult, parse_rexomni
+from labeling_client.retry import IDEMPOTENT_METHODS, APIError, RetryPolicy, error_detail
+
+# Failures before the request reached the server; safe to retry for any method
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class AsyncLabelingClient:
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        *,
+        max_in_flight: int = 8,
+        timeout: float = 120.0,
+        retry: RetryPolicy | None = None,
+        rexomni_prefix: str = "/vision/rexomni",
+        florence_prefix: str = "/vision/florence",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_in_flight = max_in_flight
+        self.retry = retry or RetryPolicy()
+        self.rexomni_prefix = rexomni_prefix
+        self.florence_prefix = florence_prefix
+
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight),
+        )
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    # -----------------------------
+    # Transport
+    # -----------------------------
+    async def _request(self, method: str, path: str, *, image=None, data=None, params=None, json_body=None):
+        upload = read_image(image) if image is not None else None
+        idempotent = method in IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            files = {"file": upload} if upload else None
+            try:
+                async with self._slots:
+                    response = await self.http.request(
+                        method, path, files=files, data=data, params=params, json=json_body
+                    )
+            except httpx.TransportError as exc:
+                if not (idempotent or isinstance(exc, NOT_SENT_ERRORS)) or not self.retry.should_retry(attempt, None):
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if response.is_success:
+                return response
+            if not self.retry.should_retry(attempt, response.status_code, idempotent):
+                raise APIError(response.status_code, error_detail(response), self.base_url + path)
+            await asyncio.sleep(self.retry.delay(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+
+    # -----------------------------
+    # RexOmni
+    # -----------------------------
+    async def detect(self, image, categories: list[str] | None = None, with_image: bool = True) -> DetectionResult:
+        # httpx takes repeated form fields as a list value
+        mode = "multipart" if with_image else "json"
+        data = {"categories": list(categories or []), "response_mode": mode}
+        response = await self._request("POST", f"{self.rexomni_prefix}/detection", image=image, data=data)
+        payload, image_bytes = parse_vision_response(response, "X-Rex-Detections")
+        raw = payload.get("results") or []
+        return DetectionResult(parse_rexomni(raw), image_bytes, raw)
+
+    async def keypoint(self, image, keypoint_type: str = "human_pose", categories: list[str] | None = None) -> TaskResult:
+        data = {"keypoint_type": keypoint_type, "categories": list(categories or [])}
+        body = (await self._request("POST", f"{self.rexomni_prefix}/keypoint", image=image, data=data)).json()
+        return TaskResult(body.get("task"), body.get("results"), raw=body)
+
+    async def detect_keypoints(
+        self, image, categories: list[str] | None = None, keypoint_type: str = "human_pose", max_boxes: int | None = None
+    ) -> TaskResult:
+        data = {"keypoint_type": keypoint_type, "categories": list(categories or [])}
+        if max_boxes is not None:
+            data["max_boxes"] = str(max_boxes)
+        body = (await self._request("POST", f"{self.rexomni_prefix}/detection_keypoint", image=image, data=data)).json()
+        return TaskResult(body.get("task"), body.get("results"), raw=body)
+
+    async def ocr(self, image, output_format: str = "Box", granularity: str = "Word Level") -> TaskResult:
+        data = {"ocr_output_format": output_format, "ocr_granularity": granularity}
+        body = (await self._request("POST", f"{self.rexomni_prefix}/ocr", image=image, data=data)).json()
+        return TaskResult(body.get("task"), body.get("results"), raw=body)
+
+    async def visual_prompting(self, image, boxes: list[list[float]], categories: list[str] | None = None) -> TaskResult:
+        data = {"visual_prompt_boxes": json.dumps(boxes), "categories": list(categories or [])}
+        body = (await self._request("POST", f"{self.rexomni_prefix}/visual_prompting", image=image, data=data)).json()
+        return TaskResult(body.get("task"), body.get("results"), raw=body)
+
+    # -----------------------------
+    # Florence
+    # -----------------------------
+    async def florence(
+        self, endpoint: str, image, text_input: str | None = None, visualize: bool = False, profile: str | None = None
+    ) -> TaskResult:
+        data = {"visualize": str(visualize).lower(), "response_mode": "multipart"}
+        if text_input is not None:
+            data["text_input"] = text_input
+        if profile is not None:
+            data["profile"] = profile
+        response = await self._request("POST", f"{self.florence_prefix}/{endpoint}", image=image, data=data)
+
+        payload, image_bytes = parse_vision_response(response, "X-Florence-Results")
+        cache = payload.get("cache") or response.headers.get("X-Cache")
+        return TaskResult(endpoint, payload.get("results"), image_bytes, cache, payload)
+
+    async def florence_multi(self, image, tasks: list[dict]) -> dict:
+        response = await self._request(
+            "POST", f"{self.florence_prefix}/multi_task", image=image, data={"tasks": json.dumps(tasks)}
+        )
+        return response.json()
+
+    # -----------------------------
+    # Jobs
+    # -----------------------------
+    async def submit_job(
+        self, image, task: str, model: str = "florence", text_input: str | None = None, profile: str | None = None
+    ) -> Job:
+        """`profile` picks a Florence generation profile ("fast" / "quality")."""
+        data = {"task": task, "model": model}
+        if text_input is not None:
+            data["text_input"] = text_input
+        if profile is not None:
+            data["profile"] = profile
+        body = (await self._request("POST", "/api/jobs", image=image, data=data)).json()
+        return Job.from_json({**body, "status": "queued"})
+
+    async def submit_multi_job(self, image, tasks: list[dict], model: str = "florence") -> Job:
+        data = {"model": model, "tasks": json.dumps(tasks)}
+        body = (await self._request("POST", "/api/jobs/multi", image=image, data=data)).json()
+        return Job.from_json({**body, "status": "queued"})
+
+    async def get_job(self, job_id: str) -> Job:
+        return Job.from_json((await self._request("GET", f"/api/jobs/{job_id}")).json())
+
+    async def get_result(self, job_id: str, include: list[str] | None = None) -> JobResult:
+        params = {"include": ",".join(include)} if include else None
+        return JobResult.from_json((await self._request("GET", f"/api/jobs/{job_id}/result", params=params)).json())
+
+    async def get_artifact(self, job_id: str, name: str) -> bytes:
+        return (await self._request("GET", f"/api/jobs/{job_id}/artifacts/{name}")).content
+
+    async def iter_job(self, job_id: str, poll_interval: float = 0.5, timeout: float | None = None):
+        """Async generator yielding the job on every status/progress change until it finishes."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
+        last = None
+        while True:
+            job = await self.get_job(job_id)
+            if (job.status, job.progress) != last:
+                last = (job.status, job.progress)
+                yield job
+            if job.finished:
+                return
+            if deadline and loop.time() > deadline:
+                raise TimeoutError(f"Job {job_id} still {job.status} after {timeout}s")
+            await asyncio.sleep(poll_interval)
+
+    async def events(self, job_ids: list[str] | None = None):
+        """Async generator over the server's SSE stream; see LabelingClient.events."""
+        params = {"ids": ",".join(job_ids)} if job_ids else None
+        timeout = httpx.Timeout(self.http.timeout.connect, read=None)
+        async with self.http.stream("GET", "/api/jobs/events", params=params, timeout=timeout) as response:
+            if not response.is_success:
+                await response.aread()
+                raise APIError(response.status_code, error_detail(response), str(response.url))
+            lines = []
+            async for line in response.aiter_lines():
+                lines.append(line)
+                if not line:
+                    for event in parse_sse(lines):
+                        yield event
+                    lines = []
+
+    async def wait(self, job_id: str, poll_interval: float = 0.5, timeout: float | None = None) -> JobResult:
+        async for job in self.iter_job(job_id, poll_interval, timeout):
+            pass
+        if job.status != "completed":
+            raise JobFailed(job)
+        return await self.get_result(job_id)
+
+    async def run_job(self, image, task: str, model: str = "florence", text_input: str | None = None, **wait_kwargs) -> JobResult:
+        job = await self.submit_job(image, task, model, text_input)
+        return await self.wait(job.id, **wait_kwargs)
+
+    # -----------------------------
+    # Fan-out
+    # -----------------------------
+    async def map(self, fn: Callable[..., Awaitable], items: Iterable):
+        """
+        Async generator: run `await fn(item)` over `items` with at most
+        `max_in_flight` pending; yields (item, result, exception) as they finish.
+        """
+        items = iter(items)
+        pending: dict[asyncio.Task, object] = {}
+
+        def _fill():
+            while len(pending) < self.max_in_flight:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                pending[asyncio.ensure_future(fn(item))] = item
+
+        _fill()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                exc = task.exception()
+                yield item, None if exc else task.result(), exc
+            _fill()
@@ -0,0 +1,330 @@
+"""
+Synchronous client.
+
+One pooled requests.Session is shared by all calls (keep-alive instead of a
+new TCP connection per image), and at most `max_in_flight` requests run at
+once. `map()` fans a function out over a bounded thread pool so a labeling
+loop keeps the server busy instead of waiting on each round trip.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from labeling_client.models import DetectionResult, Job, JobResult, TaskResult, parse_rexomni
+from labeling_client.retry import IDEMPOTENT_METHODS, APIError, RetryPolicy, error_detail
+
+DEFAULT_BASE_URL = os.getenv("LABELING_API_URL", "http://localhost:6996")
+
+
+class JobFailed(Exception):
+
+    def __init__(self, job: Job):
+        super().__init__(f"Job {job.id} {job.status}: {job.error}")
+        self.job = job
+
+
+def read_image(image) -> tuple[str, bytes]:
+    """Accepts a path, raw bytes or a binary file object; returns (filename, bytes)."""
+    if isinstance(image, (str, Path)):
+        path = Path(image)
+        return path.name, path.read_bytes()
+    if isinstance(image, (bytes, bytearray)):
+        return "image", bytes(image)
+    return Path(getattr(image, "name", "image")).name, image.read()
+
+
+def parse_sse(lines: Iterable[str]) -> Iterator[dict]:
+    """Decode `data:` payloads of a text/event-stream; comments (keep-alives) are skipped."""
+    data = []
+    for line in lines:
+        if line:
+            if line.startswith("data:"):
+                data.append(line[5:].lstrip())
+            continue
+        if data:
+            yield json.loads("\n".join(data))
+            data = []
+
+
+def parse_multipart(content: bytes, content_type: str) -> dict[str, tuple[str, bytes]]:
+    """Split a multipart/mixed body into {part name: (content type, body)}."""
+    boundary = content_type.split("boundary=", 1)[1].split(";")[0].strip('"').encode()
+    parts = {}
+    for chunk in content.split(b"--" + boundary)[1:]:
+        if chunk.startswith(b"--"):
+            break
+        # Each part sits between the CRLF ending the delimiter line and the CRLF before the next one
+        head, _, body = chunk[2:-2].partition(b"\r\n\r\n")
+        headers = {}
+        for line in head.decode("latin-1").split("\r\n"):
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+        name = headers.get("content-disposition", "").partition('name="')[2].partition('"')[0]
+        parts[name] = (headers.get("content-type", ""), body)
+    return parts
+
+
+def parse_vision_response(response, legacy_header: str) -> tuple[dict, bytes | None]:
+    """
+    (JSON payload, image bytes or None) of a /vision response: a multipart
+    JSON + image body, plain JSON, or an older server's image with the
+    results in `legacy_header`.
+    """
+    content_type = response.headers.get("content-type", "")
+    if content_type.startswith("multipart/"):
+        parts = parse_multipart(response.content, content_type)
+        return json.loads(parts["results"][1]), parts.get("image", ("", None))[1]
+    if content_type.startswith("image/"):
+        return {"results": json.loads(response.headers.get(legacy_header, "null"))}, response.content
+    return response.json(), None
+
+
+def _never_sent(exc: requests.RequestException) -> bool:
+    """Whether a request failed before reaching the server (refused or timed out connecting)."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class LabelingClient:
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        *,
+        max_in_flight: int = 8,
+        timeout: float = 120.0,
+        retry: RetryPolicy | None = None,
+        rexomni_prefix: str = "/vision/rexomni",
+        florence_prefix: str = "/vision/florence",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.rexomni_prefix = rexomni_prefix
+        self.florence_prefix = florence_prefix
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # -----------------------------
+    # Transport
+    # -----------------------------
+    def _request(self, method: str, path: str, *, image=None, data=None, params=None, json_body=None):
+        url = self.base_url + path
+        upload = read_image(image) if image is not None else None
+        idempotent = method in IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            files = {"file": upload} if upload else None
+            try:
+                with self._slots:
+                    response = self.session.request(
+                        method, url, files=files, data=data, params=params, json=json_body, timeout=self.timeout
+                    )
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if not (idempotent or _never_sent(exc)) or not self.retry.should_retry(attempt, None):
+                    raise
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if response.ok:
+                return response
+            if not self.retry.should_retry(attempt, response.status_code, idempotent):
+                raise APIError(response.status_code, error_detail(response), url)
+            time.sleep(self.retry.delay(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+
+    # -----------------------------
+    # RexOmni
+    # -----------------------------
+    def detect(self, image, categories: list[str] | None = None, with_image: bool = True) -> DetectionResult:
+        """`with_image=False` skips the annotated image (`result.image` is None)."""
+        mode = "multipart" if with_image else "json"
+        data = [("response_mode", mode)] + [("categories", c) for c in categories or []]
+        response = self._request("POST", f"{self.rexomni_prefix}/detection", image=image, data=data)
+        payload, image_bytes = parse_vision_response(response, "X-Rex-Detections")
+        raw = payload.get("results") or []
+        return DetectionResult(parse_rexomni(raw), image_bytes, raw)
+
+    def keypoint(self, image, keypoint_type: str = "human_pose", categories: list[str] | None = None) -> TaskResult:
+        data = [("keypoint_type", keypoint_type)] + [("categories", c) for c in categories or []]
+        body = self._request("POST", f"{self.rexomni_prefix}/keypoint", image=image, data=data).json()
+        return TaskResult(body.get("task"), body.get("results"), raw=body)
+
+    def detect_keypoints(
+        self, image, categories: list[str] | None = None, keypoint_type: str = "human_pose", max_boxes: int | None = None
+    ) -> TaskResult:
+        """Detection then keypoints per box, server side; each detection carries "persons"."""
+        data = [("keypoint_type", keypoint_type)] + [("categories", c) for c in categories or []]
+        if max_boxes is not None:
+            data.append(("max_boxes", str(max_boxes)))
+        body = self._request("POST", f"{self.rexomni_prefix}/detection_keypoint", image=image, data=data).json()
+        return TaskResult(body.get("task"), body.get("results"), raw=body)
+
+    def ocr(self, image, output_format: str = "Box", granularity: str = "Word Level") -> TaskResult:
+        data = {"ocr_output_format": output_format, "ocr_granularity": granularity}
+        body = self._request("POST", f"{self.rexomni_prefix}/ocr", image=image, data=data).json()
+        return TaskResult(body.get("task"), body.get("results"), raw=body)
+
+    def visual_prompting(self, image, boxes: list[list[float]], categories: list[str] | None = None) -> TaskResult:
+        data = [("visual_prompt_boxes", json.dumps(boxes))] + [("categories", c) for c in categories or []]
+        body = self._request("POST", f"{self.rexomni_prefix}/visual_prompting", image=image, data=data).json()
+        return TaskResult(body.get("task"), body.get("results"), raw=body)
+
+    # -----------------------------
+    # Florence
+    # -----------------------------
+    def florence(
+        self, endpoint: str, image, text_input: str | None = None, visualize: bool = False, profile: str | None = None
+    ) -> TaskResult:
+        """`endpoint` is the route name, e.g. "object_detection" or "open_vocab_detection"."""
+        data = {"visualize": str(visualize).lower(), "response_mode": "multipart"}
+        if text_input is not None:
+            data["text_input"] = text_input
+        if profile is not None:
+            data["profile"] = profile
+        response = self._request("POST", f"{self.florence_prefix}/{endpoint}", image=image, data=data)
+
+        payload, image_bytes = parse_vision_response(response, "X-Florence-Results")
+        cache = payload.get("cache") or response.headers.get("X-Cache")
+        return TaskResult(endpoint, payload.get("results"), image_bytes, cache, payload)
+
+    def florence_multi(self, image, tasks: list[dict]) -> dict:
+        """tasks: [{"task": "Caption"}, {"task": "Open Vocabulary Detection", "text_input": "person"}]"""
+        response = self._request(
+            "POST", f"{self.florence_prefix}/multi_task", image=image, data={"tasks": json.dumps(tasks)}
+        )
+        return response.json()
+
+    # -----------------------------
+    # Jobs
+    # -----------------------------
+    def submit_job(
+        self, image, task: str, model: str = "florence", text_input: str | None = None, profile: str | None = None
+    ) -> Job:
+        """`profile` picks a Florence generation profile ("fast" / "quality")."""
+        data = {"task": task, "model": model}
+        if text_input is not None:
+            data["text_input"] = text_input
+        if profile is not None:
+            data["profile"] = profile
+        body = self._request("POST", "/api/jobs", image=image, data=data).json()
+        return Job.from_json({**body, "status": "queued"})
+
+    def submit_multi_job(self, image, tasks: list[dict], model: str = "florence") -> Job:
+        data = {"model": model, "tasks": json.dumps(tasks)}
+        body = self._request("POST", "/api/jobs/multi", image=image, data=data).json()
+        return Job.from_json({**body, "status": "queued"})
+
+    def get_job(self, job_id: str) -> Job:
+        return Job.from_json(self._request("GET", f"/api/jobs/{job_id}").json())
+
+    def get_result(self, job_id: str, include: list[str] | None = None) -> JobResult:
+        """`include` names artifacts (e.g. ["overlay"]) to embed in the response."""
+        params = {"include": ",".join(include)} if include else None
+        return JobResult.from_json(self._request("GET", f"/api/jobs/{job_id}/result", params=params).json())
+
+    def get_artifact(self, job_id: str, name: str) -> bytes:
+        return self._request("GET", f"/api/jobs/{job_id}/artifacts/{name}").content
+
+    def iter_job(self, job_id: str, poll_interval: float = 0.5, timeout: float | None = None) -> Iterator[Job]:
+        """Yield the job every time its status or progress changes, until it finishes."""
+        deadline = time.monotonic() + timeout if timeout else None
+        last = None
+        while True:
+            job = self.get_job(job_id)
+            if (job.status, job.progress) != last:
+                last = (job.status, job.progress)
+                yield job
+            if job.finished:
+                return
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} still {job.status} after {timeout}s")
+            time.sleep(poll_interval)
+
+    def events(self, job_ids: list[str] | None = None) -> Iterator[dict]:
+        """
+        Follow jobs over the server's SSE stream (/api/jobs/events). Yields
+        event dicts (snapshot, state, progress, task, artifact) and returns once
+        every job has finished; with no ids it follows all jobs indefinitely.
+        """
+        params = {"ids": ",".join(job_ids)} if job_ids else None
+        with self.session.get(
+            f"{self.base_url}/api/jobs/events", params=params, stream=True, timeout=(self.timeout, None)
+        ) as response:
+            if not response.ok:
+                raise APIError(response.status_code, error_detail(response), response.url)
+            yield from parse_sse(response.iter_lines(decode_unicode=True))
+
+    def wait(self, job_id: str, poll_interval: float = 0.5, timeout: float | None = None) -> JobResult:
+        for job in self.iter_job(job_id, poll_interval, timeout):
+            pass
+        if job.status != "completed":
+            raise JobFailed(job)
+        return self.get_result(job_id)
+
+    def run_job(self, image, task: str, model: str = "florence", text_input: str | None = None, **wait_kwargs) -> JobResult:
+        return self.wait(self.submit_job(image, task, model, text_input).id, **wait_kwargs)
+
+    # -----------------------------
+    # Fan-out
+    # -----------------------------
+    def map(self, fn: Callable, items: Iterable, ordered: bool = False) -> Iterator[tuple]:
+        """
+        Run `fn(item)` over `items` with at most `max_in_flight` calls pending.
+        Yields (item, result, exception) as calls finish (input order if `ordered`).
+        Items are pulled lazily, so `items` may be a generator over a large dataset.
+        """
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            pending = {}
+
+            def _fill():
+                while len(pending) < self.max_in_flight:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        return
+                    pending[pool.submit(fn, item)] = item
+
+            def _outcome(future):
+                item = pending.pop(future)
+                exc = future.exception()
+                return item, None if exc else future.result(), exc
+
+            _fill()
+            while pending:
+                if ordered:
+                    yield _outcome(next(iter(pending)))
+                else:
+                    done, _ = wait_futures(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield _outcome(future)
+                _fill()
+
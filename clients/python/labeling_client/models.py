@@ -0,0 +1,175 @@
+"""
+Typed views over the service responses.
+
+Every model keeps the decoded JSON in `raw`, so fields the parsers do not
+know about are still reachable.
+"""
+
+import base64
+from dataclasses import dataclass, field
+from typing import Any
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+@dataclass
+class Detection:
+    label: str | None
+    bbox: list[float]
+    score: float | None = None
+    keypoints: dict | None = None
+
+    @property
+    def area(self) -> float:
+        if len(self.bbox) < 4:
+            return 0.0
+        x0, y0, x1, y1 = self.bbox[:4]
+        return max(0.0, (x1 - x0) * (y1 - y0))
+
+
+def parse_rexomni(items) -> list[Detection]:
+    """
+    Accepts both postprocessed RexOmni output ([{"label", "bbox", "score"}])
+    and raw output ([{"extracted_predictions": {label: [obj, ...]}}]).
+    """
+    detections = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        if "extracted_predictions" in item:
+            for label, objs in item["extracted_predictions"].items():
+                for obj in objs:
+                    if obj.get("type") == "box" and "coords" in obj:
+                        detections.append(Detection(label, list(obj["coords"]), 1.0))
+                    elif obj.get("type") == "keypoint":
+                        detections.append(
+                            Detection(label, list(obj.get("bbox", [])), 1.0, obj.get("keypoints", {}))
+                        )
+        elif item.get("bbox"):
+            detections.append(
+                Detection(
+                    item.get("label"),
+                    list(item["bbox"]),
+                    item.get("score", item.get("confidence")),
+                    item.get("keypoints"),
+                )
+            )
+    return detections
+
+
+def parse_florence(results: dict) -> list[Detection]:
+    """Flatten Florence {"<TASK>": {"bboxes", "labels", ...}} results into detections."""
+    results = results or {}
+    if "results" in results and isinstance(results["results"], dict):
+        results = results["results"]
+    if "bboxes" in results:
+        # Already a single task's output (normalized job results)
+        results = {"": results}
+
+    detections = []
+    for value in results.values():
+        if not isinstance(value, dict):
+            continue
+        bboxes = value.get("bboxes", [])
+        labels = value.get("labels", value.get("bboxes_labels", []))
+        scores = value.get("scores", [])
+        for index, bbox in enumerate(bboxes):
+            detections.append(
+                Detection(
+                    labels[index] if index < len(labels) else None,
+                    list(bbox),
+                    scores[index] if index < len(scores) else None,
+                )
+            )
+    return detections
+
+
+@dataclass
+class DetectionResult:
+    """RexOmni detection: boxes plus the annotated JPEG."""
+    detections: list[Detection]
+    image: bytes | None = None
+    raw: Any = None
+
+
+@dataclass
+class TaskResult:
+    """JSON task output (RexOmni OCR/keypoint/visual prompting, Florence tasks)."""
+    task: str | None
+    results: Any
+    image: bytes | None = None
+    cache: str | None = None
+    raw: Any = None
+
+    @property
+    def detections(self) -> list[Detection]:
+        if isinstance(self.results, list):
+            return parse_rexomni(self.results)
+        if isinstance(self.results, dict):
+            return parse_florence(self.results)
+        return []
+
+
+@dataclass
+class Job:
+    id: str
+    status: str
+    progress: int = 0
+    error: str | None = None
+    queue_position: int | None = None
+    wait_time: float | None = None
+    artifacts: list[str] = field(default_factory=list)
+    tasks: list[dict] | None = None
+    raw: dict = field(default_factory=dict)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Job":
+        return cls(
+            id=data.get("id") or data.get("job_id"),
+            status=data.get("status", "queued"),
+            progress=data.get("progress") or 0,
+            error=data.get("error"),
+            queue_position=data.get("queue_position"),
+            wait_time=data.get("wait_time"),
+            artifacts=list(data.get("artifacts") or []),
+            tasks=data.get("tasks"),
+            raw=data,
+        )
+
+
+@dataclass
+class JobResult:
+    job_id: str
+    task: str
+    model: str
+    annotations: Any
+    # name -> {"url", "media_type", "size", "etag"}; size/etag are None until rendered
+    artifacts: dict[str, dict]
+    # Artifacts requested with include=..., decoded
+    inline: dict[str, bytes] = field(default_factory=dict)
+    raw: dict = field(default_factory=dict)
+
+    @property
+    def detections(self) -> list[Detection]:
+        results = self.annotations.get("results") if isinstance(self.annotations, dict) else self.annotations
+        if isinstance(results, list):
+            return parse_rexomni(results)
+        if isinstance(results, dict):
+            return parse_florence(results)
+        return []
+
+    @classmethod
+    def from_json(cls, data: dict) -> "JobResult":
+        return cls(
+            job_id=data["job_id"],
+            task=data["task"],
+            model=data["model"],
+            annotations=data.get("annotations"),
+            artifacts=dict(data.get("artifacts") or {}),
+            inline={name: base64.b64decode(value) for name, value in (data.get("inline") or {}).items()},
+            raw=data,
+        )
@@ -0,0 +1,54 @@
+import random
+from dataclasses import dataclass
+
+# 429 is the scheduler's "queue full"; the 5xx are transient gateway/server errors
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# The server turned the request away without doing its work. Only these are
+# retried for non-idempotent requests: a POST /api/jobs that got a 502/504 (or
+# lost its connection) may already have created the job.
+REJECTED_STATUSES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+class APIError(Exception):
+
+    def __init__(self, status_code: int, detail, url: str = ""):
+        super().__init__(f"HTTP {status_code} from {url}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.url = url
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter; a server Retry-After wins when larger."""
+    attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def should_retry(self, attempt: int, status_code: int | None, idempotent: bool = True) -> bool:
+        """
+        `status_code` is None for connection errors/timeouts; callers only pass
+        those for non-idempotent requests that never reached the server.
+        """
+        if attempt + 1 >= self.attempts:
+            return False
+        if status_code is None:
+            return True
+        return status_code in (RETRY_STATUSES if idempotent else REJECTED_STATUSES)
+
+
+def error_detail(response) -> str:
+    try:
+        return response.json().get("detail", response.text)
+    except ValueError:
+        return response.text
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Latency/quality benchmark for Florence-2 generation profiles.
+
+Runs every task on every image under each profile and reports per-task
+latency (mean/p50/p95) and agreement with the "quality" profile's output:
+  - box outputs: F1 of label-matched boxes at IoU >= 0.5
+  - text outputs: difflib similarity ratio
+
+Images are encoded once in a warm-up pass (the service's feature cache), so
+timings measure decoding, which is what the profiles change.
+
+    python -m inference.florence.benchmark_profiles --images ./samples \
+        --tasks "Caption" "Object Detection" "More Detailed Caption" --json out.json
+"""
+
+import argparse
+import difflib
+import json
+import statistics
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from inference.florence.florence_service import Florence2InferenceService
+from inference.florence.generation_profiles import PROFILES
+
+DEFAULT_TASKS = [
+    "Caption",
+    "Detailed Caption",
+    "More Detailed Caption",
+    "Object Detection",
+    "Dense Region Caption",
+    "Region Proposal",
+    "OCR",
+]
+REFERENCE = "quality"
+
+
+def _iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x1 - x0) * max(0.0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _boxes(results):
+    found = []
+    for value in results.values():
+        if isinstance(value, dict) and value.get("bboxes"):
+            labels = value.get("labels", value.get("bboxes_labels", []))
+            found += [(labels[i] if i < len(labels) else None, box) for i, box in enumerate(value["bboxes"])]
+    return found
+
+
+def _text(results):
+    return " ".join(str(v) for v in results.values() if isinstance(v, str))
+
+
+def agreement(results, reference) -> float:
+    ref_boxes, boxes = _boxes(reference), _boxes(results)
+    if ref_boxes or boxes:
+        unmatched = list(ref_boxes)
+        matched = 0
+        for label, box in boxes:
+            for index, (ref_label, ref_box) in enumerate(unmatched):
+                if label == ref_label and _iou(box, ref_box) >= 0.5:
+                    matched += 1
+                    del unmatched[index]
+                    break
+        return 2 * matched / (len(boxes) + len(ref_boxes))
+    return difflib.SequenceMatcher(None, _text(results), _text(reference)).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Directory of images")
+    parser.add_argument("--tasks", nargs="+", default=DEFAULT_TASKS)
+    parser.add_argument("--profiles", nargs="+", default=sorted(PROFILES))
+    parser.add_argument("--limit", type=int, default=20, help="Max images")
+    parser.add_argument("--json", help="Write the report here as well")
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in {".jpg", ".jpeg", ".png"})
+    images = [Image.open(p).convert("RGB") for p in paths[: args.limit]]
+    profiles = [REFERENCE] + [p for p in args.profiles if p != REFERENCE]
+
+    # No batching (one request at a time); cache every image's features
+    service = Florence2InferenceService(max_batch_size=1, feature_cache_size=len(images) + 1)
+    for image in images:
+        service.run_task(image, "Caption", visualize=False)
+
+    report = []
+    for task in args.tasks:
+        reference = []
+        for profile in profiles:
+            latencies, scores = [], []
+            for index, image in enumerate(images):
+                started = time.perf_counter()
+                results = service.run_task(image, task, visualize=False, profile=profile)["results"]
+                latencies.append((time.perf_counter() - started) * 1000)
+                if profile == REFERENCE:
+                    reference.append(results)
+                else:
+                    scores.append(agreement(results, reference[index]))
+
+            latencies.sort()
+            row = {
+                "task": task,
+                "profile": profile,
+                "images": len(images),
+                "mean_ms": round(statistics.mean(latencies), 1),
+                "p50_ms": round(latencies[len(latencies) // 2], 1),
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+                "agreement": round(statistics.mean(scores), 3) if scores else 1.0,
+            }
+            report.append(row)
+            print(
+                f"{task:<28} {profile:<8} mean {row['mean_ms']:>8.1f} ms  p50 {row['p50_ms']:>8.1f}  "
+                f"p95 {row['p95_ms']:>8.1f}  agreement vs {REFERENCE} {row['agreement']:.3f}"
+            )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
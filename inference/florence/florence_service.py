@@ -5,64 +5,395 @@ Fully supports all Florence-2 tasks, normalized outputs, ready for API.
 """
 
 import torch
-from transformers import AutoProcessor, AutoModelForCausalLM
+from transformers import AutoProcessor, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList
 from PIL import Image, ImageDraw
 import numpy as np
 import copy
 import random
 import io
-import gc
+import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from inference.florence.generation_profiles import PROFILES, get_profile
+from inference.micro_batcher import MicroBatcher
+from inference.image_ingest import decode_image, rescale_results, scale_of
+from inference.memory_governor import memory_governor
+from inference.pipeline import StagedPipeline, parse_workers
+from inference.result_cache import config_fingerprint, make_key, result_cache
+
+# Hub revision (commit hash) of the model and its remote code. The encoder
+# cache below calls into that remote code, so deployments pin the revision
+# they validated; revisions without those hooks use the public path.
+MODEL_REVISION = os.getenv("FLORENCE_MODEL_REVISION") or None
+# Micro-batching: concurrent run_example calls with the same task prompt and
+# generation profile are grouped up to this size / wait window. A size of 1
+# disables batching.
+MAX_BATCH_SIZE = int(os.getenv("FLORENCE_MAX_BATCH_SIZE", "8"))
+MAX_BATCH_WAIT_MS = float(os.getenv("FLORENCE_MAX_BATCH_WAIT_MS", "10"))
+# Number of encoded images (DaViT outputs) kept on device for reuse across prompts
+FEATURE_CACHE_SIZE = int(os.getenv("FLORENCE_FEATURE_CACHE_SIZE", "16"))
+# Uploads are decoded with their longer side fitted to this (0 = full size).
+# The processor resizes to 768x768 anyway; 2x leaves headroom for small text.
+WORKING_MAX_SIDE = int(os.getenv("FLORENCE_WORKING_MAX_SIDE", "1536"))
+# Minimum seconds between progress callbacks during generation
+PROGRESS_INTERVAL = float(os.getenv("FLORENCE_PROGRESS_INTERVAL", "0.5"))
+# Staged executor for byte requests (decode -> preprocess -> model ->
+# postprocess -> render). Model workers feed the micro-batcher, so keep them
+# at least at the batch size. FLORENCE_PIPELINE=0 runs the stages inline.
+PIPELINE_ENABLED = os.getenv("FLORENCE_PIPELINE", "1") == "1"
+PIPELINE_QUEUE_SIZE = int(os.getenv("FLORENCE_PIPELINE_QUEUE_SIZE", "16"))
+PIPELINE_WORKERS = parse_workers(
+    os.getenv("FLORENCE_PIPELINE_WORKERS"),
+    {"decode": 2, "preprocess": 2, "model": max(1, MAX_BATCH_SIZE), "postprocess": 1, "render": 2},
+)
 
 colormap = ['blue','orange','green','purple','brown','pink','gray','olive','cyan','red',
             'lime','indigo','violet','aqua','magenta','coral','gold','tan','skyblue']
 
+class GenerationProgress(StoppingCriteria):
+    """
+    Hooks the generate() loop without ever stopping it: at most every
+    `interval` seconds each row's callback gets the tokens generated so far.
+    With greedy decoding (num_beams == 1) it also gets the row's decoded text;
+    under beam search the beams in input_ids are not ranked yet, so the text
+    would be an arbitrary hypothesis and only token counts are reported.
+    """
+
+    def __init__(self, callbacks, tokenizer, max_new_tokens, num_beams, interval=PROGRESS_INTERVAL):
+        self.callbacks = callbacks
+        self.tokenizer = tokenizer
+        self.max_new_tokens = max_new_tokens
+        self.num_beams = num_beams
+        self.interval = interval
+        self.started = time.monotonic()
+        self._last = 0.0
+
+    def __call__(self, input_ids, scores, **kwargs):
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._report(input_ids, now)
+        # Plain bool works with both the old any() and the newer per-row StoppingCriteriaList
+        return False
+
+    def _report(self, input_ids, now):
+        # Decoder ids start with decoder_start_token
+        tokens = input_ids.shape[1] - 1
+        rate = tokens / max(now - self.started, 1e-6)
+        for row, callback in enumerate(self.callbacks):
+            if callback is None:
+                continue
+            info = {
+                "tokens": tokens,
+                "max_new_tokens": self.max_new_tokens,
+                "tokens_per_second": round(rate, 1),
+            }
+            if self.num_beams == 1:
+                info["text"] = self.tokenizer.decode(input_ids[row], skip_special_tokens=True)
+            try:
+                callback(info)
+            except Exception as exc:
+                print(f"[FlorenceService] Progress callback failed: {exc}")
+
+
 class Florence2InferenceService:
-    def __init__(self, model_name="microsoft/Florence-2-large", device=None):
+    def __init__(self, model_name="microsoft/Florence-2-large", device=None,
+                 max_batch_size=MAX_BATCH_SIZE, max_batch_wait_ms=MAX_BATCH_WAIT_MS,
+                 feature_cache_size=FEATURE_CACHE_SIZE, pipeline_workers=None, revision=MODEL_REVISION):
+        self.model_name = model_name
+        self.revision = revision
+        # Keys carry model_name; the settings behind them are the florence ones
+        self.cache_config = {**config_fingerprint("florence"), "revision": revision}
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.torch_dtype = torch.float16 if self.device == "cuda" else torch.float32
 
         # Load processor and model
-        self.processor = AutoProcessor.from_pretrained(model_name, trust_remote_code=True)
+        self.processor = AutoProcessor.from_pretrained(model_name, trust_remote_code=True, revision=revision)
         self.model = AutoModelForCausalLM.from_pretrained(
             model_name,
             trust_remote_code=True,
-            torch_dtype=self.torch_dtype
+            torch_dtype=self.torch_dtype,
+            revision=revision,
         ).to(self.device)
         self.model.eval()
 
+        # The encoder cache relies on private hooks of Florence-2's remote code;
+        # without them generation goes through processor(...) + generate(pixel_values=...)
+        self.encoder_cache = (
+            hasattr(self.processor, "_construct_prompts") and hasattr(self.model, "_encode_image")
+        )
+        if not self.encoder_cache:
+            print(f"[FlorenceService] {model_name}@{revision or 'latest'} lacks the encoder hooks; "
+                  "using the public generate path without the feature cache")
+
+        # image key -> encoder output [tokens, dim], most recently used last
+        self.feature_cache_size = feature_cache_size
+        self._feature_cache: OrderedDict = OrderedDict()
+        self._feature_lock = threading.Lock()
+        self._feature_hits = 0
+        self._feature_misses = 0
+        # image key -> pixel_values prepared ahead of the model stage. Kept
+        # here, not in image.info: decoded images are shared between requests.
+        self._prepared: OrderedDict = OrderedDict()
+
+        self.batcher = None
+        if max_batch_size > 1:
+            self.batcher = MicroBatcher(
+                self._run_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_batch_wait_ms,
+                name="florence",
+            )
+
+        self.stages = [
+            ("decode", self._decode_stage),
+            ("preprocess", self._preprocess_stage),
+            ("model", self._model_stage),
+            ("postprocess", self._postprocess_stage),
+            ("render", self._render_stage),
+        ]
+        self.pipeline = None
+        if PIPELINE_ENABLED:
+            workers = pipeline_workers or PIPELINE_WORKERS
+            self.pipeline = StagedPipeline(
+                [(name, fn, workers[name]) for name, fn in self.stages],
+                queue_size=PIPELINE_QUEUE_SIZE,
+                name="florence",
+            )
+
     # -----------------------------
     # Core generation
     # -----------------------------
-    def run_example(self, task_prompt, image: Image.Image, text_input=None):
-        prompt = task_prompt if text_input is None else task_prompt + text_input
-        inputs = self.processor(text=prompt, images=image, return_tensors="pt")
-        inputs = {k: v.to(self.device, dtype=self.torch_dtype if k=="pixel_values" else None) for k,v in inputs.items()}
+    def run_example(self, task_prompt, image: Image.Image, text_input=None, on_progress=None, profile=None):
+        """
+        `profile` names a generation profile (see generation_profiles); None
+        uses the prompt's default. `on_progress(info)` is called from inside
+        generation with {"tokens", "max_new_tokens", "tokens_per_second"}, plus
+        "text" (the partial output) when the profile decodes greedily.
+        """
+        return self.run_examples(task_prompt, [image], [text_input], on_progress, profile)[0]
+
+    def run_examples(self, task_prompt, images, text_inputs, on_progress=None, profile=None):
+        """
+        run_example over several images (text_inputs[i] goes with images[i]).
+        They are queued together, so generate runs on padded batches of up to
+        the batcher's max batch size.
+        """
+        key = (task_prompt, get_profile(profile, task_prompt).name)
+        payloads = [(image, text_input, on_progress) for image, text_input in zip(images, text_inputs)]
+        if self.batcher is not None:
+            generated_texts = self.batcher.submit_many(key, payloads)
+        else:
+            generated_texts = [self._run_batch(key, [payload])[0] for payload in payloads]
+
+        parsed_answers = []
+        # Parsed on the caller's thread, so the batcher can start the next generate
+        for image, generated_text in zip(images, generated_texts):
+            parsed_answer = self.processor.post_process_generation(
+                generated_text,
+                task=task_prompt,
+                image_size=(image.width, image.height)
+            )
+            # Ensure the parsed answer is always a dict
+            if not isinstance(parsed_answer, dict):
+                parsed_answer = {task_prompt: parsed_answer}
+            parsed_answers.append(parsed_answer)
+        return parsed_answers
+
+    def _run_batch(self, key, items):
+        """
+        Run one processor/generate pass over [(image, text_input, on_progress), ...]
+        that share `key` = (task_prompt, profile name) and return the decoded
+        text of each row.
+        """
+        task_prompt, profile_name = key
+        generate_kwargs = PROFILES[profile_name].generate_kwargs(task_prompt)
+        images = [image for image, _, _ in items]
+        prompts = [task_prompt if text_input is None else task_prompt + text_input for _, text_input, _ in items]
+        callbacks = [on_progress for _, _, on_progress in items]
+
+        stopping_criteria = None
+        if any(callbacks):
+            stopping_criteria = StoppingCriteriaList([
+                GenerationProgress(
+                    callbacks,
+                    self.processor.tokenizer,
+                    generate_kwargs["max_new_tokens"],
+                    generate_kwargs["num_beams"],
+                )
+            ])
+
+        if not self.encoder_cache:
+            return self._generate_public(images, prompts, callbacks, generate_kwargs)
+
+        # The governor frees allocator/GC memory only under pressure or when idle
+        with memory_governor.track(), torch.no_grad():
+            image_features = self._encode_images(images)
+
+            # Same prompt expansion the processor applies, without re-processing pixels
+            text = self.processor.tokenizer(
+                self.processor._construct_prompts(prompts),
+                return_tensors="pt",
+                padding=True,
+            )
+            input_ids = text["input_ids"].to(self.device)
+            text_mask = text["attention_mask"].to(self.device)
+
+            # Equivalent of Florence-2's _merge_input_ids_with_image_features,
+            # but keeping the text padding mask for batched prompts
+            inputs_embeds = torch.cat([image_features, self.model.get_input_embeddings()(input_ids)], dim=1)
+            image_mask = torch.ones(image_features.shape[:2], dtype=text_mask.dtype, device=self.device)
+            attention_mask = torch.cat([image_mask, text_mask], dim=1)
 
-        with torch.no_grad():
             generated_ids = self.model.generate(
-                input_ids=inputs["input_ids"],
-                pixel_values=inputs["pixel_values"],
-                attention_mask=inputs.get("attention_mask", None),
-                max_new_tokens=1024,
-                num_beams=3,
-                do_sample=False,
-                early_stopping=False
+                input_ids=input_ids,
+                inputs_embeds=inputs_embeds,
+                attention_mask=attention_mask,
+                stopping_criteria=stopping_criteria,
+                **generate_kwargs,
             )
 
-        generated_text = self.processor.batch_decode(generated_ids, skip_special_tokens=False)[0]
-        parsed_answer = self.processor.post_process_generation(
-            generated_text,
-            task=task_prompt,
-            image_size=(image.width, image.height)
-        )
+        return self._decode(generated_ids)
+
+    def _decode(self, generated_ids):
+        generated_texts = self.processor.batch_decode(generated_ids, skip_special_tokens=False)
+        pad_token = self.processor.tokenizer.pad_token
+        # Shorter sequences in a batch are right-padded
+        if pad_token:
+            generated_texts = [text.replace(pad_token, "") for text in generated_texts]
+        return generated_texts
+
+    def _generate_public(self, images, prompts, callbacks, generate_kwargs):
+        """
+        _run_batch through the model's documented interface only. Rows with the
+        same prompt need no text padding and share one generate call.
+        """
+        groups = OrderedDict()
+        for row, prompt in enumerate(prompts):
+            groups.setdefault(prompt, []).append(row)
+
+        generated_texts = [None] * len(images)
+        for prompt, rows in groups.items():
+            stopping_criteria = None
+            if any(callbacks[row] for row in rows):
+                stopping_criteria = StoppingCriteriaList([
+                    GenerationProgress(
+                        [callbacks[row] for row in rows],
+                        self.processor.tokenizer,
+                        generate_kwargs["max_new_tokens"],
+                        generate_kwargs["num_beams"],
+                    )
+                ])
+            with memory_governor.track(), torch.no_grad():
+                inputs = self.processor(text=[prompt] * len(rows), images=[images[row] for row in rows], return_tensors="pt")
+                generated_ids = self.model.generate(
+                    input_ids=inputs["input_ids"].to(self.device),
+                    pixel_values=inputs["pixel_values"].to(self.device, dtype=self.torch_dtype),
+                    stopping_criteria=stopping_criteria,
+                    **generate_kwargs,
+                )
+            for row, text in zip(rows, self._decode(generated_ids)):
+                generated_texts[row] = text
+        return generated_texts
 
-        torch.cuda.empty_cache()
-        gc.collect()
-
-        # Ensure the parsed answer is always a dict
-        if not isinstance(parsed_answer, dict):
-            return {task_prompt: parsed_answer}
-        return parsed_answer
+    # -----------------------------
+    # Vision encoder cache
+    # -----------------------------
+    @staticmethod
+    def _image_key(image: Image.Image):
+        key = image.info.get("content_hash")
+        if key is None:
+            key = hashlib.sha256(image.tobytes()).hexdigest()
+            image.info["content_hash"] = key
+        return key
+
+    def prepare(self, image: Image.Image):
+        """
+        Resize/normalize `image` on the host ahead of the model stage, unless
+        its encoder output is already cached. The tensor is held under the
+        image's key until _encode_images consumes it.
+        """
+        if not self.encoder_cache:
+            return
+        key = self._image_key(image)
+        with self._feature_lock:
+            if key in self._feature_cache or key in self._prepared:
+                return
+        pixel_values = self.processor.image_processor(images=[image], return_tensors="pt")["pixel_values"]
+        with self._feature_lock:
+            self._prepared[key] = pixel_values
+            # Requests that failed before the model stage leave theirs behind
+            while len(self._prepared) > max(PIPELINE_QUEUE_SIZE, self.feature_cache_size):
+                self._prepared.popitem(last=False)
+
+    def _pixel_values(self, keys, images):
+        with self._feature_lock:
+            prepared = [self._prepared.pop(key, None) for key in keys]
+        if all(p is not None for p in prepared):
+            return torch.cat(prepared)
+        return self.processor.image_processor(images=images, return_tensors="pt")["pixel_values"]
+
+    def _encode_images(self, images):
+        """
+        Return stacked DaViT encoder outputs for `images`, encoding only the
+        ones not already cached. Identical images in one batch are encoded once.
+        """
+        keys = [self._image_key(image) for image in images]
+
+        with self._feature_lock:
+            features = {k: self._feature_cache[k] for k in keys if k in self._feature_cache}
+            for k in features:
+                self._feature_cache.move_to_end(k)
+
+        missing = {}
+        for k, image in zip(keys, images):
+            if k not in features and k not in missing:
+                missing[k] = image
+
+        if missing:
+            pixel_values = self._pixel_values(list(missing), list(missing.values())).to(self.device, dtype=self.torch_dtype)
+            encoded = self.model._encode_image(pixel_values)
+            for k, feature in zip(missing, encoded):
+                features[k] = feature
+
+            with self._feature_lock:
+                for k in missing:
+                    self._feature_cache[k] = features[k]
+                    self._feature_cache.move_to_end(k)
+                while len(self._feature_cache) > self.feature_cache_size:
+                    self._feature_cache.popitem(last=False)
+
+        with self._feature_lock:
+            self._feature_hits += len(keys) - len(missing)
+            self._feature_misses += len(missing)
+
+        return torch.stack([features[k] for k in keys])
+
+    def feature_cache_stats(self):
+        with self._feature_lock:
+            return {
+                "enabled": self.encoder_cache,
+                "size": len(self._feature_cache),
+                "capacity": self.feature_cache_size,
+                "hits": self._feature_hits,
+                "misses": self._feature_misses,
+            }
+
+    def batch_stats(self):
+        return self.batcher.stats() if self.batcher is not None else {"max_batch_size": 1}
+
+    def pipeline_stats(self):
+        return self.pipeline.stats() if self.pipeline is not None else {"enabled": False}
+
+    def close(self):
+        # Drain the pipeline first: its model workers still submit to the batcher
+        if self.pipeline is not None:
+            self.pipeline.close()
+        if self.batcher is not None:
+            self.batcher.close()
 
     # -----------------------------
     # Drawing Utilities
@@ -135,105 +466,273 @@ class Florence2InferenceService:
     # -----------------------------
     # High-level task runner
     # -----------------------------
-    def run_task(self, image: Image.Image, task_name: str, text_input=None, visualize=True):
+    # Task categories
+    caption_tasks = ['Caption', 'Detailed Caption', 'More Detailed Caption']
+    grounding_tasks = ['Caption + Grounding', 'Detailed Caption + Grounding', 'More Detailed Caption + Grounding']
+    seg_tasks = ['Referring Expression Segmentation', 'Region to Segmentation']
+    region_tasks = ['Region to Category', 'Region to Description']
+    dense_tasks = ['Dense Region Caption', 'Region Proposal']
+
+    def run_task(self, image: Image.Image, task_name: str, text_input=None, visualize=True, on_progress=None,
+                 profile=None):
+        if profile is not None:
+            get_profile(profile)  # fail fast on unknown names
         if not isinstance(image, Image.Image):
             image = Image.fromarray(np.array(image))
 
-        results = None
-        output_image = None
+        results = self.postprocess(
+            task_name, self.infer(image, task_name, text_input, on_progress, profile), scale_of(image)
+        )
+        image_bytes = self.render(image, task_name, results) if visualize else None
+        return {"results": results, "image_bytes": image_bytes}
 
-        # Task categories
-        caption_tasks = ['Caption', 'Detailed Caption', 'More Detailed Caption']
-        grounding_tasks = ['Caption + Grounding', 'Detailed Caption + Grounding', 'More Detailed Caption + Grounding']
-        seg_tasks = ['Referring Expression Segmentation', 'Region to Segmentation']
-        region_tasks = ['Region to Category', 'Region to Description']
-        dense_tasks = ['Dense Region Caption', 'Region Proposal']
+    def infer(self, image: Image.Image, task_name: str, text_input=None, on_progress=None, profile=None):
+        """Model stage: run the prompt(s) behind `task_name` and return the parsed answers."""
+        return self.infer_batch([image], task_name, text_input, on_progress, profile)[0]
+
+    def infer_batch(self, images, task_name: str, text_input=None, on_progress=None, profile=None):
+        """infer() for several images; each prompt runs over all of them as one batched call."""
+        caption_tasks, grounding_tasks = self.caption_tasks, self.grounding_tasks
+        seg_tasks, region_tasks, dense_tasks = self.seg_tasks, self.region_tasks, self.dense_tasks
+
+        def run(task_prompt, text_inputs=None):
+            if text_inputs is None:
+                text_inputs = [text_input] * len(images)
+            return self.run_examples(task_prompt, images, text_inputs, on_progress=on_progress, profile=profile)
+
+        def no_text(task_prompt):
+            return run(task_prompt, [None] * len(images))
 
         # Run specific task
         if task_name in caption_tasks:
             task_map = {'Caption': '<CAPTION>', 'Detailed Caption': '<DETAILED_CAPTION>', 'More Detailed Caption': '<MORE_DETAILED_CAPTION>'}
             key = task_map[task_name]
-            results = self.run_example(key, image)
+            results = no_text(key)
 
         elif task_name in grounding_tasks:
             base_map = {'Caption + Grounding':'<CAPTION>', 'Detailed Caption + Grounding':'<DETAILED_CAPTION>', 'More Detailed Caption + Grounding':'<MORE_DETAILED_CAPTION>'}
             base_key = base_map[task_name]
-            base_results = self.run_example(base_key, image)
-            caption_text = base_results.get(base_key, str(base_results))
-            grounding_results = self.run_example('<CAPTION_TO_PHRASE_GROUNDING>', image, caption_text)
-            results = {base_key: caption_text, '<CAPTION_TO_PHRASE_GROUNDING>': grounding_results}
+            caption_texts = [base_results.get(base_key, str(base_results)) for base_results in no_text(base_key)]
+            grounding_results = run('<CAPTION_TO_PHRASE_GROUNDING>', caption_texts)
+            results = [
+                {base_key: caption_text, '<CAPTION_TO_PHRASE_GROUNDING>': grounding}
+                for caption_text, grounding in zip(caption_texts, grounding_results)
+            ]
 
         elif task_name == 'Object Detection':
-            raw_results = self.run_example('<OD>', image)
-            results = {'<OD>': raw_results if isinstance(raw_results, dict) else {"bboxes": [], "labels": []}}
+            results = [
+                {'<OD>': raw_results if isinstance(raw_results, dict) else {"bboxes": [], "labels": []}}
+                for raw_results in no_text('<OD>')
+            ]
 
         elif task_name == 'Open Vocabulary Detection':
-            task_prompt = '<OPEN_VOCABULARY_DETECTION>'
-            raw_results = self.run_example(task_prompt, image, text_input)
-            results = {'<OPEN_VOCABULARY_DETECTION>': self.convert_to_od_format(raw_results)}
+            results = [
+                {'<OPEN_VOCABULARY_DETECTION>': self.convert_to_od_format(raw_results)}
+                for raw_results in run('<OPEN_VOCABULARY_DETECTION>')
+            ]
 
         elif task_name in dense_tasks:
             task_map = {'Dense Region Caption':'<DENSE_REGION_CAPTION>', 'Region Proposal':'<REGION_PROPOSAL>'}
             key = task_map[task_name]
-            results = self.run_example(key, image)
+            results = no_text(key)
 
         elif task_name == 'Caption to Phrase Grounding':
-            results = self.run_example('<CAPTION_TO_PHRASE_GROUNDING>', image, text_input)
+            results = run('<CAPTION_TO_PHRASE_GROUNDING>')
 
         elif task_name in seg_tasks:
             task_map = {'Referring Expression Segmentation':'<REFERRING_EXPRESSION_SEGMENTATION>', 'Region to Segmentation':'<REGION_TO_SEGMENTATION>'}
             key = task_map[task_name]
-            results = self.run_example(key, image, text_input)
+            results = run(key)
 
         elif task_name in region_tasks:
             task_map = {'Region to Category':'<REGION_TO_CATEGORY>', 'Region to Description':'<REGION_TO_DESCRIPTION>'}
             key = task_map[task_name]
-            results = self.run_example(key, image, text_input)
+            results = run(key)
 
         elif task_name == 'OCR':
-            raw_results = self.run_example('<OCR>', image)
-            results = {'<OCR>': raw_results if isinstance(raw_results, dict) else {"text": raw_results}}  # Fixed: Ensure dict with text
+            results = [
+                {'<OCR>': raw_results if isinstance(raw_results, dict) else {"text": raw_results}}  # Fixed: Ensure dict with text
+                for raw_results in no_text('<OCR>')
+            ]
 
         elif task_name == 'OCR with Region':
-            results = self.run_example('<OCR_WITH_REGION>', image)
+            results = no_text('<OCR_WITH_REGION>')
 
         else:
             raise ValueError(f"Unknown task: {task_name}")
 
-        print(f"[FlorenceService] Task {task_name} results: {results}")  # Added log for debugging
-
-        # Visualization
-        # -----------------------------
-        if visualize:
-            output_image = copy.deepcopy(image)
-            # Unwrap nested task dict for drawing
-            draw_data = None
-            if len(results) == 1:
-                draw_data = list(results.values())[0]
-            
-            if task_name in seg_tasks:
-                output_image = self.draw_polygons(output_image, draw_data, fill_mask=True)
-            elif task_name == 'OCR with Region':
-                output_image = self.draw_ocr_bboxes(output_image, draw_data)
-            elif task_name in ['Object Detection', 'Open Vocabulary Detection', *region_tasks, *dense_tasks]:
-                if draw_data is not None:
-                    if 'bboxes' in draw_data or 'quad_boxes' in draw_data:
-                        output_image = self.draw_bboxes(output_image, draw_data)
-                    elif 'polygons' in draw_data:
-                        output_image = self.draw_polygons(output_image, draw_data)
+        return results
 
+    @staticmethod
+    def postprocess(task_name: str, results, scale=(1.0, 1.0)):
         # Ensure results are dict
         if not isinstance(results, dict):
             results = {task_name: results}
+        # Coordinates of a downscaled working image -> upload coordinates
+        results = rescale_results(results, scale)
+
+        print(f"[FlorenceService] Task {task_name} results: {results}")  # Added log for debugging
+        return results
+
+    @classmethod
+    def render(cls, image: Image.Image, task_name: str, results: dict):
+        """
+        Render stage: draw `results` on a copy of `image` and encode it as PNG.
+        Needs no model, so stored results can be drawn later (lazy overlays).
+        `results` are in upload coordinates; a downscaled image is drawn at its own size.
+        """
+        sx, sy = scale_of(image)
+        results = rescale_results(results, (1 / sx, 1 / sy))
+        output_image = copy.deepcopy(image)
+        # Unwrap nested task dict for drawing
+        draw_data = None
+        if len(results) == 1:
+            draw_data = list(results.values())[0]
+
+        if task_name in cls.seg_tasks:
+            output_image = cls.draw_polygons(output_image, draw_data, fill_mask=True)
+        elif task_name == 'OCR with Region':
+            output_image = cls.draw_ocr_bboxes(output_image, draw_data)
+        elif task_name in ['Object Detection', 'Open Vocabulary Detection', *cls.region_tasks, *cls.dense_tasks]:
+            if draw_data is not None:
+                if 'bboxes' in draw_data or 'quad_boxes' in draw_data:
+                    output_image = cls.draw_bboxes(output_image, draw_data)
+                elif 'polygons' in draw_data:
+                    output_image = cls.draw_polygons(output_image, draw_data)
 
         # Convert image to bytes
-        image_bytes = self.pil_to_bytes(output_image) if output_image is not None else None
+        return cls.pil_to_bytes(output_image)
 
-        return {"results": results, "image_bytes": image_bytes}
+    # -----------------------------
+    # Pipeline stages (context dict in, context dict out)
+    # -----------------------------
+    @staticmethod
+    def decode(image_bytes: bytes) -> Image.Image:
+        # Validated, converted once at working resolution and shared with overlay rendering
+        return decode_image(image_bytes, max_side=WORKING_MAX_SIDE)
+
+    def _decode_stage(self, ctx):
+        ctx["image"] = self.decode(ctx.pop("image_bytes"))
+        return ctx
+
+    def _preprocess_stage(self, ctx):
+        self.prepare(ctx["image"])
+        return ctx
+
+    def _model_stage(self, ctx):
+        ctx["results"] = self.infer(
+            ctx["image"], ctx["task_name"], ctx["text_input"], ctx["on_progress"], ctx["profile"]
+        )
+        return ctx
+
+    def _postprocess_stage(self, ctx):
+        ctx["results"] = self.postprocess(ctx["task_name"], ctx["results"], scale_of(ctx["image"]))
+        return ctx
+
+    def _render_stage(self, ctx):
+        image_bytes = self.render(ctx["image"], ctx["task_name"], ctx["results"]) if ctx["visualize"] else None
+        return {"results": ctx["results"], "image_bytes": image_bytes}
 
     # -----------------------------
     # API-ready byte input
     # -----------------------------
-    def run_task_from_bytes(self, image_bytes: bytes, task_name: str, text_input=None, visualize=True):
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        return self.run_task(image, task_name, text_input=text_input, visualize=visualize)
\ No newline at end of file
+    def run_task_from_bytes(self, image_bytes: bytes, task_name: str, text_input=None, visualize=True, use_cache=True,
+                            on_progress=None, profile=None):
+        key = None
+        if use_cache:
+            key = make_key(
+                image_bytes, task_name, self.model_name, text_input,
+                config=self.cache_config, visualize=visualize, profile=profile,
+            )
+            cached = result_cache.get(key)
+            if cached is not None:
+                return {**cached, "cache": "hit"}
+
+        if profile is not None:
+            get_profile(profile)  # fail fast on unknown names
+        ctx = {
+            "image_bytes": image_bytes,
+            "task_name": task_name,
+            "text_input": text_input,
+            "visualize": visualize,
+            "on_progress": on_progress,
+            "profile": profile,
+        }
+        if self.pipeline is not None:
+            result = self.pipeline.run(ctx)
+        else:
+            for _, stage in self.stages:
+                ctx = stage(ctx)
+            result = ctx
+
+        if key:
+            result_cache.put(key, result)
+            result = {**result, "cache": "miss"}
+        return result
+
+    def run_task_batch_from_bytes(self, images_bytes, task_name: str, text_input=None, visualize=True,
+                                  use_cache=True, profile=None):
+        """
+        Run one task over several uploads and return their results in order.
+        Cache misses are decoded and go through the model together: every
+        prompt is generated as padded batches of up to the batcher's max size.
+        """
+        if profile is not None:
+            get_profile(profile)  # fail fast on unknown names
+
+        outputs = [None] * len(images_bytes)
+        keys = [None] * len(images_bytes)
+        pending = []
+        for i, image_bytes in enumerate(images_bytes):
+            if use_cache:
+                keys[i] = make_key(
+                    image_bytes, task_name, self.model_name, text_input,
+                    config=self.cache_config, visualize=visualize, profile=profile,
+                )
+                cached = result_cache.get(keys[i])
+                if cached is not None:
+                    outputs[i] = {**cached, "cache": "hit"}
+                    continue
+            pending.append(i)
+
+        if pending:
+            images = [self.decode(images_bytes[i]) for i in pending]
+            batch_results = self.infer_batch(images, task_name, text_input, profile=profile)
+            for i, image, results in zip(pending, images, batch_results):
+                results = self.postprocess(task_name, results, scale_of(image))
+                result = {
+                    "results": results,
+                    "image_bytes": self.render(image, task_name, results) if visualize else None,
+                }
+                if keys[i]:
+                    result_cache.put(keys[i], result)
+                    result = {**result, "cache": "miss"}
+                outputs[i] = result
+        return outputs
+
+    # -----------------------------
+    # Several tasks on one image
+    # -----------------------------
+    def run_tasks(self, image: Image.Image, tasks, visualize=False):
+        """
+        Run [{"task": <task name>, "text_input": ..., "profile": ...}, ...] against one image.
+        The image is encoded once; every prompt reuses the cached features.
+        """
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(np.array(image))
+        self._image_key(image)
+
+        outputs = []
+        for spec in tasks:
+            result = self.run_task(
+                image,
+                spec["task"],
+                text_input=spec.get("text_input"),
+                visualize=visualize,
+                profile=spec.get("profile"),
+            )
+            outputs.append({"task": spec["task"], **result})
+        return outputs
+
+    def run_tasks_from_bytes(self, image_bytes: bytes, tasks, visualize=False):
+        return self.run_tasks(self.decode(image_bytes), tasks, visualize=visualize)
@@ -0,0 +1,80 @@
+"""
+Named generation profiles for Florence-2.
+
+A profile fixes the decoding strategy (beams) and a token budget. "quality"
+is the original setting (3 beams, 1024 tokens) for every prompt; "fast" is
+greedy with a per-prompt budget sized to what that prompt actually emits.
+
+Defaults are chosen per task prompt rather than per API task: composite
+tasks such as "Detailed Caption + Grounding" run two prompts, and each gets
+its own default. An explicit profile overrides the defaults for every
+prompt of the request.
+"""
+
+import os
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    name: str
+    num_beams: int
+    max_new_tokens: int
+    # Per-prompt caps on max_new_tokens
+    token_limits: tuple = ()
+
+    def max_tokens_for(self, task_prompt: str) -> int:
+        return dict(self.token_limits).get(task_prompt, self.max_new_tokens)
+
+    def generate_kwargs(self, task_prompt: str) -> dict:
+        return {
+            "max_new_tokens": self.max_tokens_for(task_prompt),
+            "num_beams": self.num_beams,
+            "do_sample": False,
+            "early_stopping": False,
+        }
+
+
+# Budgets cover the long tail of each prompt's outputs; location tokens
+# count 4 per box, polygons far more
+FAST_TOKEN_LIMITS = (
+    ("<CAPTION>", 64),
+    ("<DETAILED_CAPTION>", 192),
+    ("<MORE_DETAILED_CAPTION>", 384),
+    ("<CAPTION_TO_PHRASE_GROUNDING>", 256),
+    ("<OD>", 512),
+    ("<OPEN_VOCABULARY_DETECTION>", 256),
+    ("<DENSE_REGION_CAPTION>", 512),
+    ("<REGION_PROPOSAL>", 512),
+    ("<REGION_TO_CATEGORY>", 32),
+    ("<REGION_TO_DESCRIPTION>", 128),
+    ("<OCR>", 512),
+)
+
+PROFILES = {
+    "fast": GenerationProfile("fast", num_beams=1, max_new_tokens=1024, token_limits=FAST_TOKEN_LIMITS),
+    "quality": GenerationProfile("quality", num_beams=3, max_new_tokens=1024),
+}
+
+# Prompts whose output is short or structured enough that greedy matches beam search
+DEFAULT_PROFILES = {
+    "<CAPTION>": "fast",
+    "<OD>": "fast",
+    "<OPEN_VOCABULARY_DETECTION>": "fast",
+    "<REGION_PROPOSAL>": "fast",
+    "<REGION_TO_CATEGORY>": "fast",
+    "<REGION_TO_DESCRIPTION>": "fast",
+    "<OCR>": "fast",
+}
+
+# Forces one profile for every prompt that does not ask for one explicitly
+FLORENCE_PROFILE = os.getenv("FLORENCE_PROFILE")
+
+
+def get_profile(name: str | None, task_prompt: str | None = None) -> GenerationProfile:
+    """Resolve an explicit profile name, else the env override, else the prompt default."""
+    name = name or FLORENCE_PROFILE or DEFAULT_PROFILES.get(task_prompt, "quality")
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown generation profile {name!r}; expected one of {sorted(PROFILES)}")
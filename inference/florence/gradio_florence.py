@@ -12,7 +12,8 @@ import matplotlib.patches as patches
 
 import random
 import numpy as np
-import gc
+
+from inference.memory_governor import memory_governor
 
 DESCRIPTION = "# [Florence-2 Demo](https://huggingface.co/microsoft/Florence-2-large)"
 
@@ -35,22 +36,21 @@ def run_example(task_prompt, image, text_input=None, model_id='microsoft/Florenc
     else:
         prompt = task_prompt + text_input
     inputs = processor(text=prompt, images=image, return_tensors="pt").to("cuda")
-    generated_ids = model.generate(
-        input_ids=inputs["input_ids"],
-        pixel_values=inputs["pixel_values"],
-        max_new_tokens=1024,
-        early_stopping=False,
-        do_sample=False,
-        num_beams=3,
-    )
+    with memory_governor.track():
+        generated_ids = model.generate(
+            input_ids=inputs["input_ids"],
+            pixel_values=inputs["pixel_values"],
+            max_new_tokens=1024,
+            early_stopping=False,
+            do_sample=False,
+            num_beams=3,
+        )
     generated_text = processor.batch_decode(generated_ids, skip_special_tokens=False)[0]
     parsed_answer = processor.post_process_generation(
         generated_text,
         task=task_prompt,
         image_size=(image.width, image.height)
     )
-    torch.cuda.empty_cache()
-    gc.collect()
     return parsed_answer
 
 def plot_bbox(image, data):
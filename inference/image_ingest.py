@@ -0,0 +1,259 @@
+"""
+Shared image ingest.
+
+Every upload goes through here once: the format and dimensions are checked
+from the header before any pixels are decoded, oversized JPEGs are decoded
+at a reduced scale with PIL's draft mode (other formats with reduce), and
+the result is converted to RGB a single time. Decoded images are kept in a
+small LRU keyed by content hash, so inference and rendering of the same
+upload share one decode.
+
+Models work on a downscaled copy when asked to (`max_side`, set per model
+from its native input size): the decoded image carries info["scale"], the
+factors from its pixels back to the upload's, and rescale_results() maps
+predicted boxes, polygons and keypoints back to original coordinates;
+translate_results() does the same for predictions made on a crop.
+
+Images handed out by decode_image() are shared between requests: their
+info is read-only, per-request state lives with the caller, and callers
+that draw on them must work on a copy.
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image
+
+from inference.result_cache import image_hash
+
+ALLOWED_FORMATS = {
+    f.strip().upper()
+    for f in os.getenv("IMAGE_ALLOWED_FORMATS", "JPEG,PNG,WEBP,BMP,TIFF,GIF,MPO").split(",")
+    if f.strip()
+}
+# Uploads above either limit are rejected before decoding
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(100_000_000)))
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "20000"))
+# Default working resolution: longer side of the decoded image (0 = full size).
+# Models pass their own (FLORENCE_WORKING_MAX_SIDE, REXOMNI_WORKING_MAX_SIDE).
+IMAGE_DECODE_MAX_SIDE = int(os.getenv("IMAGE_DECODE_MAX_SIDE", "0"))
+# Budget for the decoded-image LRU (RGB bytes)
+IMAGE_CACHE_BYTES = int(os.getenv("IMAGE_CACHE_BYTES", str(256 * 1024 ** 2)))
+
+EXTENSIONS = {"JPEG": ".jpg", "MPO": ".jpg", "PNG": ".png", "WEBP": ".webp", "BMP": ".bmp", "TIFF": ".tif", "GIF": ".gif"}
+
+
+class ImageIngestError(ValueError):
+    """Upload rejected; `status_code` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    format: str
+    width: int
+    height: int
+
+    @property
+    def extension(self) -> str:
+        return EXTENSIONS.get(self.format, ".img")
+
+
+def probe(image_bytes: bytes) -> ImageInfo:
+    """Validate format and dimensions from the header only."""
+    if not image_bytes:
+        raise ImageIngestError("Empty upload")
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            info = ImageInfo(image.format or "", image.width, image.height)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise ImageIngestError(f"Unreadable image: {exc}")
+
+    if info.format not in ALLOWED_FORMATS:
+        raise ImageIngestError(f"Unsupported image format {info.format or 'unknown'}", status_code=415)
+    if max(info.width, info.height) > IMAGE_MAX_SIDE or info.width * info.height > IMAGE_MAX_PIXELS:
+        raise ImageIngestError(
+            f"Image {info.width}x{info.height} exceeds limits "
+            f"({IMAGE_MAX_SIDE}px per side, {IMAGE_MAX_PIXELS} pixels)",
+            status_code=413,
+        )
+    return info
+
+
+class DecodedImageCache:
+
+    def __init__(self, max_bytes: int = IMAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._images: OrderedDict[tuple, Image.Image] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(image: Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._images.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image: Image.Image):
+        size = self._size(image)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._images:
+                return
+            self._images[key] = image
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= self._size(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "images": len(self._images),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+decoded_images = DecodedImageCache()
+
+
+class FrozenInfo(dict):
+    """info of a shared decoded image: readable like a dict, never written."""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("info of a shared decoded image is read-only; keep per-request state elsewhere")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    pop = popitem = setdefault = update = clear = _read_only
+
+    def copy(self):
+        # Derived images (copy, crop, convert) get an ordinary, writable info
+        return dict(self)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+def _decode(image_bytes: bytes, info: ImageInfo, max_side: int) -> Image.Image:
+    image = Image.open(io.BytesIO(image_bytes))
+    longest = max(info.width, info.height)
+    if not max_side or longest <= max_side:
+        return image.convert("RGB")
+
+    if info.format in ("JPEG", "MPO"):
+        # DCT scaling: decodes at 1/2, 1/4 or 1/8 while staying >= the requested size
+        scale = max_side / longest
+        image.draft("RGB", (int(info.width * scale), int(info.height * scale)))
+    else:
+        factor = longest // max_side
+        if factor > 1:
+            image = image.reduce(factor)
+    image = image.convert("RGB")
+    # Cheap coarse step above, exact fit here
+    image.thumbnail((max_side, max_side), Image.BILINEAR)
+    return image
+
+
+def decode_image(image_bytes: bytes, max_side: int = IMAGE_DECODE_MAX_SIDE, content_hash: str | None = None) -> Image.Image:
+    """
+    Validated RGB image for `image_bytes`, from the LRU when possible.
+    `max_side` > 0 fits the longer side within it. info (read-only) carries
+    "content_hash" (sha256 of the upload), "original_size" and "scale".
+    """
+    content_hash = content_hash or image_hash(image_bytes)
+    key = (content_hash, max_side)
+    image = decoded_images.get(key)
+    if image is not None:
+        return image
+
+    info = probe(image_bytes)
+    try:
+        image = _decode(image_bytes, info, max_side)
+    except (OSError, SyntaxError) as exc:
+        raise ImageIngestError(f"Corrupt image: {exc}")
+    image.info = FrozenInfo(
+        image.info,
+        content_hash=content_hash,
+        original_size=(info.width, info.height),
+        scale=(info.width / image.width, info.height / image.height),
+    )
+
+    decoded_images.put(key, image)
+    return image
+
+
+# -----------------------------
+# Coordinates
+# -----------------------------
+# Result keys holding pixel coordinates: flat [x, y, x, y, ...] lists, lists
+# of those, or {name: [x, y]} dicts (keypoints)
+COORD_KEYS = frozenset({"bboxes", "quad_boxes", "polygons", "bbox", "coords", "keypoints"})
+
+
+def scale_of(image: Image.Image) -> tuple[float, float]:
+    """Factors from `image`'s pixels to the upload's; (1, 1) if it was not downscaled."""
+    return image.info.get("scale", (1.0, 1.0))
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _map_points(value, sx: float, sy: float, dx: float, dy: float):
+    if isinstance(value, dict):
+        return {k: _map_points(v, sx, sy, dx, dy) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(_is_number(v) for v in value):
+            return [
+                round(v * sx + dx, 2) if i % 2 == 0 else round(v * sy + dy, 2)
+                for i, v in enumerate(value)
+            ]
+        return [_map_points(v, sx, sy, dx, dy) for v in value]
+    return value
+
+
+def _map_results(results, sx: float, sy: float, dx: float, dy: float):
+    if isinstance(results, dict):
+        return {
+            k: _map_points(v, sx, sy, dx, dy) if k in COORD_KEYS else _map_results(v, sx, sy, dx, dy)
+            for k, v in results.items()
+        }
+    if isinstance(results, list):
+        return [_map_results(v, sx, sy, dx, dy) for v in results]
+    return results
+
+
+def rescale_results(results, scale: tuple[float, float]):
+    """Copy of `results` with every coordinate under COORD_KEYS multiplied by scale=(sx, sy)."""
+    sx, sy = scale
+    if sx == 1.0 and sy == 1.0:
+        return results
+    return _map_results(results, sx, sy, 0.0, 0.0)
+
+
+def translate_results(results, offset: tuple[float, float]):
+    """Copy of `results` with every coordinate under COORD_KEYS shifted by offset=(dx, dy)."""
+    dx, dy = offset
+    if dx == 0 and dy == 0:
+        return results
+    return _map_results(results, 1.0, 1.0, dx, dy)
@@ -0,0 +1,191 @@
+"""
+Memory governor for inference workers.
+
+Replaces the unconditional torch.cuda.empty_cache() + gc.collect() that used
+to follow every generate() call. Inference runs inside `track()`; afterwards
+the governor compares device and host usage with their high watermarks and
+only then releases the CUDA allocator cache / runs a full GC. A background
+thread does the same once the service has been idle for MEMORY_IDLE_SECONDS,
+so memory is handed back between bursts without taxing the hot path.
+Every decision is counted and reported by stats().
+"""
+
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import torch
+except ImportError:  # host-only deployments
+    torch = None
+
+# Fractions of device / host memory in use above which caches are released
+DEVICE_HIGH_WATERMARK = float(os.getenv("MEMORY_DEVICE_HIGH_WATERMARK", "0.90"))
+HOST_HIGH_WATERMARK = float(os.getenv("MEMORY_HOST_HIGH_WATERMARK", "0.90"))
+# Release once after this long without inference
+IDLE_SECONDS = float(os.getenv("MEMORY_IDLE_SECONDS", "30"))
+CHECK_INTERVAL = float(os.getenv("MEMORY_CHECK_INTERVAL", "5"))
+# Don't release more often than this under sustained pressure (avoids thrashing)
+MIN_RELEASE_INTERVAL = float(os.getenv("MEMORY_MIN_RELEASE_INTERVAL", "2"))
+
+
+def device_usage() -> dict | None:
+    if torch is None or not torch.cuda.is_available():
+        return None
+    free, total = torch.cuda.mem_get_info()
+    return {
+        "used_fraction": round((total - free) / total, 4),
+        "allocated_bytes": torch.cuda.memory_allocated(),
+        "reserved_bytes": torch.cuda.memory_reserved(),
+        "total_bytes": total,
+    }
+
+
+def host_usage() -> dict | None:
+    """Linux /proc/meminfo; None where unavailable."""
+    try:
+        with open("/proc/meminfo") as f:
+            info = {line.split(":")[0]: int(line.split()[1]) * 1024 for line in f}
+    except (OSError, ValueError, IndexError):
+        return None
+    total = info.get("MemTotal")
+    available = info.get("MemAvailable")
+    if not total or available is None:
+        return None
+    return {"used_fraction": round((total - available) / total, 4), "total_bytes": total}
+
+
+class MemoryGovernor:
+
+    def __init__(
+        self,
+        device_high_watermark: float = DEVICE_HIGH_WATERMARK,
+        host_high_watermark: float = HOST_HIGH_WATERMARK,
+        idle_seconds: float = IDLE_SECONDS,
+        check_interval: float = CHECK_INTERVAL,
+        min_release_interval: float = MIN_RELEASE_INTERVAL,
+    ):
+        self.device_high_watermark = device_high_watermark
+        self.host_high_watermark = host_high_watermark
+        self.idle_seconds = idle_seconds
+        self.check_interval = check_interval
+        self.min_release_interval = min_release_interval
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._last_activity = time.monotonic()
+        self._last_release = 0.0
+        # Idle release happens once per idle period
+        self._idle_released = True
+        self._thread = None
+
+        self.inferences = 0
+        self.skipped = 0
+        self.releases: dict[str, int] = {}
+        self.last_decision: dict | None = None
+
+    # -----------------------------
+    # Hot path
+    # -----------------------------
+    @contextmanager
+    def track(self):
+        """Wrap one inference; checks watermarks when it finishes."""
+        self._ensure_thread()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._last_activity = time.monotonic()
+                self._idle_released = False
+                self.inferences += 1
+            self.check()
+
+    def check(self) -> str | None:
+        """Release if a watermark is crossed. Returns the reason, or None if nothing was done."""
+        device = device_usage()
+        host = host_usage()
+        if device and device["used_fraction"] >= self.device_high_watermark:
+            reason = "device_watermark"
+        elif host and host["used_fraction"] >= self.host_high_watermark:
+            reason = "host_watermark"
+        else:
+            with self._lock:
+                self.skipped += 1
+            return None
+
+        if time.monotonic() - self._last_release < self.min_release_interval:
+            with self._lock:
+                self.skipped += 1
+            return None
+        self.release(reason, device=device)
+        return reason
+
+    # -----------------------------
+    # Releasing
+    # -----------------------------
+    def release(self, reason: str, device: dict | None = None):
+        """Collect garbage and hand cached device blocks back to the driver."""
+        started = time.monotonic()
+        before = device if device is not None else device_usage()
+        collected = gc.collect()
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        after = device_usage()
+
+        with self._lock:
+            self._last_release = time.monotonic()
+            self.releases[reason] = self.releases.get(reason, 0) + 1
+            self.last_decision = {
+                "reason": reason,
+                "at": time.time(),
+                "duration_ms": round((time.monotonic() - started) * 1000, 2),
+                "gc_collected": collected,
+                "device_reserved_before": before["reserved_bytes"] if before else None,
+                "device_reserved_after": after["reserved_bytes"] if after else None,
+            }
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="memory-governor", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                with self._lock:
+                    idle = (
+                        self._in_flight == 0
+                        and not self._idle_released
+                        and time.monotonic() - self._last_activity >= self.idle_seconds
+                    )
+                    if idle:
+                        self._idle_released = True
+                if idle:
+                    self.release("idle")
+            except Exception as exc:
+                print(f"[MemoryGovernor] Idle release failed: {exc}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "inferences": self.inferences,
+                "skipped": self.skipped,
+                "releases": dict(self.releases),
+                "last_decision": self.last_decision,
+                "watermarks": {"device": self.device_high_watermark, "host": self.host_high_watermark},
+                "idle_seconds": self.idle_seconds,
+                "device": device_usage(),
+                "host": host_usage(),
+            }
+
+
+memory_governor = MemoryGovernor()
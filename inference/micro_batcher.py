@@ -0,0 +1,170 @@
+"""
+Dynamic micro-batching shared by the model services.
+
+Concurrent callers that use the same batch key (e.g. Florence task prompt +
+generation settings, RexOmni task + arguments) are grouped for up to
+`max_wait_ms` or until `max_batch_size` requests are waiting, then executed
+with one batched model call.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Hashable, List
+
+
+class _Request:
+    __slots__ = ("payload", "enqueued_at", "done", "result", "error")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "micro",
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._pending: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._cond = threading.Condition()
+
+        self._batches = 0
+        self._requests = 0
+        self._last_batch_size = 0
+        self._last_latency_ms = 0.0
+        self._total_latency_ms = 0.0
+        self._total_queue_ms = 0.0
+        self._latencies: deque = deque(maxlen=200)
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._loop, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def submit(self, key: Hashable, payload: Any) -> Any:
+        """Queue one request and block until its batch has run."""
+        request = _Request(payload)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} batcher is closed")
+            self._pending.setdefault(key, deque()).append(request)
+            self._cond.notify()
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def submit_many(self, key: Hashable, payloads: List[Any]) -> List[Any]:
+        """
+        Queue several requests at once and block until all have run. They are
+        enqueued together, so full batches dispatch without waiting for the
+        window. Results are returned in order; the first failure is raised.
+        """
+        requests = [_Request(payload) for payload in payloads]
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} batcher is closed")
+            self._pending.setdefault(key, deque()).extend(requests)
+            self._cond.notify()
+
+        for request in requests:
+            request.done.wait()
+        for request in requests:
+            if request.error is not None:
+                raise request.error
+        return [request.result for request in requests]
+
+    def close(self):
+        """Stop the dispatcher once already queued requests have run."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = sum(len(q) for q in self._pending.values())
+            latencies = sorted(self._latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": queued,
+            "batches": self._batches,
+            "requests": self._requests,
+            "avg_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+            "last_batch_size": self._last_batch_size,
+            "last_batch_latency_ms": round(self._last_latency_ms, 1),
+            "avg_batch_latency_ms": round(self._total_latency_ms / self._batches, 1) if self._batches else 0.0,
+            "p95_batch_latency_ms": round(p95, 1),
+            "avg_queue_wait_ms": round(self._total_queue_ms / self._requests, 1) if self._requests else 0.0,
+        }
+
+    # -----------------------------
+    # Dispatcher
+    # -----------------------------
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return None, None
+                self._cond.wait()
+
+            # Serve the key whose oldest request has waited longest
+            key = min(self._pending, key=lambda k: self._pending[k][0].enqueued_at)
+            deadline = self._pending[key][0].enqueued_at + self.max_wait
+            while len(self._pending[key]) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            queue = self._pending[key]
+            batch = [queue.popleft() for _ in range(min(self.max_batch_size, len(queue)))]
+            if not queue:
+                del self._pending[key]
+            return key, batch
+
+    def _loop(self):
+        while True:
+            key, batch = self._next_batch()
+            if batch is None:
+                # Drop the reference to run_batch so the model can be freed
+                self.run_batch = None
+                return
+            started = time.monotonic()
+            try:
+                results = self.run_batch(key, [r.payload for r in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch returned {len(results)} results for {len(batch)} requests")
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as exc:
+                for request in batch:
+                    request.error = exc
+            finally:
+                latency_ms = (time.monotonic() - started) * 1000.0
+                self._batches += 1
+                self._requests += len(batch)
+                self._last_batch_size = len(batch)
+                self._last_latency_ms = latency_ms
+                self._total_latency_ms += latency_ms
+                self._total_queue_ms += sum((started - r.enqueued_at) * 1000.0 for r in batch)
+                with self._cond:
+                    self._latencies.append(latency_ms)
+                for request in batch:
+                    request.done.set()
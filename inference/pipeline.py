@@ -0,0 +1,159 @@
+"""
+Staged pipeline executor.
+
+A request flows through named stages (e.g. decode -> preprocess -> model ->
+postprocess -> render), each served by its own worker threads, with a
+bounded queue in front of every stage. Host-side work of one request then
+overlaps with the model stage of the next, and a full queue blocks the stage
+feeding it, so a slow stage applies backpressure instead of buffering
+without limit.
+
+Stage functions take and return a context dict; the last stage's return
+value resolves the request's Future. An exception in any stage fails that
+request only.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Sequence
+
+_STOP = object()
+
+
+def parse_workers(spec: str | None, defaults: dict) -> dict:
+    """Parse "decode=2,render=4" over `defaults`; unknown stages are rejected."""
+    workers = dict(defaults)
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        name, _, count = part.partition("=")
+        name = name.strip()
+        if name not in workers:
+            raise ValueError(f"Unknown pipeline stage {name!r}; expected one of {list(workers)}")
+        workers[name] = max(1, int(count))
+    return workers
+
+
+class _Stage:
+
+    def __init__(self, name: str, fn: Callable[[dict], dict], workers: int, queue_size: int):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.threads = []
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.total_ms = 0.0
+
+
+class StagedPipeline:
+
+    def __init__(
+        self,
+        stages: Sequence[tuple[str, Callable[[dict], dict], int]],
+        queue_size: int = 16,
+        name: str = "pipeline",
+    ):
+        self.name = name
+        self.queue_size = queue_size
+        self._stages = [_Stage(stage_name, fn, workers, queue_size) for stage_name, fn, workers in stages]
+        self._lock = threading.Lock()
+        self._closed = False
+
+        for index, stage in enumerate(self._stages):
+            for worker in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(index,),
+                    name=f"{name}-{stage.name}-{worker}",
+                    daemon=True,
+                )
+                thread.start()
+                stage.threads.append(thread)
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def submit(self, ctx: dict) -> Future:
+        """Enqueue one request; blocks while the first stage's queue is full."""
+        if self._closed:
+            raise RuntimeError(f"{self.name} pipeline is closed")
+        future = Future()
+        self._stages[0].queue.put((ctx, future))
+        return future
+
+    def run(self, ctx: dict):
+        return self.submit(ctx).result()
+
+    def close(self):
+        """Stop every stage after the requests already queued have drained."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        # Upstream stages are joined before downstream ones get their stop
+        # markers, so nothing in flight is dropped
+        for stage in self._stages:
+            for _ in stage.threads:
+                stage.queue.put(_STOP)
+            for thread in stage.threads:
+                thread.join()
+            stage.fn = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_size": self.queue_size,
+                "stages": {
+                    stage.name: {
+                        "workers": stage.workers,
+                        "queued": stage.queue.qsize(),
+                        "busy": stage.busy,
+                        "processed": stage.processed,
+                        "failed": stage.failed,
+                        "avg_ms": round(stage.total_ms / stage.processed, 1) if stage.processed else 0.0,
+                    }
+                    for stage in self._stages
+                },
+            }
+
+    # -----------------------------
+    # Workers
+    # -----------------------------
+    def _work(self, index: int):
+        stage = self._stages[index]
+        downstream = self._stages[index + 1] if index + 1 < len(self._stages) else None
+
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                return
+            ctx, future = item
+            # Only still-pending requests can be cancelled, i.e. before the first stage
+            if index == 0 and not future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                stage.busy += 1
+            started = time.monotonic()
+            try:
+                output = stage.fn(ctx)
+                error = None
+            except Exception as exc:
+                output, error = None, exc
+            elapsed_ms = (time.monotonic() - started) * 1000.0
+            with self._lock:
+                stage.busy -= 1
+                stage.processed += 1
+                stage.total_ms += elapsed_ms
+                if error is not None:
+                    stage.failed += 1
+
+            if error is not None:
+                future.set_exception(error)
+            elif downstream is None:
+                future.set_result(output)
+            else:
+                downstream.queue.put((output, future))
@@ -1,12 +1,18 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Tuple
 from .task_types import TaskType
 
 class BaseModelAdapter(ABC):
 
-    @abstractmethod
-    def supported_tasks(self) -> set[TaskType]:
-        pass
+    # Adapters whose run() accepts an `on_progress(info)` callback set this
+    supports_progress = False
+
+    # Declared on the class so the registry can route tasks without loading weights
+    tasks: frozenset = frozenset()
+
+    @classmethod
+    def supported_tasks(cls) -> set[TaskType]:
+        return set(cls.tasks)
 
     @abstractmethod
     def run(
@@ -16,3 +22,29 @@ class BaseModelAdapter(ABC):
         **kwargs
     ) -> Dict[str, Any]:
         pass
+
+    def run_many(
+        self,
+        tasks: List[Tuple[TaskType, Dict[str, Any]]],
+        image_bytes: bytes,
+        on_result: Callable[[int, Dict[str, Any]], None] | None = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run several tasks on one image. Adapters that can share decoding or
+        preprocessing across tasks override this; the default runs them in turn.
+        """
+        results = []
+        for index, (task, kwargs) in enumerate(tasks):
+            result = self.run(task, image_bytes, **kwargs)
+            if on_result:
+                on_result(index, result)
+            results.append(result)
+        return results
+
+    def unload(self):
+        """Release model weights. Called by ModelResidency on unload/evict."""
+        self.service = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime metrics reported by ModelRegistry / the models API."""
+        return {}
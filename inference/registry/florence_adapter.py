@@ -1,6 +1,5 @@
 from .base_adapter import BaseModelAdapter
 from .task_types import TaskType
-from inference.florence.florence_service import Florence2InferenceService
 
 TASK_MAP = {
     TaskType.DETECTION: "Object Detection",
@@ -27,18 +26,65 @@ TASK_MAP = {
     TaskType.DENSE_REGION_CAPTION: "Dense Region Caption",
 }
 
+
+def render_overlay(task: TaskType, image_bytes: bytes, results: dict) -> bytes:
+    """Draw stored `results` of `task` over the original image; needs no model."""
+    from inference.florence.florence_service import Florence2InferenceService
+
+    image = Florence2InferenceService.decode(image_bytes)
+    return Florence2InferenceService.render(image, TASK_MAP[task], results)
+
+
 class FlorenceAdapter(BaseModelAdapter):
 
+    supports_progress = True
+    tasks = frozenset(TASK_MAP)
+
     def __init__(self):
-        self.service = Florence2InferenceService()
+        # Imported here so the class (and its tasks) is available without torch/transformers
+        from inference.florence.florence_service import Florence2InferenceService
 
-    def supported_tasks(self):
-        return set(TASK_MAP.keys())
+        self.service = Florence2InferenceService()
 
     def run(self, task: TaskType, image_bytes: bytes, **kwargs):
         return self.service.run_task_from_bytes(
             image_bytes=image_bytes,
             task_name=TASK_MAP[task],
             text_input=kwargs.get("text_input"),
-            visualize=kwargs.get("visualize", True)
+            visualize=kwargs.get("visualize", True),
+            use_cache=False,  # ModelRegistry already caches by model/task/params
+            on_progress=kwargs.get("on_progress"),
+            profile=kwargs.get("profile"),
         )
+
+    def run_many(self, tasks, image_bytes: bytes, on_result=None):
+        # Decode once; the service's encoder cache shares the vision features
+        image = self.service.decode(image_bytes)
+
+        results = []
+        for index, (task, kwargs) in enumerate(tasks):
+            result = self.service.run_task(
+                image,
+                TASK_MAP[task],
+                text_input=kwargs.get("text_input"),
+                visualize=kwargs.get("visualize", True),
+                profile=kwargs.get("profile"),
+            )
+            if on_result:
+                on_result(index, result)
+            results.append(result)
+        return results
+
+    def unload(self):
+        if self.service is not None:
+            self.service.close()
+        self.service = None
+
+    def stats(self):
+        if self.service is None:
+            return {}
+        return {
+            "batching": self.service.batch_stats(),
+            "feature_cache": self.service.feature_cache_stats(),
+            "pipeline": self.service.pipeline_stats(),
+        }
@@ -1,7 +1,9 @@
+import os
+
 from .task_types import TaskType
 from .model_types import ModelType
-from .rexomni_adapter import RexOmniAdapter
-from .florence_adapter import FlorenceAdapter
+from .model_residency import ModelResidency, residency as default_residency
+from inference.result_cache import ResultCache, make_key, result_cache as default_result_cache
 
 # Define which inputs each task requires
 TASK_INPUTS = {
@@ -11,6 +13,7 @@ TASK_INPUTS = {
     TaskType.OCR_WITH_REGION: [],
     TaskType.VISUAL_PROMPTING: ["visual_prompt_boxes"],
     TaskType.KEYPOINT: [],
+    TaskType.DETECTION_KEYPOINT: ["categories"],
     TaskType.CAPTION: ["text_input"],
     TaskType.CAPTION_DETAILED: ["text_input"],
     TaskType.CAPTION_MORE_DETAILED: ["text_input"],
@@ -26,12 +29,29 @@ TASK_INPUTS = {
     TaskType.DENSE_REGION_CAPTION: [],
 }
 
+
+def _florence_overlay(task, image_bytes, results):
+    from .florence_adapter import render_overlay
+    return render_overlay(task, image_bytes, results)
+
+
+# Models whose stored results can be drawn after the fact, without loading weights
+OVERLAY_RENDERERS = {
+    ModelType.FLORENCE: _florence_overlay,
+}
+
 class ModelRegistry:
 
-    def __init__(self):
-        self.adapters = {
-            #ModelType.REXOMNI: RexOmniAdapter(),
-            ModelType.FLORENCE: FlorenceAdapter(),
+    def __init__(self, residency: ModelResidency | None = None, cache: ResultCache | None = None):
+        # Adapters live in the process-wide residency manager; the registry
+        # only decides which of them are routable and is cheap to construct.
+        self.residency = residency or default_residency
+        self.cache = cache or default_result_cache
+        # Registering a model costs nothing: weights load on its first task
+        self.enabled_models = {
+            ModelType(name.strip())
+            for name in os.getenv("ENABLED_MODELS", "florence,rexomni").split(",")
+            if name.strip()
         }
 
         self.default_model = {
@@ -39,8 +59,9 @@ class ModelRegistry:
             TaskType.OPEN_VOCAB_DETECTION: ModelType.FLORENCE,
             TaskType.OCR: ModelType.FLORENCE,  # Changed to Florence
             TaskType.OCR_WITH_REGION: ModelType.FLORENCE,
-            TaskType.VISUAL_PROMPTING: ModelType.FLORENCE,  # Fallback
-            TaskType.KEYPOINT: ModelType.FLORENCE,  # Fallback
+            TaskType.VISUAL_PROMPTING: ModelType.REXOMNI,
+            TaskType.KEYPOINT: ModelType.REXOMNI,
+            TaskType.DETECTION_KEYPOINT: ModelType.REXOMNI,
             TaskType.CAPTION: ModelType.FLORENCE,
             TaskType.CAPTION_DETAILED: ModelType.FLORENCE,
             TaskType.CAPTION_MORE_DETAILED: ModelType.FLORENCE,
@@ -56,18 +77,120 @@ class ModelRegistry:
             TaskType.DENSE_REGION_CAPTION: ModelType.FLORENCE,
         }
 
-    def run(self, task: TaskType, image_bytes: bytes, model: ModelType | None = None, **kwargs):
-        model = model or self.default_model.get(task)
-        if not model or model not in self.adapters:
+    def get_adapter(self, model: ModelType):
+        if model not in self.enabled_models:
             raise ValueError(f"No adapter found for model {model}")
+        return self.residency.get(model)
 
-        adapter = self.adapters[model]
+    def supported_tasks(self, model: ModelType) -> set[TaskType]:
+        """Answered from the adapter class; does not load the model."""
+        if model not in self.enabled_models:
+            raise ValueError(f"No adapter found for model {model}")
+        return self.residency.supported_tasks(model)
 
-        if task not in adapter.supported_tasks():
+    def run(
+        self,
+        task: TaskType,
+        image_bytes: bytes,
+        model: ModelType | None = None,
+        use_cache: bool = True,
+        on_progress=None,
+        **kwargs,
+    ):
+        """
+        `on_progress(info)` is forwarded to adapters that support it
+        (see BaseModelAdapter.supports_progress); it is not part of the cache key.
+        """
+        model = model or self.default_model.get(task)
+        if not model or model not in self.enabled_models:
+            raise ValueError(f"No adapter found for model {model}")
+        if task not in self.supported_tasks(model):
             raise ValueError(f"{model} does not support task {task}")
 
-        print(f"[Registry] Running task {task} with model {model} and kwargs {kwargs}")  # Added enhanced log
-        return adapter.run(task, image_bytes, **kwargs)
+        key = make_key(image_bytes, task.value, model.value, **kwargs) if use_cache else None
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            print(f"[Registry] Cache hit for task {task} with model {model}")
+            return self._with_cache_status(cached, "hit")
+
+        with self.residency.use(model) as adapter:
+            print(f"[Registry] Running task {task} with model {model} and kwargs {kwargs}")  # Added enhanced log
+            if on_progress is not None and adapter.supports_progress:
+                result = adapter.run(task, image_bytes, on_progress=on_progress, **kwargs)
+            else:
+                result = adapter.run(task, image_bytes, **kwargs)
+
+        if key:
+            self.cache.put(key, result)
+        return self._with_cache_status(result, "miss")
+
+    def run_many(
+        self,
+        tasks: list[tuple[TaskType, dict]],
+        image_bytes: bytes,
+        model: ModelType,
+        use_cache: bool = True,
+        on_result=None,
+    ):
+        """
+        Run [(task, kwargs), ...] on one image with one model.
+        Cached tasks are answered immediately; the rest go to the adapter together.
+        `on_result(index, result)` fires as each task finishes.
+        """
+        if model not in self.enabled_models:
+            raise ValueError(f"No adapter found for model {model}")
+        supported = self.supported_tasks(model)
+        for task, _ in tasks:
+            if task not in supported:
+                raise ValueError(f"{model} does not support task {task}")
+
+        results = [None] * len(tasks)
+        keys = [
+            make_key(image_bytes, task.value, model.value, **kwargs) if use_cache else None
+            for task, kwargs in tasks
+        ]
+
+        pending = []
+        for index, key in enumerate(keys):
+            cached = self.cache.get(key) if key else None
+            if cached is not None:
+                results[index] = self._with_cache_status(cached, "hit")
+                if on_result:
+                    on_result(index, results[index])
+            else:
+                pending.append(index)
+
+        if pending:
+            with self.residency.use(model) as adapter:
+                def _done(position, result):
+                    index = pending[position]
+                    if keys[index]:
+                        self.cache.put(keys[index], result)
+                    results[index] = self._with_cache_status(result, "miss")
+                    if on_result:
+                        on_result(index, results[index])
+
+                print(f"[Registry] Running {len(pending)} tasks with model {model}")
+                adapter.run_many([tasks[i] for i in pending], image_bytes, on_result=_done)
+
+        return results
+
+    @staticmethod
+    def _with_cache_status(result, status: str):
+        if isinstance(result, dict):
+            return {**result, "cache": status}
+        return result
+
+    @staticmethod
+    def supports_overlay(model: ModelType) -> bool:
+        return model in OVERLAY_RENDERERS
+
+    @staticmethod
+    def render_overlay(task: TaskType, model: ModelType, image_bytes: bytes, results: dict) -> bytes:
+        """PNG of `results` drawn over `image_bytes`, as visualize=True would have produced."""
+        if model not in OVERLAY_RENDERERS:
+            raise ValueError(f"{model} cannot render overlays")
+        return OVERLAY_RENDERERS[model](task, image_bytes, results)
 
     def get_task_config(self, task: TaskType):
         """
@@ -75,6 +198,6 @@ class ModelRegistry:
         - allowed_models: set of ModelType
         - required_args: list of strings (e.g., text_input, categories)
         """
-        allowed_models = {m for m, adapter in self.adapters.items() if task in adapter.supported_tasks()}
+        allowed_models = {m for m in self.enabled_models if task in self.supported_tasks(m)}
         required_args = TASK_INPUTS.get(task, [])
         return allowed_models, required_args
\ No newline at end of file
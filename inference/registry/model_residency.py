@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Type
+
+from .base_adapter import BaseModelAdapter
+from .model_types import ModelType
+from .task_types import TaskType
+from inference.memory_governor import memory_governor
+
+# Unload a model nobody has used for this long (0 keeps models resident)
+IDLE_UNLOAD_SECONDS = float(os.getenv("MODEL_IDLE_UNLOAD_SECONDS", "600"))
+
+
+class ModelResidency:
+    """
+    Process-wide owner of model adapters.
+
+    Models are registered by an adapter class loader: the class answers
+    supported_tasks() without loading weights, and the adapter itself is
+    built on first use and then shared by every caller (job workers, /vision
+    routers, registry lookups). Callers hold a reference while they run
+    inference; unload/evict only drops models nobody is using, and a
+    background thread unloads models idle for `idle_unload_seconds`.
+    """
+
+    def __init__(self, idle_unload_seconds: float = IDLE_UNLOAD_SECONDS):
+        self.idle_unload_seconds = idle_unload_seconds
+        self._reaper = None
+        self._factories: Dict[ModelType, Callable[[], Type[BaseModelAdapter]]] = {}
+        self._adapters: Dict[ModelType, BaseModelAdapter] = {}
+        self._refs: Dict[ModelType, int] = {}
+        self._last_used: Dict[ModelType, float] = {}
+        self._load_locks: Dict[ModelType, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Registration
+    # -----------------------------
+    def register(self, model: ModelType, factory: Callable[[], Type[BaseModelAdapter]]):
+        """`factory` returns the adapter class; it is instantiated on first use."""
+        with self._lock:
+            self._factories[model] = factory
+            self._load_locks.setdefault(model, threading.Lock())
+            self._refs.setdefault(model, 0)
+
+    def registered(self) -> set[ModelType]:
+        return set(self._factories)
+
+    def is_loaded(self, model: ModelType) -> bool:
+        return model in self._adapters
+
+    def supported_tasks(self, model: ModelType) -> set[TaskType]:
+        """Tasks of `model`'s adapter, without loading it."""
+        if model not in self._factories:
+            raise ValueError(f"No adapter registered for model {model}")
+        return self._factories[model]().supported_tasks()
+
+    # -----------------------------
+    # Access
+    # -----------------------------
+    def get(self, model: ModelType) -> BaseModelAdapter:
+        """Return the resident adapter, loading it on first use."""
+        adapter = self._adapters.get(model)
+        if adapter is not None:
+            self._ensure_reaper()
+            self._last_used[model] = time.monotonic()
+            return adapter
+        return self._acquire(model, hold=False)
+
+    def _acquire(self, model: ModelType, hold: bool) -> BaseModelAdapter:
+        self._ensure_reaper()
+        if model not in self._factories:
+            raise ValueError(f"No adapter registered for model {model}")
+
+        # Per-model lock so a slow load does not block other models. unload()
+        # takes it too, so a held adapter is counted before it can be dropped.
+        with self._load_locks[model]:
+            adapter = self._adapters.get(model)
+            if adapter is None:
+                print(f"[Residency] Loading model {model}")
+                started = time.monotonic()
+                adapter = self._factories[model]()()
+                with self._lock:
+                    self._adapters[model] = adapter
+                print(f"[Residency] Loaded model {model} in {time.monotonic() - started:.1f}s")
+            with self._lock:
+                if hold:
+                    self._refs[model] += 1
+                self._last_used[model] = time.monotonic()
+        return adapter
+
+    @contextmanager
+    def use(self, model: ModelType):
+        """Hold a reference on the model for the duration of the block."""
+        adapter = self._acquire(model, hold=True)
+        try:
+            yield adapter
+        finally:
+            with self._lock:
+                self._refs[model] -= 1
+                self._last_used[model] = time.monotonic()
+
+    # -----------------------------
+    # Unload / evict
+    # -----------------------------
+    def unload(self, model: ModelType, force: bool = False) -> bool:
+        """
+        Drop the resident adapter for `model`.
+        Returns False if the model is in use (unless force=True) or not loaded.
+        """
+        with self._load_locks.get(model, threading.Lock()):
+            with self._lock:
+                if model not in self._adapters:
+                    return False
+                if self._refs.get(model, 0) > 0 and not force:
+                    return False
+                adapter = self._adapters.pop(model)
+
+            adapter.unload()
+            del adapter
+            # Weights are gone: always hand their memory back
+            memory_governor.release("unload")
+            print(f"[Residency] Unloaded model {model}")
+            return True
+
+    def evict(self, keep: set[ModelType] | None = None) -> list[ModelType]:
+        """Unload every idle model not in `keep`. Returns the evicted models."""
+        keep = keep or set()
+        evicted = []
+        for model in list(self._adapters):
+            if model in keep:
+                continue
+            if self.unload(model):
+                evicted.append(model)
+        return evicted
+
+    def _ensure_reaper(self):
+        if self._reaper is None and self.idle_unload_seconds > 0:
+            with self._lock:
+                if self._reaper is None:
+                    self._reaper = threading.Thread(target=self._reap, name="model-reaper", daemon=True)
+                    self._reaper.start()
+
+    def _reap(self):
+        interval = min(60.0, max(1.0, self.idle_unload_seconds / 4))
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            # A candidate only; unload() checks the count again under the
+            # load lock that use() takes its reference under
+            with self._lock:
+                idle = [
+                    model for model in self._adapters
+                    if self._refs.get(model, 0) == 0
+                    and now - self._last_used.get(model, now) >= self.idle_unload_seconds
+                ]
+            for model in idle:
+                try:
+                    if self.unload(model):
+                        print(f"[Residency] Unloaded {model} after {self.idle_unload_seconds:.0f}s idle")
+                except Exception as exc:
+                    print(f"[Residency] Idle unload of {model} failed: {exc}")
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        status = {}
+        for model in self._factories:
+            adapter = self._adapters.get(model)
+            status[model.value] = {
+                "loaded": adapter is not None,
+                "tasks": sorted(t.value for t in self.supported_tasks(model)),
+                "idle_unload_seconds": self.idle_unload_seconds or None,
+                "refs": self._refs.get(model, 0),
+                "idle_seconds": (
+                    round(now - self._last_used[model], 1)
+                    if adapter is not None and model in self._last_used else None
+                ),
+                "stats": adapter.stats() if adapter is not None else {},
+            }
+        return status
+
+
+def _florence_factory():
+    from .florence_adapter import FlorenceAdapter
+    return FlorenceAdapter
+
+
+def _rexomni_factory():
+    from .rexomni_adapter import RexOmniAdapter
+    return RexOmniAdapter
+
+
+residency = ModelResidency()
+residency.register(ModelType.FLORENCE, _florence_factory)
+residency.register(ModelType.REXOMNI, _rexomni_factory)
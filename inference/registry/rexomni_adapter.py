@@ -1,36 +1,59 @@
 from .base_adapter import BaseModelAdapter
 from .task_types import TaskType
-from inference.rexomni.rexomni_service import RexOmniService
 
 class RexOmniAdapter(BaseModelAdapter):
 
+    tasks = frozenset({
+        TaskType.DETECTION,
+        TaskType.OCR,
+        TaskType.VISUAL_PROMPTING,
+        TaskType.KEYPOINT,
+        TaskType.DETECTION_KEYPOINT,
+    })
+
     def __init__(self):
-        self.service = RexOmniService()
+        # Imported here so the class (and its tasks) is available without rex_omni
+        from inference.rexomni.rexomni_service import RexOmniService
 
-    def supported_tasks(self):
-        return {
-            TaskType.DETECTION,
-            TaskType.OCR,
-            TaskType.VISUAL_PROMPTING,
-            TaskType.KEYPOINT,
-        }
+        self.service = RexOmniService()
 
     def run(self, task: TaskType, image_bytes: bytes, **kwargs):
+        """Results come back as {"results": [...]}, the shape jobs and the cache expect."""
 
         if task == TaskType.DETECTION:
             raw = self.service.run_detection(image_bytes, kwargs.get("categories"))
-            return self.service.postprocess_detection(raw)
+            return {"results": self.service.postprocess_detection(raw)}
 
         if task == TaskType.OCR:
             raw = self.service.run_ocr(image_bytes)
-            return self.service.postprocess_ocr(raw)
+            return {"results": self.service.postprocess_ocr(raw)}
 
         if task == TaskType.VISUAL_PROMPTING:
-            raw = self.service.run_visual_prompting(image_bytes, **kwargs)
-            return self.service.postprocess_visual_prompting(raw)
+            raw = self.service.run_visual_prompting(
+                image_bytes,
+                visual_prompt_boxes=kwargs.get("visual_prompt_boxes"),
+                categories=kwargs.get("categories"),
+            )
+            return {"results": self.service.postprocess_visual_prompting(raw)}
 
         if task == TaskType.KEYPOINT:
-            raw = self.service.run_keypoint(image_bytes)
-            return self.service.postprocess_keypoint(raw)
+            raw = self.service.run_keypoint(
+                image_bytes,
+                keypoint_type=kwargs.get("keypoint_type") or "human_pose",
+                categories=kwargs.get("categories"),
+            )
+            return {"results": self.service.postprocess_keypoint(raw)}
+
+        if task == TaskType.DETECTION_KEYPOINT:
+            cascade = {k: kwargs[k] for k in ("keypoint_type", "crop_padding", "max_boxes") if kwargs.get(k) is not None}
+            return {"results": self.service.run_detection_keypoint(image_bytes, kwargs.get("categories"), **cascade)}
 
         raise ValueError(f"Unsupported RexOmni task: {task}")
+
+    def unload(self):
+        if self.service is not None:
+            self.service.close()
+        self.service = None
+
+    def stats(self):
+        return self.service.stats() if self.service is not None else {}
@@ -10,6 +10,7 @@ class TaskType(str, Enum):
     # --- RexOmni-specific ---
     VISUAL_PROMPTING = "visual_prompting"
     KEYPOINT = "keypoint"
+    DETECTION_KEYPOINT = "detection_keypoint"
 
     # --- Captioning ---
     CAPTION = "caption"
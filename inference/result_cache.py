@@ -0,0 +1,252 @@
+"""
+Content-addressed inference result cache.
+
+Keys are a hash of the image bytes plus task, model, text_input, any
+generation parameters and the model's output-affecting configuration, so
+re-submitting the same image with the same request to the same deployment
+returns the stored result instead of running the model again.
+Two tiers: an in-memory LRU and an on-disk store of JSON files with
+size-based eviction.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", ".cache/results")
+RESULT_CACHE_MEMORY_ITEMS = int(os.getenv("RESULT_CACHE_MEMORY_ITEMS", "256"))
+RESULT_CACHE_DISK_BYTES = int(os.getenv("RESULT_CACHE_DISK_BYTES", str(2 * 1024 ** 3)))
+# Bumped when a default of the settings below (or the entry format) changes
+RESULT_CACHE_VERSION = 2
+
+# Settings that change a model's output for an identical request. Their
+# current values are part of every key for that model, so a deployment with
+# another working resolution, default profile, revision or backend never
+# reads results computed under the old one.
+CONFIG_ENV = {
+    "florence": ("FLORENCE_WORKING_MAX_SIDE", "FLORENCE_PROFILE", "FLORENCE_MODEL_REVISION"),
+    "rexomni": ("REXOMNI_WORKING_MAX_SIDE", "REXOMNI_BACKEND", "REXOMNI_QUANTIZATION", "REXOMNI_MODEL_PATH"),
+}
+
+
+def image_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def config_fingerprint(model: str) -> dict:
+    return {"version": RESULT_CACHE_VERSION, **{name: os.getenv(name) for name in CONFIG_ENV.get(str(model), ())}}
+
+
+def make_key(image_bytes: bytes, task: str, model: str, text_input: str | None = None, config: dict | None = None,
+             **params) -> str:
+    """`config` defaults to config_fingerprint(model); pass it when `model` is not a registry model name."""
+    payload = json.dumps(
+        {
+            "image": image_hash(image_bytes),
+            "task": str(task),
+            "model": str(model),
+            "text_input": text_input,
+            "params": params,
+            "config": config if config is not None else config_fingerprint(model),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Disk entries are JSON; bytes values (rendered images) are tagged base64
+_BYTES_TAG = "__bytes__"
+
+
+def _default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {_BYTES_TAG: base64.b64encode(value).decode()}
+    if hasattr(value, "tolist"):  # numpy arrays and scalars
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _restore(value):
+    if isinstance(value, dict):
+        if len(value) == 1 and _BYTES_TAG in value:
+            return base64.b64decode(value[_BYTES_TAG])
+        return {k: _restore(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_restore(v) for v in value]
+    return value
+
+
+def encode_entry(value) -> bytes:
+    """TypeError for values JSON cannot represent."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+        except orjson.JSONEncodeError as exc:
+            raise TypeError(str(exc)) from exc
+    return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+
+def decode_entry(data: bytes):
+    return _restore(orjson.loads(data) if orjson is not None else json.loads(data))
+
+
+class ResultCache:
+
+    def __init__(
+        self,
+        directory: str | None = RESULT_CACHE_DIR,
+        memory_items: int = RESULT_CACHE_MEMORY_ITEMS,
+        disk_bytes: int = RESULT_CACHE_DISK_BYTES,
+        enabled: bool = RESULT_CACHE_ENABLED,
+    ):
+        self.enabled = enabled
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self.directory = Path(directory) if directory else None
+
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        # key -> file size, ordered from least to most recently used
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_total = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.enabled and self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    # -----------------------------
+    # Disk tier
+    # -----------------------------
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load_disk_index(self):
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_total += size
+
+    def _evict_disk(self):
+        while self._disk_total > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_total -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            on_disk = key in self._disk
+
+        if on_disk:
+            path = self._path(key)
+            try:
+                value = decode_entry(path.read_bytes())
+                os.utime(path)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, value):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._remember(key, value)
+
+        if self.directory is None:
+            return
+
+        try:
+            data = encode_entry(value)
+        except TypeError:
+            # Not representable as JSON; the memory tier still has it
+            return
+        if len(data) > self.disk_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._disk_total -= self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._disk_total += len(data)
+            self._evict_disk()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for key in list(self._disk):
+                try:
+                    self._path(key).unlink()
+                except FileNotFoundError:
+                    pass
+            self._disk.clear()
+            self._disk_total = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "memory_items": len(self._memory),
+                "disk_items": len(self._disk),
+                "disk_bytes": self._disk_total,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,101 @@
+"""
+Long-lived RexOmni engine.
+
+One engine (RexOmniWrapper on the transformers or vLLM backend, or the stub)
+is built per process and fed by a single dispatcher thread. Concurrent calls
+with the same task and arguments — job workers, /vision requests, the crops
+of a detection -> keypoint cascade — are queued together and handed to the
+engine as one multi-image inference() call. This is static micro-batching:
+a batch is closed after REXOMNI_MAX_BATCH_WAIT_MS or REXOMNI_MAX_BATCH_SIZE
+images and runs to completion before the next one starts, on every backend
+(vLLM sees one inference() call per batch, not a stream of requests).
+The model is only ever entered from the dispatcher thread.
+"""
+
+import json
+import os
+from typing import Optional
+
+from inference.micro_batcher import MicroBatcher
+
+BACKENDS = ("transformers", "vllm", "stub")
+# Per deployment: transformers (default), vllm, or stub (no model; CI)
+BACKEND = os.getenv("REXOMNI_BACKEND", "transformers")
+# vLLM weight quantization, e.g. "awq" for an AWQ checkpoint
+QUANTIZATION = os.getenv("REXOMNI_QUANTIZATION") or None
+MODEL_PATH = os.getenv("REXOMNI_MODEL_PATH", "IDEA-Research/Rex-Omni")
+# Images handed to one inference() call, and how long the dispatcher waits to fill it
+MAX_BATCH_SIZE = int(os.getenv("REXOMNI_MAX_BATCH_SIZE", "16"))
+MAX_BATCH_WAIT_MS = float(os.getenv("REXOMNI_MAX_BATCH_WAIT_MS", "20"))
+
+
+def build_engine(backend: str, model_path: str, quantization: Optional[str] = None, cache_dir: Optional[str] = None):
+    """Construct the backend's RexOmniWrapper (or stub)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown RexOmni backend {backend!r}; expected one of {list(BACKENDS)}")
+
+    if backend == "stub":
+        from inference.rexomni.stub_engine import StubRexOmniWrapper
+        return StubRexOmniWrapper(model_path=model_path, backend=backend)
+
+    from huggingface_hub import snapshot_download
+    from rex_omni import RexOmniWrapper
+
+    if os.path.isdir(model_path):
+        local_model_path = model_path
+    else:
+        local_model_path = snapshot_download(
+            repo_id=model_path,
+            repo_type="model",
+            cache_dir=cache_dir,
+            local_files_only=False
+        )
+
+    kwargs = dict(
+        model_path=local_model_path,
+        backend=backend,
+        max_tokens=2048,
+        temperature=0.0,
+        top_p=0.05,
+        top_k=1,
+        repetition_penalty=1.05,
+    )
+    if quantization:
+        kwargs["quantization"] = quantization
+    return RexOmniWrapper(**kwargs)
+
+
+class RexOmniEngine:
+    """inference() with the wrapper's signature, batched across callers."""
+
+    def __init__(self, model, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_BATCH_WAIT_MS):
+        self.model = model
+        self.batcher = None
+        if max_batch_size > 1:
+            self.batcher = MicroBatcher(
+                self._run_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+                name="rexomni",
+            )
+
+    def inference(self, images, task: str, **kwargs) -> list:
+        """One result per image, like RexOmniWrapper.inference."""
+        images = images if isinstance(images, list) else [images]
+        # Only calls with identical arguments can share an engine call
+        key = (task, json.dumps(kwargs, sort_keys=True, default=str))
+        if self.batcher is not None:
+            return self.batcher.submit_many(key, images)
+        return self._run_batch(key, images)
+
+    def _run_batch(self, key, images):
+        task, kwargs = key
+        return self.model.inference(images=images, task=task, **json.loads(kwargs))
+
+    def stats(self) -> dict:
+        return self.batcher.stats() if self.batcher is not None else {"max_batch_size": 1}
+
+    def close(self):
+        # Calls already queued still run; the dispatcher then drops the model
+        if self.batcher is not None:
+            self.batcher.close()
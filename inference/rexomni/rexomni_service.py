@@ -1,52 +1,69 @@
 import os
-from huggingface_hub import snapshot_download
-from rex_omni import RexOmniWrapper
 from PIL import Image, ImageDraw, ImageFont
 import io
 from typing import List, Optional, Dict, Any
 
+from inference.image_ingest import decode_image, rescale_results, scale_of, translate_results
+from inference.rexomni.engine import BACKEND, MODEL_PATH, QUANTIZATION, RexOmniEngine, build_engine
+
+# Uploads are decoded with their longer side fitted to this (0 = full size);
+# predictions are mapped back to upload coordinates
+WORKING_MAX_SIDE = int(os.getenv("REXOMNI_WORKING_MAX_SIDE", "1920"))
+# Detection -> keypoint cascade: context added around each box (fraction of
+# its width/height) and the most boxes (largest first) sent to the keypoint pass
+CASCADE_CROP_PADDING = float(os.getenv("REXOMNI_CASCADE_CROP_PADDING", "0.1"))
+CASCADE_MAX_BOXES = int(os.getenv("REXOMNI_CASCADE_MAX_BOXES", "32"))
+
+KEYPOINT_CATEGORIES = {"human_pose": ["person"], "hand": ["hand"], "animal": ["animal"]}
+
+
+def _working_image(image_bytes: bytes):
+    return decode_image(image_bytes, max_side=WORKING_MAX_SIDE)
+
+
+def _to_working(results, image):
+    """Upload coordinates -> coordinates of the (possibly downscaled) working image."""
+    sx, sy = scale_of(image)
+    return rescale_results(results, (1 / sx, 1 / sy))
+
+
 class RexOmniService:
     def __init__(
         self,
-        model_path: str = "IDEA-Research/Rex-Omni",
+        model_path: str = MODEL_PATH,
         use_awq: bool = False,
-        cache_dir: Optional[str] = None
+        cache_dir: Optional[str] = None,
+        backend: Optional[str] = None,
+        quantization: Optional[str] = QUANTIZATION,
     ):
+        """
+        `backend` is transformers | vllm | stub (REXOMNI_BACKEND by default);
+        use_awq=True keeps its old meaning, vLLM with AWQ weights.
+        """
         if not cache_dir:
             cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "huggingface")
         self.cache_dir = cache_dir
         os.makedirs(self.cache_dir, exist_ok=True)
 
-        if os.path.isdir(model_path) and os.path.exists(model_path):
-            local_model_path = model_path
-        else:
-            local_model_path = snapshot_download(
-                repo_id=model_path,
-                repo_type="model",
-                cache_dir=self.cache_dir,
-                local_files_only=False
-            )
-
-        backend = "vllm" if use_awq else "transformers"
-        kwargs = dict(
-            model_path=local_model_path,
-            backend=backend,
-            max_tokens=2048,
-            temperature=0.0,
-            top_p=0.05,
-            top_k=1,
-            repetition_penalty=1.05,
-        )
         if use_awq:
-            kwargs["quantization"] = "awq"
+            backend, quantization = "vllm", "awq"
+        self.backend = backend or BACKEND
+
+        # One long-lived engine; concurrent calls are batched into it
+        self.model = RexOmniEngine(build_engine(self.backend, model_path, quantization, self.cache_dir))
 
-        self.model = RexOmniWrapper(**kwargs)
+    def stats(self):
+        return {"backend": self.backend, "batching": self.model.stats()}
+
+    def close(self):
+        self.model.close()
 
     # ------------------- INFERENCE -------------------
 
     def run_detection(self, image_bytes: bytes, categories: Optional[List[str]] = None):
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        return self.model.inference(images=image, task="detection", categories=categories or [])
+        image = _working_image(image_bytes)
+        raw = self.model.inference(images=image, task="detection", categories=categories or [])
+        return rescale_results(raw, scale_of(image))
 
     def run_visual_prompting(
         self, 
@@ -55,44 +72,91 @@ class RexOmniService:
         categories: Optional[List[str]] = None
     ):
         # Open image
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        
-        # Run Rex-Omni inference
-        return self.model.inference(
+        image = _working_image(image_bytes)
+
+        # Run Rex-Omni inference; prompt boxes come in upload coordinates
+        raw = self.model.inference(
             images=image,
             task="visual_prompting",
-            visual_prompt_boxes=visual_prompt_boxes or [],
+            visual_prompt_boxes=_to_working({"bbox": visual_prompt_boxes or []}, image)["bbox"],
             categories=categories or [],
             image_width=image.width,
             image_height=image.height
         )
+        return rescale_results(raw, scale_of(image))
 
 
 
     def run_keypoint(self, image_bytes: bytes, keypoint_type: str = "human_pose", categories: Optional[List[str]] = None):
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        image = _working_image(image_bytes)
         if not categories:
-            if keypoint_type == "human_pose":
-                categories = ["person"]
-            elif keypoint_type == "hand":
-                categories = ["hand"]
-            elif keypoint_type == "animal":
-                categories = ["animal"]
-        return self.model.inference(
+            categories = KEYPOINT_CATEGORIES.get(keypoint_type)
+        raw = self.model.inference(
             images=image,
             task="keypoint",
             keypoint_type=keypoint_type,
             categories=categories
         )
+        return rescale_results(raw, scale_of(image))
+
+    def run_detection_keypoint(
+        self,
+        image_bytes: bytes,
+        categories: Optional[List[str]] = None,
+        keypoint_type: str = "human_pose",
+        crop_padding: float = CASCADE_CROP_PADDING,
+        max_boxes: int = CASCADE_MAX_BOXES,
+    ):
+        """
+        Detect `categories`, then run keypoints on every detected box (padded
+        by `crop_padding`, at most `max_boxes`, largest first) in one batched
+        inference call over the crops. Returns detection entries with a
+        "persons" list of keypoint instances, all in upload coordinates.
+        """
+        image = _working_image(image_bytes)
+        categories = categories or KEYPOINT_CATEGORIES.get(keypoint_type, ["person"])
+        raw = self.model.inference(images=image, task="detection", categories=categories)
+        detections = self.postprocess_detection(raw)
+        detections.sort(key=lambda d: (d["bbox"][2] - d["bbox"][0]) * (d["bbox"][3] - d["bbox"][1]), reverse=True)
+        detections = detections[:max_boxes]
+
+        results = [{**det, "persons": []} for det in detections]
+        crops, origins = [], []
+        for index, det in enumerate(detections):
+            x0, y0, x1, y1 = det["bbox"]
+            pad_x, pad_y = (x1 - x0) * crop_padding, (y1 - y0) * crop_padding
+            box = (
+                max(0, int(x0 - pad_x)),
+                max(0, int(y0 - pad_y)),
+                min(image.width, int(x1 + pad_x + 0.5)),
+                min(image.height, int(y1 + pad_y + 0.5)),
+            )
+            if box[2] - box[0] < 2 or box[3] - box[1] < 2:
+                continue
+            crops.append(image.crop(box))
+            origins.append((index, box[:2]))
+
+        if crops:
+            raw_keypoints = self.model.inference(
+                images=crops,
+                task="keypoint",
+                keypoint_type=keypoint_type,
+                categories=categories,
+            )
+            # Crop coordinates -> working image coordinates
+            for (index, origin), crop_raw in zip(origins, raw_keypoints):
+                results[index]["persons"] = translate_results(self.postprocess_keypoint([crop_raw]), origin)
+        return rescale_results(results, scale_of(image))
 
     def run_ocr(self, image_bytes: bytes, ocr_output_format: str = "Box", ocr_granularity: str = "Word Level"):
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        return self.model.inference(
+        image = _working_image(image_bytes)
+        raw = self.model.inference(
             images=image,
             task="ocr_box",
             ocr_output_format=ocr_output_format,
             ocr_granularity=ocr_granularity
         )
+        return rescale_results(raw, scale_of(image))
 
     # ------------------- POSTPROCESS -------------------
 
@@ -125,6 +189,24 @@ class RexOmniService:
                         })
         return processed
 
+    def postprocess_ocr(self, raw_results):
+        """
+        Flatten OCR predictions
+        Output format: [{"text": <text>, "type": "box" | "polygon", "coords": [...]}, ...]
+        """
+        processed = []
+        for item in raw_results:
+            predictions = item.get("extracted_predictions", {})
+            for text, objs in predictions.items():
+                for obj in objs:
+                    if "coords" in obj:
+                        processed.append({
+                            "text": text,
+                            "type": obj.get("type"),
+                            "coords": obj["coords"],
+                        })
+        return processed
+
     def postprocess_keypoint(self, raw_results):
         """
         Extract keypoints and bbox for keypoint task
@@ -147,10 +229,9 @@ class RexOmniService:
     # ------------------- DRAWING -------------------
 
     def draw_detections(self, image_bytes, results, return_pil=False, save_name="det_result.jpg"):
-        from PIL import Image, ImageDraw
-
-        # Load image
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        # Reuses the decode from inference; copy before drawing on the shared image
+        img = _working_image(image_bytes).copy()
+        results = _to_working(results, img)
         draw = ImageDraw.Draw(img)
 
         # Draw boxes
@@ -173,7 +254,8 @@ class RexOmniService:
 
 
     def draw_keypoints(self, image_bytes, results, save_name="keypoint_result.jpg"):
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        image = _working_image(image_bytes).copy()
+        results = _to_working(results, image)
         draw = ImageDraw.Draw(image)
         try:
             font = ImageFont.load_default()
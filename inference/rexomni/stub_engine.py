@@ -0,0 +1,48 @@
+"""
+Stand-in for RexOmniWrapper (REXOMNI_BACKEND=stub).
+
+Same inference() surface and output shape as the real engine, with
+deterministic predictions derived from the image size and no model, so the
+API, job and batching paths run in CI without weights or a GPU.
+"""
+
+from typing import List, Optional
+
+
+class StubRexOmniWrapper:
+
+    def __init__(self, **kwargs):
+        self.config = kwargs
+        self.calls = 0
+        self.images = 0
+
+    def inference(
+        self,
+        images,
+        task: str = "detection",
+        categories: Optional[List[str]] = None,
+        visual_prompt_boxes: Optional[List[List[float]]] = None,
+        **kwargs,
+    ):
+        images = images if isinstance(images, list) else [images]
+        self.calls += 1
+        self.images += len(images)
+        return [self._predict(image, task, categories or ["object"], visual_prompt_boxes) for image in images]
+
+    @staticmethod
+    def _predict(image, task, categories, visual_prompt_boxes):
+        width, height = image.size
+        # Centre half of the image
+        box = [round(width * 0.25, 2), round(height * 0.25, 2), round(width * 0.75, 2), round(height * 0.75, 2)]
+
+        if task == "keypoint":
+            keypoints = {"nose": [round(width * 0.5, 2), round(height * 0.35, 2)]}
+            predictions = {c: [{"type": "keypoint", "bbox": box, "keypoints": keypoints}] for c in categories}
+        elif task == "visual_prompting":
+            predictions = {categories[0]: [{"type": "box", "coords": list(b)} for b in visual_prompt_boxes or []]}
+        elif task.startswith("ocr"):
+            predictions = {"text": [{"type": "box", "coords": box}]}
+        else:
+            predictions = {c: [{"type": "box", "coords": box}] for c in categories}
+
+        return {"extracted_predictions": predictions, "raw_output": "", "image_size": (width, height)}
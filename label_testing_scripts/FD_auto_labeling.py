@@ -3,8 +3,7 @@
 # Auto-labeling script for Face Detection (male/female) dataset using RexOmni API
 
 import os
-import json
-import requests
+import sys
 from pathlib import Path
 from tqdm import tqdm
 from PIL import Image
@@ -12,6 +11,14 @@ from io import BytesIO
 import numpy as np
 import random
 
+# Streaming per-class output shared with the server's dataset jobs, and the
+# pooled client SDK (clients/python; or `pip install -e clients/python`)
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "clients" / "python"))
+from app.services.annotation_sink import AnnotationSink
+from labeling_client import LabelingClient
+
 # ---------------------------------------------------------
 # Reproducibility
 # ---------------------------------------------------------
@@ -21,7 +28,10 @@ np.random.seed(0)
 # ---------------------------------------------------------
 # API endpoint
 # ---------------------------------------------------------
-API_URL = "http://localhost:6996/detection"  # Change if different
+API_URL = "http://localhost:6996"  # detection is served at the root here (rexomni_prefix="")
+MAX_IN_FLIGHT = 8
+
+client = LabelingClient(API_URL, max_in_flight=MAX_IN_FLIGHT, rexomni_prefix="")
 
 # ---------------------------------------------------------
 # Paths
@@ -31,58 +41,39 @@ OUTPUT_DIR = r"/mnt/models/binatest/dataset_bina/auto_labeling_results/face_dete
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # ---------------------------------------------------------
-# Process a single image
+# Label a single image
 # ---------------------------------------------------------
-def process_image(image_path, category_name, image_id, class_json):
-    """
-    Send image to RexOmni API, get detections, save visualization, and update JSON.
-    """
-    try:
-        with open(image_path, "rb") as f:
-            files = {"file": f}
-            data = [("categories", "face")]
-            response = requests.post(API_URL, files=files, data=data)
-
-        if response.status_code != 200:
-            print(f"[ERROR] HTTP {response.status_code} for {image_path}")
-            return image_id
-
-        if "X-Rex-Detections" not in response.headers:
-            print(f"[ERROR] No detection header for: {image_path}")
-            return image_id
-
-        detections = json.loads(response.headers["X-Rex-Detections"])
-
-        # Save visualization
-        try:
-            img = Image.open(BytesIO(response.content))
-            class_dir = os.path.join(OUTPUT_DIR, category_name)
-            os.makedirs(class_dir, exist_ok=True)
-            vis_path = os.path.join(class_dir, f"vis_{image_id}.jpg")
-            img.save(vis_path)
-        except Exception as e:
-            print(f"[WARN] Visualization failed for {image_path}: {e}")
-
-        # Update JSON
-        class_json["images"].append({
-            "id": image_id,
-            "file_name": str(image_path)
-        })
+def detect(image_path, category_name):
+    # Runs on the client's worker threads; retries 429/5xx with backoff
+    return client.detect(image_path, categories=["face"])
 
-        for det in detections:
-            x0, y0, x1, y1 = det["bbox"]
-            class_json["annotations"].append({
-                "image_id": image_id,
-                "bbox": det["bbox"],
-                "confidence": det.get("confidence"),
-                "area": (x1 - x0) * (y1 - y0)
-            })
 
-        return image_id + 1
+def save_result(image_path, category_name, result, sink):
+    """Record one image's face detections in the class sink and save its visualization."""
+    image_id = sink.next_image_id()
 
+    # Save visualization
+    try:
+        img = Image.open(BytesIO(result.image))
+        class_dir = os.path.join(OUTPUT_DIR, category_name)
+        os.makedirs(class_dir, exist_ok=True)
+        vis_path = os.path.join(class_dir, f"vis_{image_id}.jpg")
+        img.save(vis_path)
     except Exception as e:
-        print(f"[ERROR] Failed processing {image_path}: {e}")
-        return image_id
+        print(f"[WARN] Visualization failed for {image_path}: {e}")
+
+    # Update class record file
+    annotations = []
+    for det in result.detections:
+        annotations.append({
+            "image_id": image_id,
+            "bbox": det.bbox,
+            "confidence": det.score,
+            "area": det.area
+        })
+
+    sink.write(str(image_path), {"id": image_id, "file_name": str(image_path)}, annotations)
+
 
 # ---------------------------------------------------------
 # MAIN FUNCTION
@@ -99,30 +90,29 @@ def main():
 
         category_name = category_folder.name
         class_dir = os.path.join(OUTPUT_DIR, category_name)
-        json_path = os.path.join(class_dir, f"{category_name}.json")
-        os.makedirs(class_dir, exist_ok=True)
+        sink = AnnotationSink(class_dir, category_name, meta={"class": category_name})
+
+        images = sorted(p for p in category_folder.iterdir() if p.suffix.lower() in [".jpg", ".jpeg", ".png"])
 
-        # Skip already processed classes
-        if os.path.exists(json_path):
+        # Skip already recorded images (resume is per image)
+        pending = [p for p in images if str(p) not in sink]
+        if not pending and sink.json_path.exists():
             print(f"⏭ Skipping {category_name} (already completed)")
             continue
 
-        print(f"\n📌 Processing class: {category_name}")
-        class_json = {
-            "class": category_name,
-            "images": [],
-            "annotations": []
-        }
-
-        image_id = 1
-        images = [p for p in category_folder.iterdir() if p.suffix.lower() in [".jpg", ".jpeg", ".png"]]
+        print(f"\n📌 Processing class: {category_name} ({len(images) - len(pending)} already done)")
 
-        for img_file in tqdm(images, desc=category_name):
-            image_id = process_image(img_file, category_name, image_id, class_json)
+        # Requests run MAX_IN_FLIGHT at a time; results come back in file order
+        # so image ids stay stable across reruns
+        results = client.map(lambda p: detect(p, category_name), pending, ordered=True)
+        for img_file, result, error in tqdm(results, total=len(pending), desc=category_name):
+            if error is not None:
+                print(f"[ERROR] Failed processing {img_file}: {error}")
+                continue
+            save_result(img_file, category_name, result, sink)
 
         # Save class JSON
-        with open(json_path, "w") as f:
-            json.dump(class_json, f, indent=2)
+        json_path = sink.compact()
         print(f"📄 Saved JSON → {json_path}")
 
     print("\n✅ Face auto-labeling DONE.")
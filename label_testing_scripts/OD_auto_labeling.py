@@ -1,6 +1,5 @@
 import os
-import json
-import requests
+import sys
 from pathlib import Path
 from tqdm import tqdm
 from PIL import Image
@@ -8,13 +7,24 @@ from io import BytesIO
 import numpy as np
 import random
 
+# Streaming per-class output shared with the server's dataset jobs, and the
+# pooled client SDK (clients/python; or `pip install -e clients/python`)
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "clients" / "python"))
+from app.services.annotation_sink import AnnotationSink
+from labeling_client import LabelingClient
+
 # ---------------------------------------------------------
 # Reproducibility
 # ---------------------------------------------------------
 random.seed(0)
 np.random.seed(0)
 
-API_URL = "http://localhost:6996/detection"
+API_URL = "http://localhost:6996"  # detection is served at the root here (rexomni_prefix="")
+MAX_IN_FLIGHT = 8
+
+client = LabelingClient(API_URL, max_in_flight=MAX_IN_FLIGHT, rexomni_prefix="")
 
 # Global output
 OUTPUT_DIR = r"/mnt/models/binatest/dataset_bina/auto_labeling_results"
@@ -25,32 +35,20 @@ DATASET_DIR = r"/mnt/models/binatest/dataset_bina/Object Detection/ObjectDataset
 
 
 # ---------------------------------------------------------
-# Process a single image for one class
+# Label a single image for one class
 # ---------------------------------------------------------
-def process_image(image_path, category_name, image_id, class_json):
-
-    with open(image_path, "rb") as f:
-        files = {"file": f}
-        data = [("categories", category_name)]
-        response = requests.post(API_URL, files=files, data=data)
-
-    if response.status_code != 200:
-        print(f"[ERROR] HTTP {response.status_code} for {image_path}")
-        return image_id
+def detect(image_path, category_name):
+    # Runs on the client's worker threads; retries 429/5xx with backoff
+    return client.detect(image_path, categories=[category_name])
 
-    if "X-Rex-Detections" not in response.headers:
-        print(f"[ERROR] No detection header for: {image_path}")
-        return image_id
 
-    try:
-        detections = json.loads(response.headers["X-Rex-Detections"])
-    except Exception:
-        print(f"[ERROR] Failed to decode detection JSON for: {image_path}")
-        return image_id
+def save_result(image_path, category_name, result, sink):
+    """Record one image's detections in the class sink and save its visualization."""
+    image_id = sink.next_image_id()
 
     # Save visualization
     try:
-        img = Image.open(BytesIO(response.content))
+        img = Image.open(BytesIO(result.image))
         class_dir = os.path.join(OUTPUT_DIR, category_name)
         os.makedirs(class_dir, exist_ok=True)
         vis_path = os.path.join(class_dir, f"vis_{image_id}.jpg")
@@ -58,30 +56,25 @@ def process_image(image_path, category_name, image_id, class_json):
     except Exception as e:
         print(f"[WARN] Visualization failed for {image_path}: {e}")
 
-    # Update class-specific JSON
-    class_json["images"].append({
-        "id": image_id,
-        "file_name": str(image_path)
-    })
-
-    for det in detections:
-        x0, y0, x1, y1 = det["bbox"]
-        class_json["annotations"].append({
+    # Append to the class record file (durable once checkpointed)
+    annotations = []
+    for det in result.detections:
+        annotations.append({
             "image_id": image_id,
-            "bbox": det["bbox"],
-            "confidence": det.get("confidence"),
-            "area": (x1 - x0) * (y1 - y0)
+            "bbox": det.bbox,
+            "confidence": det.score,
+            "area": det.area
         })
 
-    return image_id + 1
+    sink.write(str(image_path), {"id": image_id, "file_name": str(image_path)}, annotations)
 
 
 # ---------------------------------------------------------
 # MAIN
 # ---------------------------------------------------------
 
-# SKIP IF THIS CLASS WAS ALREADY FINISHED
-#(this is update main func , after crashing the api ,and we start again from where the api crashed)
+# Resume is per image: images already recorded in the class sink are skipped
+#(after crashing the api, we start again from exactly where the api crashed)
 def main():
     dataset_path = Path(DATASET_DIR)
 
@@ -96,37 +89,33 @@ def main():
 
         category_name = category_folder.name
         class_dir = os.path.join(OUTPUT_DIR, category_name)
-        json_path = os.path.join(class_dir, f"{category_name}.json")
+        sink = AnnotationSink(class_dir, category_name, meta={"class": category_name})
+
+        images = sorted(
+            p for p in category_folder.iterdir()
+            if p.suffix.lower() in [".jpg", ".jpeg", ".png"]
+        )
 
         # ---------------------------------------
-        # SKIP IF THIS CLASS WAS ALREADY FINISHED
+        # SKIP IMAGES THAT WERE ALREADY RECORDED
         # ---------------------------------------
-        if os.path.exists(json_path):
+        pending = [p for p in images if str(p) not in sink]
+        if not pending and sink.json_path.exists():
             print(f"⏭ Skipping {category_name} (already completed)")
             continue
 
-        print(f"\n📌 Processing class: {category_name}")
-
-        class_json = {
-            "class": category_name,
-            "images": [],
-            "annotations": []
-        }
-
-        image_id = 1
-
-        images = [
-            p for p in category_folder.iterdir()
-            if p.suffix.lower() in [".jpg", ".jpeg", ".png"]
-        ]
+        print(f"\n📌 Processing class: {category_name} ({len(images) - len(pending)} already done)")
 
-        for img_file in tqdm(images, desc=category_name):
-            image_id = process_image(img_file, category_name, image_id, class_json)
-
-        os.makedirs(class_dir, exist_ok=True)
+        # Requests run MAX_IN_FLIGHT at a time; results come back in file order
+        # so image ids stay stable across reruns
+        results = client.map(lambda p: detect(p, category_name), pending, ordered=True)
+        for img_file, result, error in tqdm(results, total=len(pending), desc=category_name):
+            if error is not None:
+                print(f"[ERROR] Failed processing {img_file}: {error}")
+                continue
+            save_result(img_file, category_name, result, sink)
 
-        with open(json_path, "w") as f:
-            json.dump(class_json, f, indent=2)
+        json_path = sink.compact()
 
         print(f"📄 Saved JSON → {json_path}")
 
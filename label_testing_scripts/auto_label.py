@@ -1,6 +1,5 @@
 import os
-import json
-import requests
+import sys
 from pathlib import Path
 from tqdm import tqdm
 from PIL import Image
@@ -8,13 +7,24 @@ from io import BytesIO
 import numpy as np
 import random
 
+# Streaming per-class output shared with the server's dataset jobs, and the
+# pooled client SDK (clients/python; or `pip install -e clients/python`)
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "clients" / "python"))
+from app.services.annotation_sink import AnnotationSink
+from labeling_client import LabelingClient
+
 # ---------------------------------------------------------
 # Reproducibility
 # ---------------------------------------------------------
 random.seed(0)
 np.random.seed(0)
 
-API_URL = "http://localhost:6996/detection"
+API_URL = "http://localhost:6996"  # detection is served at the root here (rexomni_prefix="")
+MAX_IN_FLIGHT = 8
+
+client = LabelingClient(API_URL, max_in_flight=MAX_IN_FLIGHT, rexomni_prefix="")
 
 OUTPUT_DIR = r"D:\hami_system_sharif\rex-omni\auto_labeling_results"
 DATASET_DIR = r"D:\hami_system_sharif\rex-omni\Dataset\object_detection"
@@ -22,55 +32,38 @@ DATASET_DIR = r"D:\hami_system_sharif\rex-omni\Dataset\object_detection"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # ---------------------------------------------------------
-# PROCESS ONE IMAGE
+# LABEL ONE IMAGE
 # ---------------------------------------------------------
-def process_image(image_path, category_name, image_id, class_json):
-    # send request
-    with open(image_path, "rb") as f:
-        files = {"file": f}
-        data = [("categories", category_name)]
-        response = requests.post(API_URL, files=files, data=data)
+def detect(image_path, category_name):
+    # Runs on the client's worker threads; retries 429/5xx with backoff
+    return client.detect(image_path, categories=[category_name])
 
-    if response.status_code != 200:
-        print(f"[ERROR] HTTP {response.status_code} for {image_path}")
-        return image_id
 
-    if "X-Rex-Detections" not in response.headers:
-        print(f"[ERROR] No detection header for: {image_path}")
-        return image_id
-
-    try:
-        detections = json.loads(response.headers["X-Rex-Detections"])
-    except:
-        print(f"[ERROR] Failed to decode detection JSON for: {image_path}")
-        return image_id
+def save_result(image_path, category_name, result, sink):
+    """Record one image's detections in the class sink and save its visualization."""
+    image_id = sink.next_image_id()
 
-    # save visualized image
+    # Save visualization
     try:
-        img = Image.open(BytesIO(response.content))
-        category_dir = os.path.join(OUTPUT_DIR, category_name)
-        os.makedirs(category_dir, exist_ok=True)
-        vis_path = os.path.join(category_dir, f"vis_{image_id}.jpg")
+        img = Image.open(BytesIO(result.image))
+        class_dir = os.path.join(OUTPUT_DIR, category_name)
+        os.makedirs(class_dir, exist_ok=True)
+        vis_path = os.path.join(class_dir, f"vis_{image_id}.jpg")
         img.save(vis_path)
     except Exception as e:
-        print(f"[WARN] Cannot save visualization for {image_path}: {e}")
-
-    # append to per-class JSON
-    class_json["images"].append({
-        "id": image_id,
-        "file_name": str(image_path)
-    })
+        print(f"[WARN] Visualization failed for {image_path}: {e}")
 
-    for det in detections:
-        x0, y0, x1, y1 = det["bbox"]
-        class_json["annotations"].append({
+    # append to per-class record file
+    annotations = []
+    for det in result.detections:
+        annotations.append({
             "image_id": image_id,
-            "bbox": det["bbox"],
-            "confidence": det.get("confidence", None),
-            "area": (x1 - x0) * (y1 - y0)
+            "bbox": det.bbox,
+            "confidence": det.score,
+            "area": det.area
         })
 
-    return image_id + 1
+    sink.write(str(image_path), {"id": image_id, "file_name": str(image_path)}, annotations)
 
 
 # ---------------------------------------------------------
@@ -89,31 +82,27 @@ def main():
         category_name = category_folder.name
         print(f"\n📌 Processing category: {category_name}")
 
-        # Prepare per-class JSON
-        class_json = {
-            "category": category_name,
-            "images": [],
-            "annotations": []
-        }
-
-        # internal image counter per class
-        image_id = 1
+        # Per-class record file; already recorded images are skipped on rerun
+        class_dir = os.path.join(OUTPUT_DIR, category_name)
+        sink = AnnotationSink(class_dir, category_name, meta={"category": category_name})
 
-        images = [
+        images = sorted(
             p for p in category_folder.iterdir()
             if p.suffix.lower() in [".jpg", ".jpeg", ".png"]
-        ]
-
-        for img_file in tqdm(images, desc=category_name):
-            image_id = process_image(img_file, category_name, image_id, class_json)
+        )
+        pending = [p for p in images if str(p) not in sink]
+
+        # Requests run MAX_IN_FLIGHT at a time; results come back in file order
+        # so image ids stay stable across reruns
+        results = client.map(lambda p: detect(p, category_name), pending, ordered=True)
+        for img_file, result, error in tqdm(results, total=len(pending), desc=category_name):
+            if error is not None:
+                print(f"[ERROR] Failed processing {img_file}: {error}")
+                continue
+            save_result(img_file, category_name, result, sink)
 
         # Save JSON per class
-        class_dir = os.path.join(OUTPUT_DIR, category_name)
-        os.makedirs(class_dir, exist_ok=True)
-
-        json_path = os.path.join(class_dir, f"{category_name}.json")
-        with open(json_path, "w") as f:
-            json.dump(class_json, f, indent=2)
+        json_path = sink.compact()
 
         print(f"📄 JSON saved: {json_path}")
 
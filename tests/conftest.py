@@ -0,0 +1,39 @@
+"""
+Test setup: the RexOmni stub engine, an in-memory job store and no result
+cache, with job artifacts under a throwaway working directory. Set before
+any app module is imported, since they read their configuration at import.
+"""
+
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+# The Python client is its own package under clients/python
+sys.path.insert(0, str(ROOT / "clients" / "python"))
+
+os.environ.setdefault("REXOMNI_BACKEND", "stub")
+os.environ.setdefault("ENABLED_MODELS", "rexomni")
+os.environ.setdefault("JOB_STORE_BACKEND", "memory")
+os.environ.setdefault("RESULT_CACHE_ENABLED", "0")
+# Wide enough for concurrently submitted jobs to land in one engine call
+os.environ.setdefault("REXOMNI_MAX_BATCH_WAIT_MS", "100")
+os.chdir(tempfile.mkdtemp(prefix="labeling-tests-"))
+
+
+def make_image(width=64, height=48, color=(200, 40, 40), fmt="PNG") -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def image_bytes():
+    return make_image()
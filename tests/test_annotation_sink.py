@@ -0,0 +1,74 @@
+import json
+
+from app.services.annotation_sink import AnnotationSink
+
+
+def record(index):
+    return {"id": index, "file_name": f"{index}.jpg"}, [{"image_id": index, "bbox": [0, 0, 1, 1], "label": "cat"}]
+
+
+def test_resume_truncates_records_past_the_last_checkpoint(tmp_path):
+    sink = AnnotationSink(tmp_path, "cat", checkpoint_every=2)
+    for index in (1, 2, 3):
+        sink.write(f"{index}.jpg", *record(index))
+    # Crash: record 3 reached the file but was never checkpointed
+    sink._records.flush()
+    checkpointed = sink._offset
+    assert sink.records_path.stat().st_size > checkpointed
+
+    resumed = AnnotationSink(tmp_path, "cat", checkpoint_every=2)
+    assert "1.jpg" in resumed and "2.jpg" in resumed
+    assert "3.jpg" not in resumed
+    assert resumed.records_path.stat().st_size == checkpointed
+
+    resumed.write("3.jpg", *record(3))
+    resumed.close()
+    keys = [json.loads(line)["key"] for line in resumed.records_path.read_text().splitlines()]
+    assert keys == ["1.jpg", "2.jpg", "3.jpg"]
+
+
+def test_torn_index_line_falls_back_to_previous_checkpoint(tmp_path):
+    sink = AnnotationSink(tmp_path, "dog")
+    sink.write("a.jpg", *record(1))
+    sink.write("b.jpg", *record(2))
+    sink.close()
+    lines = sink.index_path.read_text().splitlines()
+    # Second checkpoint only half written
+    sink.index_path.write_text(lines[0] + "\n" + lines[1].split("\t")[0])
+
+    resumed = AnnotationSink(tmp_path, "dog")
+    assert "a.jpg" in resumed and "b.jpg" not in resumed
+    assert len(resumed.records_path.read_text().splitlines()) == 1
+
+
+def test_partial_index_line_with_a_tab_is_torn(tmp_path):
+    sink = AnnotationSink(tmp_path, "dog")
+    sink.write("a.jpg", *record(1))
+    sink.write("b.jpg", *record(2))
+    sink.close()
+    lines = sink.index_path.read_text().splitlines()
+    # The offset and tab made it to disk, the key only in part
+    sink.index_path.write_text(lines[0] + "\n" + lines[1][:-3])
+
+    resumed = AnnotationSink(tmp_path, "dog")
+    assert "a.jpg" in resumed and "b.jpg" not in resumed
+    assert len(resumed) == 1
+    assert resumed.index_path.read_text() == lines[0] + "\n"
+
+    # The next checkpoint lands on its own line
+    resumed.write("b.jpg", *record(2))
+    resumed.close()
+    assert "b.jpg" in AnnotationSink(tmp_path, "dog")
+
+
+def test_compact_writes_coco_json_with_sequential_annotation_ids(tmp_path):
+    sink = AnnotationSink(tmp_path, "cat", meta={"class": "cat"})
+    for index in (1, 2):
+        sink.write(f"{index}.jpg", *record(index))
+    path = sink.compact()
+
+    coco = json.loads(path.read_text())
+    assert coco["class"] == "cat"
+    assert [image["id"] for image in coco["images"]] == [1, 2]
+    assert [annotation["id"] for annotation in coco["annotations"]] == [1, 2]
+    assert AnnotationSink(tmp_path, "cat").next_image_id() == 3
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from app.routers.jobs import _sse
+from app.services.responses import _multipart
+from labeling_client.client import LabelingClient, parse_multipart, parse_sse, parse_vision_response
+from labeling_client.retry import APIError, RetryPolicy
+
+
+class FakeResponse:
+
+    def __init__(self, content: bytes, headers: dict):
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers)
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def multipart_body(payload, image: bytes, boundary="b0undary"):
+    return b"".join(_multipart(payload, image, "image/jpeg", boundary)), f"multipart/mixed; boundary={boundary}"
+
+
+def test_parse_multipart_reads_the_server_body():
+    # Image bytes that contain CRLFs and dashes must come back untouched
+    image = b"\xff\xd8\r\n--not-a-boundary\r\n\x00\xff\xd9"
+    body, content_type = multipart_body({"task": "Detection", "results": [{"label": "cat"}]}, image)
+
+    parts = parse_multipart(body, content_type)
+    assert parts["image"] == ("image/jpeg", image)
+    media_type, results = parts["results"]
+    assert media_type == "application/json"
+    assert json.loads(results)["results"] == [{"label": "cat"}]
+
+
+def test_parse_multipart_accepts_quoted_boundary():
+    body, _ = multipart_body({"results": []}, b"img", boundary="abc")
+    parts = parse_multipart(body, 'multipart/mixed; boundary="abc"; charset=utf-8')
+    assert parts["image"][1] == b"img"
+
+
+@pytest.mark.parametrize("mode", ["multipart", "image", "json"])
+def test_parse_vision_response_handles_every_mode(mode):
+    payload = {"task": "Detection", "results": [{"label": "dog"}]}
+    if mode == "multipart":
+        body, content_type = multipart_body(payload, b"jpeg")
+        response = FakeResponse(body, {"Content-Type": content_type})
+        expected_image = b"jpeg"
+    elif mode == "image":
+        headers = {"Content-Type": "image/jpeg", "X-Rex-Detections": json.dumps(payload["results"])}
+        response = FakeResponse(b"jpeg", headers)
+        expected_image = b"jpeg"
+    else:
+        response = FakeResponse(json.dumps(payload).encode(), {"Content-Type": "application/json"})
+        expected_image = None
+
+    results, image = parse_vision_response(response, "X-Rex-Detections")
+    assert results["results"] == [{"label": "dog"}]
+    assert image == expected_image
+
+
+def test_parse_sse_reads_server_events_and_skips_keep_alives():
+    events = [
+        {"type": "snapshot", "seq": 0, "job_id": "a", "status": "queued"},
+        {"type": "state", "seq": 7, "job_id": "a", "status": "completed"},
+    ]
+    stream = _sse(events[0]) + ": keep-alive\n\n" + _sse(events[1])
+
+    assert list(parse_sse(stream.split("\n"))) == events
+
+
+def test_parse_sse_joins_multiline_data():
+    lines = ["event: progress", 'data: {"a":', "data: 1}", "", ""]
+    assert list(parse_sse(lines)) == [{"a": 1}]
+
+
+class FlakySession:
+    """Stands in for requests.Session: raises or answers from a script."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class StatusResponse(FakeResponse):
+
+    def __init__(self, status_code):
+        super().__init__(json.dumps({"detail": "x", "job_id": "j"}).encode(), {})
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = ""
+
+
+def retrying_client(session):
+    client = LabelingClient("http://server", retry=RetryPolicy(attempts=3, base_delay=0))
+    client.session = session
+    return client
+
+
+@pytest.mark.parametrize("method, first, retried", [
+    ("GET", StatusResponse(502), True),
+    ("GET", requests.ReadTimeout(), True),
+    ("POST", StatusResponse(429), True),
+    ("POST", StatusResponse(503), True),
+    ("POST", requests.ConnectTimeout(), True),
+    # The job may have been created before the gateway error / lost response
+    ("POST", StatusResponse(502), False),
+    ("POST", requests.ReadTimeout(), False),
+    ("POST", requests.ConnectionError("connection reset"), False),
+])
+def test_posts_are_only_retried_when_the_server_did_no_work(method, first, retried):
+    session = FlakySession(first, StatusResponse(200))
+    client = retrying_client(session)
+    if retried:
+        assert client._request(method, "/api/jobs").ok
+    else:
+        with pytest.raises((APIError, requests.RequestException)):
+            client._request(method, "/api/jobs")
+    assert session.calls == (2 if retried else 1)
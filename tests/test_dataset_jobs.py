@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+from app.services import dataset_jobs
+from app.services.job_manager import get_job
+from app.services.job_scheduler import JobScheduler, QueueFullError
+from conftest import make_image
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_jobs, "DATASET_ROOT", str(tmp_path))
+    for name in ("cat", "dog"):
+        (tmp_path / "images" / name).mkdir(parents=True)
+        (tmp_path / "images" / name / "1.png").write_bytes(make_image())
+    return tmp_path
+
+
+def test_paths_refused_without_dataset_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_jobs, "DATASET_ROOT", None)
+    with pytest.raises(ValueError, match="DATASET_ROOT"):
+        dataset_jobs.collect_items(str(tmp_path))
+
+
+def test_paths_outside_dataset_root_refused(dataset):
+    with pytest.raises(ValueError, match="outside DATASET_ROOT"):
+        dataset_jobs.collect_items(str(dataset.parent))
+
+
+def test_collect_items_by_class_folder(dataset):
+    items = dataset_jobs.collect_items(str(dataset / "images"))
+    assert [name for name, _ in items] == ["cat", "dog"]
+
+
+@pytest.mark.parametrize("category", ["../escape", "a/b", "a\\b", "..", "."])
+def test_manifest_category_must_not_be_a_path(dataset, category):
+    manifest = [{"path": str(dataset / "images" / "cat" / "1.png"), "category": category}]
+    with pytest.raises(ValueError, match="Invalid category"):
+        dataset_jobs.collect_items(manifest=manifest)
+
+
+def test_full_dataset_lane_rejects_and_leaves_no_job(dataset, monkeypatch):
+    scheduler = JobScheduler(max_queue=0)
+    monkeypatch.setattr(dataset_jobs, "scheduler", scheduler)
+    created = []
+    original_create = dataset_jobs.create_job
+    monkeypatch.setattr(
+        dataset_jobs, "create_job",
+        lambda *args: created.append(original_create(*args)) or created[-1],
+    )
+
+    with pytest.raises(QueueFullError):
+        dataset_jobs.submit_dataset_job({
+            "task": "detection",
+            "model": "rexomni",
+            "directory": str(dataset / "images"),
+            "output_dir": str(dataset / "out"),
+        })
+
+    assert get_job(created[0]["id"]) is None
+    assert not dataset_jobs._runs
+
+
+def test_dataset_job_runs_on_its_lane(dataset):
+    job = dataset_jobs.submit_dataset_job({
+        "task": "detection",
+        "model": "rexomni",
+        "directory": str(dataset / "images"),
+        "output_dir": str(dataset / "out"),
+    })
+    deadline = time.monotonic() + 10
+    while get_job(job["id"])["status"] not in ("completed", "failed") and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    job = get_job(job["id"])
+    assert job["status"] == "completed", job["error"]
+    assert job["result"]["processed"] == 2
+    assert dataset_jobs.scheduler.stats(dataset_jobs.DATASET_LANE)["completed"] >= 1
+
+
+def test_dataset_inference_waits_out_a_full_model_lane(dataset, monkeypatch):
+    monkeypatch.setattr(dataset_jobs, "LANE_RETRY_SECONDS", 0.01)
+    scheduler = JobScheduler()
+    monkeypatch.setattr(dataset_jobs, "scheduler", scheduler)
+    submit = scheduler.submit
+    lanes = []
+
+    def flaky_submit(lane, job_id, fn, *args):
+        lanes.append(lane)
+        # The model lane is full the first time each image is offered
+        if lane == "rexomni" and lanes.count("rexomni") % 2:
+            raise QueueFullError(lane, 0)
+        return submit(lane, job_id, fn, *args)
+
+    monkeypatch.setattr(scheduler, "submit", flaky_submit)
+    job = dataset_jobs.submit_dataset_job({
+        "task": "detection",
+        "model": "rexomni",
+        "directory": str(dataset / "images"),
+        "output_dir": str(dataset / "out"),
+    })
+    deadline = time.monotonic() + 10
+    while get_job(job["id"])["status"] not in ("completed", "failed") and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    job = get_job(job["id"])
+    assert job["status"] == "completed", job["error"]
+    assert job["result"]["processed"] == 2
+    # Every image went through the model lane, none around it
+    assert scheduler.stats("rexomni")["completed"] == 2
+    assert job["wait_time"] is not None
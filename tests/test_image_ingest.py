@@ -0,0 +1,77 @@
+import copy
+
+import pytest
+
+from inference.image_ingest import (
+    ImageIngestError,
+    decode_image,
+    probe,
+    rescale_results,
+    scale_of,
+    translate_results,
+)
+from conftest import make_image
+
+
+def test_probe_reads_the_header():
+    info = probe(make_image(30, 20, fmt="JPEG"))
+    assert (info.format, info.width, info.height, info.extension) == ("JPEG", 30, 20, ".jpg")
+
+
+def test_probe_rejects_garbage():
+    with pytest.raises(ImageIngestError):
+        probe(b"not an image")
+
+
+def test_decode_downscales_and_records_scale():
+    image = decode_image(make_image(400, 200), max_side=100)
+    assert image.size == (100, 50)
+    assert scale_of(image) == (4.0, 4.0)
+    assert image.info["original_size"] == (400, 200)
+
+
+def test_decoded_images_are_shared_and_read_only():
+    data = make_image(50, 50, color=(1, 2, 3))
+    image = decode_image(data)
+    assert decode_image(data) is image
+
+    with pytest.raises(TypeError):
+        image.info["pixel_values"] = object()
+    with pytest.raises(TypeError):
+        image.info.pop("scale")
+    assert "pixel_values" not in decode_image(data).info
+
+    # Copies for drawing or cropping get their own, writable info
+    for derived in (image.copy(), copy.deepcopy(image), image.crop((0, 0, 10, 10))):
+        derived.info["note"] = "mine"
+        assert "note" not in image.info
+
+
+def test_rescale_maps_every_coordinate_key():
+    results = {
+        "<OD>": {"bboxes": [[10, 20, 30, 40]], "labels": ["a"]},
+        "polygons": [[[1, 2, 3, 4, 5, 6]]],
+        "keypoints": {"nose": [5, 5]},
+        "text": "unchanged",
+    }
+    scaled = rescale_results(results, (2.0, 0.5))
+    assert scaled["<OD>"]["bboxes"] == [[20.0, 10.0, 60.0, 20.0]]
+    assert scaled["<OD>"]["labels"] == ["a"]
+    assert scaled["polygons"] == [[[2.0, 1.0, 6.0, 2.0, 10.0, 3.0]]]
+    assert scaled["keypoints"] == {"nose": [10.0, 2.5]}
+    assert scaled["text"] == "unchanged"
+    # The input is left alone
+    assert results["<OD>"]["bboxes"] == [[10, 20, 30, 40]]
+
+
+def test_rescale_identity_returns_input():
+    results = [{"bbox": [1, 2, 3, 4]}]
+    assert rescale_results(results, (1.0, 1.0)) is results
+
+
+def test_translate_shifts_crop_coordinates():
+    crop_results = [{"label": "person", "bbox": [1, 2, 3, 4], "keypoints": {"nose": [2, 3]}}]
+    shifted = translate_results(crop_results, (100, 50))
+    assert shifted == [{"label": "person", "bbox": [101.0, 52.0, 103.0, 54.0], "keypoints": {"nose": [102.0, 53.0]}}]
+    assert translate_results(crop_results, (0, 0)) is crop_results
+
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers.jobs import router
+from app.services.job_manager import create_job, update_job
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_socket_sends_snapshot_then_live_events(client):
+    job = create_job("detection", "rexomni", {})
+    with client.websocket_connect(f"/api/jobs/ws?ids={job['id']}") as ws:
+        snapshot = ws.receive_json()
+        assert snapshot["type"] == "snapshot" and snapshot["status"] == "queued"
+
+        update_job(job["id"], status="running")
+        event = ws.receive_json()
+        assert event["type"] == "state" and event["status"] == "running"
+
+
+def test_socket_subscribes_after_connecting(client):
+    job = create_job("detection", "rexomni", {})
+    with client.websocket_connect("/api/jobs/ws") as ws:
+        ws.send_json({"subscribe": [job["id"]]})
+        assert ws.receive_json()["job_id"] == job["id"]
+
+
+@pytest.mark.parametrize("message", ['["subscribe"]', "not json", '{"subscribe": "abc"}', '{"unsubscribe": [1]}'])
+def test_socket_rejects_malformed_messages(client, message):
+    with client.websocket_connect("/api/jobs/ws") as ws:
+        ws.send_text(message)
+        event = ws.receive_json()
+        assert event["type"] == "error"
+        assert event["detail"].startswith("Invalid message")
+
+        # The socket keeps serving well-formed messages
+        job = create_job("detection", "rexomni", {})
+        ws.send_json({"subscribe": [job["id"]]})
+        assert ws.receive_json()["type"] == "snapshot"
+
+
+def test_event_stream_ends_with_finished_job(client):
+    job = create_job("detection", "rexomni", {})
+    update_job(job["id"], status="completed")
+    with client.stream("GET", f"/api/jobs/events?ids={job['id']}") as response:
+        body = "".join(response.iter_text())
+    assert body.startswith("event: snapshot")
+    assert '"status": "completed"' in body
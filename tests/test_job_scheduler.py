@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers.jobs import router
+from app.services import job_runner
+from app.services.job_manager import ARTIFACT_ROOT
+from app.services.job_scheduler import JobScheduler, QueueFullError, _parse_workers
+from conftest import make_image
+
+
+def test_parse_workers():
+    assert _parse_workers("florence=4, rexomni=0,bogus") == {"florence": 4, "rexomni": 1}
+
+
+def test_lanes_run_independently_and_reject_when_full():
+    scheduler = JobScheduler(max_queue=2, lane_workers={"slow": 1, "fast": 1})
+    release = threading.Event()
+    started = threading.Event()
+    done = threading.Event()
+
+    def block(job_id):
+        started.set()
+        release.wait(5)
+
+    scheduler.submit("slow", "running", block)
+    assert started.wait(5)
+    # The busy worker holds the lane; two more fit in its queue
+    assert scheduler.submit("slow", "q1", block) == 1
+    assert scheduler.submit("slow", "q2", block) == 2
+    assert scheduler.position("slow", "q2") == 2
+    with pytest.raises(QueueFullError) as exc_info:
+        scheduler.submit("slow", "q3", block)
+    assert exc_info.value.lane == "slow" and exc_info.value.depth == 2
+
+    # Another model's lane is not held up
+    scheduler.submit("fast", "other", lambda job_id: done.set())
+    assert done.wait(5)
+
+    stats = scheduler.stats("slow")
+    assert (stats["queue_depth"], stats["running"], stats["max_queue"]) == (2, 1, 2)
+    release.set()
+
+
+def test_stats_for_unused_lane():
+    stats = JobScheduler(max_queue=3, default_workers=2, lane_workers={}).stats("idle")
+    assert stats["workers"] == 2 and stats["queue_depth"] == 0 and stats["max_queue"] == 3
+
+
+def test_full_lane_answers_429_and_leaves_no_job(monkeypatch):
+    monkeypatch.setattr(job_runner, "scheduler", JobScheduler(max_queue=0))
+    before = set(ARTIFACT_ROOT.iterdir()) if ARTIFACT_ROOT.exists() else set()
+
+    app = FastAPI()
+    app.include_router(router)
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/jobs",
+            files={"file": ("image.png", make_image(), "image/png")},
+            data={"model": "rexomni", "task": "detection"},
+        )
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "5"
+    assert set(ARTIFACT_ROOT.iterdir()) == before
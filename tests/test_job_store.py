@@ -0,0 +1,141 @@
+import os
+import time
+
+import pytest
+
+from app.services import job_manager
+from app.services.job_store import (
+    ARTIFACT_MARKER,
+    LRUJobStore,
+    MemoryJobStore,
+    SQLiteJobStore,
+    create_artifact_dir,
+    evict_expired,
+    sweep_orphans,
+)
+
+
+def make_job(job_id, status="queued", created_at=None):
+    return {"id": job_id, "status": status, "created_at": created_at or time.time(), "progress": 0}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_put_get_update_delete(store):
+    store.put(make_job("a"))
+    assert store.update("a", status="running")["status"] == "running"
+    assert store.get("a")["status"] == "running"
+    assert store.update("missing", status="running") is None
+    store.delete("a")
+    assert store.get("a") is None
+
+
+def test_sqlite_records_survive_reopen(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    SQLiteJobStore(path).put(make_job("a", status="running"))
+    reopened = SQLiteJobStore(path)
+    assert reopened.get("a")["status"] == "running"
+    assert reopened.unfinished() == ["a"]
+
+
+def test_ttl_evicts_only_old_finished_jobs(store, tmp_path):
+    old = time.time() - 100
+    store.put(make_job("old-done", "completed", old))
+    store.put(make_job("old-running", "running", old))
+    store.put(make_job("new-done", "failed"))
+    (tmp_path / "old-done").mkdir()
+
+    assert evict_expired(store, tmp_path, ttl=50) == ["old-done"]
+    assert store.get("old-done") is None
+    assert not (tmp_path / "old-done").exists()
+    assert store.get("old-running") and store.get("new-done")
+
+
+def test_lru_keeps_recent_records_hot_and_writes_through():
+    backend = MemoryJobStore()
+    store = LRUJobStore(backend, capacity=2)
+    for job_id in ("a", "b", "c"):
+        store.put(make_job(job_id))
+
+    assert list(store._cache) == ["b", "c"]
+    # Evicted from the cache, still served from the backend
+    assert store.get("a")["id"] == "a"
+    assert list(store._cache) == ["c", "a"]
+
+    store.update("c", status="completed")
+    assert backend.get("c")["status"] == "completed"
+    # Returned records are copies
+    store.get("c")["status"] = "mutated"
+    assert store.get("c")["status"] == "completed"
+
+
+def test_orphan_dirs_are_swept_after_grace(tmp_path):
+    store = MemoryJobStore()
+    other = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    store.put(make_job("kept"))
+    for name in ("kept", "orphan", "fresh-orphan"):
+        create_artifact_dir(store, tmp_path, name)
+    create_artifact_dir(other, tmp_path, "other-store")
+    (tmp_path / "sample").mkdir()
+    (tmp_path / "dead-worker").mkdir()
+    (tmp_path / "dead-worker" / ARTIFACT_MARKER).write_text("memory:elsewhere:1")
+    past = time.time() - 100
+    for name in ("kept", "orphan", "other-store", "sample", "dead-worker"):
+        os.utime(tmp_path / name, (past, past))
+
+    assert sweep_orphans(store, tmp_path, grace=50) == ["orphan"]
+    # Unmarked dirs and dirs of other (or unverifiable) stores are left alone
+    for name in ("kept", "fresh-orphan", "other-store", "sample", "dead-worker"):
+        assert (tmp_path / name).exists()
+    assert (tmp_path / "jobs.sqlite3").exists()
+
+
+def test_dirs_of_exited_memory_store_workers_are_swept(tmp_path, monkeypatch):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr("app.services.job_store.worker_alive", lambda worker: worker != "host:1")
+    for name, owner in (("dead", "memory:host:1"), ("alive", "memory:host:2")):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / ARTIFACT_MARKER).write_text(owner)
+        os.utime(tmp_path / name, (time.time() - 100,) * 2)
+
+    assert sweep_orphans(store, tmp_path, grace=50) == ["dead"]
+
+
+def test_progress_writes_are_throttled_but_always_published(monkeypatch):
+    published = []
+    monkeypatch.setattr(job_manager, "PROGRESS_INTERVAL", 60.0)
+    monkeypatch.setattr(job_manager.job_events, "publish", lambda job_id, kind, **data: published.append(data))
+
+    job = job_manager.create_job("caption", "florence", {})
+    job_manager.mark_running(job["id"])
+    for tokens in (10, 50, 90):
+        job_manager.update_progress(job["id"], {"tokens": tokens, "max_new_tokens": 100})
+
+    assert [event["progress"] for event in published if "tokens" in event] == [27, 59, 91]
+    # Only the first report reached the store inside the interval
+    assert job_manager.get_job(job["id"])["generation"]["tokens"] == 10
+
+    job_manager.save_result(job["id"], {"artifacts": []})
+    assert job["id"] not in job_manager._progress_state
+
+
+def test_recovery_fails_only_jobs_of_dead_workers(monkeypatch):
+    monkeypatch.setattr(job_manager, "worker_alive", lambda worker: worker == "host:alive")
+    alive = job_manager.create_job("caption", "florence", {})
+    job_manager.job_store.update(alive["id"], worker="host:alive")
+    dead = job_manager.create_job("caption", "florence", {})
+    job_manager.job_store.update(dead["id"], worker="host:dead")
+    # Left by an earlier process that had this worker's pid
+    stale = job_manager.create_job("caption", "florence", {})
+
+    interrupted = job_manager.recover_jobs()
+
+    assert set(interrupted) >= {dead["id"], stale["id"]}
+    assert alive["id"] not in interrupted
+    assert job_manager.get_job(alive["id"])["status"] == "queued"
+    assert job_manager.get_job(dead["id"])["error"] == "Interrupted by server restart"
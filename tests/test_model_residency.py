@@ -0,0 +1,49 @@
+import threading
+
+from inference.registry.base_adapter import BaseModelAdapter
+from inference.registry.model_residency import ModelResidency
+from inference.registry.model_types import ModelType
+
+
+class FakeAdapter(BaseModelAdapter):
+
+    def run(self, task, image_bytes, **kwargs):
+        return {}
+
+
+def make_residency():
+    residency = ModelResidency(idle_unload_seconds=0)
+    residency.register(ModelType.REXOMNI, lambda: FakeAdapter)
+    return residency
+
+
+def test_held_model_is_not_unloaded():
+    residency = make_residency()
+    with residency.use(ModelType.REXOMNI) as adapter:
+        assert isinstance(adapter, FakeAdapter)
+        assert not residency.unload(ModelType.REXOMNI)
+    assert residency.unload(ModelType.REXOMNI)
+
+
+def test_reference_is_taken_under_the_lock_unload_holds():
+    residency = make_residency()
+    residency.get(ModelType.REXOMNI)
+    entered = threading.Event()
+
+    def _use():
+        with residency.use(ModelType.REXOMNI):
+            entered.set()
+
+    # An unload in progress: use() must wait for it instead of returning the
+    # adapter it is dropping
+    with residency._load_locks[ModelType.REXOMNI]:
+        thread = threading.Thread(target=_use)
+        thread.start()
+        assert not entered.wait(0.1)
+        residency._adapters.pop(ModelType.REXOMNI)
+    thread.join(5)
+
+    assert entered.is_set()
+    # use() loaded a fresh adapter rather than holding the dropped one
+    assert residency.is_loaded(ModelType.REXOMNI)
+    assert residency._refs[ModelType.REXOMNI] == 0
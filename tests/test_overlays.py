@@ -0,0 +1,58 @@
+import os
+
+from app.services.overlays import OverlayCache
+
+
+def write_overlay(root, job_id, name, size, mtime):
+    path = root / job_id / f"{name}.png"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_overlays_on_disk_are_tracked_at_startup(tmp_path):
+    old = write_overlay(tmp_path, "a", "overlay", 10, 1_000)
+    new = write_overlay(tmp_path, "b", "caption_overlay", 10, 2_000)
+    (tmp_path / "b" / "mask.png").write_bytes(b"m" * 50)
+
+    cache = OverlayCache(max_bytes=100, root=tmp_path)
+    assert cache.stats()["files"] == 2
+    assert cache.stats()["bytes"] == 20
+
+    # Over budget at startup: the least recently modified file goes first
+    cache = OverlayCache(max_bytes=15, root=tmp_path)
+    assert not old.exists() and new.exists()
+    assert cache.stats()["evictions"] == 1
+
+
+def test_read_serves_bytes_and_stat(tmp_path):
+    write_overlay(tmp_path, "a", "overlay", 7, 1_000)
+    cache = OverlayCache(max_bytes=100, root=tmp_path)
+
+    content, stat = cache.read({"id": "a"}, "overlay")
+    assert content == b"x" * 7
+    assert stat.st_size == 7
+    assert cache.stats()["hits"] == 1
+
+
+def test_read_redraws_a_file_evicted_after_lookup(tmp_path, monkeypatch):
+    path = write_overlay(tmp_path, "a", "overlay", 7, 1_000)
+    cache = OverlayCache(max_bytes=100, root=tmp_path)
+    original_get = cache.get
+    lookups = []
+
+    def get_then_evict(job, name):
+        found = original_get(job, name)
+        if not lookups:
+            # Another request evicts the file before this one opens it
+            found.unlink()
+        lookups.append(found)
+        return found
+
+    monkeypatch.setattr(cache, "get", get_then_evict)
+    monkeypatch.setattr(cache, "_render", lambda job, name, target: target.write_bytes(b"redrawn"))
+
+    content, _ = cache.read({"id": "a"}, "overlay")
+    assert content == b"redrawn"
+    assert lookups == [path, path]
@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from app.services import responses
+from app.services.responses import check_mode, result_response
+
+
+def test_default_mode_is_the_legacy_image_body():
+    assert check_mode(None) == "image"
+    assert check_mode("multipart") == "multipart"
+    with pytest.raises(ValueError):
+        check_mode("xml")
+
+
+def test_image_mode_keeps_results_in_the_header():
+    response = result_response("image", {"results": [{"label": "a"}]}, b"jpeg", "image/jpeg", "X-Rex-Detections")
+    assert response.media_type == "image/jpeg"
+    assert json.loads(response.headers["x-rex-detections"]) == [{"label": "a"}]
+
+
+def test_json_mode_references_a_stored_render():
+    response = result_response("json", {"results": []}, b"jpeg", "image/jpeg", "X-Rex-Detections")
+    body = json.loads(response.body)
+    render_id = body["image"]["url"].rsplit("/", 1)[1]
+    assert responses.render_store.get(render_id) == (b"jpeg", "image/jpeg")
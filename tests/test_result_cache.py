@@ -0,0 +1,40 @@
+from inference.result_cache import ResultCache, make_key
+
+
+def test_key_changes_with_model_configuration(monkeypatch):
+    monkeypatch.delenv("REXOMNI_WORKING_MAX_SIDE", raising=False)
+    base = make_key(b"img", "detection", "rexomni", categories=["cat"])
+    assert make_key(b"img", "detection", "rexomni", categories=["cat"]) == base
+
+    monkeypatch.setenv("REXOMNI_WORKING_MAX_SIDE", "1024")
+    assert make_key(b"img", "detection", "rexomni", categories=["cat"]) != base
+    monkeypatch.delenv("REXOMNI_WORKING_MAX_SIDE")
+    monkeypatch.setenv("REXOMNI_BACKEND", "vllm")
+    assert make_key(b"img", "detection", "rexomni", categories=["cat"]) != base
+
+
+def test_florence_key_follows_default_profile(monkeypatch):
+    monkeypatch.delenv("FLORENCE_PROFILE", raising=False)
+    base = make_key(b"img", "caption", "florence")
+    monkeypatch.setenv("FLORENCE_PROFILE", "fast")
+    assert make_key(b"img", "caption", "florence") != base
+    # Another model's settings do not matter
+    monkeypatch.setenv("REXOMNI_BACKEND", "vllm")
+    assert make_key(b"img", "caption", "florence") == make_key(b"img", "caption", "florence", config=None)
+
+
+def test_disk_tier_round_trips_json_with_bytes(tmp_path):
+    value = {"results": {"<OD>": {"bboxes": [[1.0, 2.0, 3.0, 4.0]], "labels": ["a"]}}, "image_bytes": b"\x89PNG"}
+    ResultCache(directory=str(tmp_path), enabled=True).put("ab" * 32, value)
+
+    assert list(tmp_path.glob("*/*.json"))
+    fresh = ResultCache(directory=str(tmp_path), enabled=True)
+    assert fresh.get("ab" * 32) == value
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_values_json_cannot_hold_stay_in_memory_only(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), enabled=True)
+    cache.put("ef" * 32, {"results": object()})
+    assert cache.get("ef" * 32) is not None
+    assert not list(tmp_path.glob("*/*.json"))
@@ -0,0 +1,151 @@
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers.jobs import _rexomni_params, router
+from app.services.job_manager import ARTIFACT_ROOT
+from conftest import make_image
+from inference.registry.model_registry import ModelType, TaskType
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    with TestClient(app) as client:
+        yield client
+
+
+def wait_for(client, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def submit(client, image, **form):
+    response = client.post("/api/jobs", files={"file": ("image.png", image, "image/png")}, data={"model": "rexomni", **form})
+    assert response.status_code == 200, response.text
+    return response.json()["job_id"]
+
+
+def test_detection_job_completes(client):
+    job_id = submit(client, make_image(80, 40), task="detection", categories=["car", "dog"])
+    job = wait_for(client, job_id)
+    assert job["status"] == "completed", job["error"]
+
+    result = client.get(f"/api/jobs/{job_id}/result").json()
+    annotations = result["annotations"]["results"]
+    assert sorted(annotations["labels"]) == ["car", "dog"]
+    assert annotations["bboxes"][0] == [20.0, 10.0, 60.0, 30.0]
+
+
+def test_frontend_csv_categories_are_split(client):
+    # The web UI sends all categories in one comma-separated field
+    job_id = submit(client, make_image(80, 40), task="detection", categories="car, dog")
+    assert wait_for(client, job_id)["status"] == "completed"
+    annotations = client.get(f"/api/jobs/{job_id}/result").json()["annotations"]["results"]
+    assert sorted(annotations["labels"]) == ["car", "dog"]
+
+
+def test_florence_tasks_ignore_categories():
+    assert _rexomni_params(TaskType.OPEN_VOCAB_DETECTION, ModelType.FLORENCE, {"categories": ["car,dog"]}) == {}
+
+
+def test_keypoint_job_forwards_keypoint_type_and_categories(client):
+    job_id = submit(client, make_image(100, 100), task="keypoint", keypoint_type="hand", categories=["left hand"])
+    job = wait_for(client, job_id)
+    assert job["status"] == "completed", job["error"]
+
+    results = client.get(f"/api/jobs/{job_id}/result").json()["annotations"]["results"]
+    assert [r["label"] for r in results] == ["left hand"]
+    assert results[0]["keypoints"]["nose"] == [50.0, 35.0]
+
+
+def test_keypoint_job_defaults_categories_from_keypoint_type(client):
+    job_id = submit(client, make_image(), task="keypoint", keypoint_type="animal")
+    assert wait_for(client, job_id)["status"] == "completed"
+    results = client.get(f"/api/jobs/{job_id}/result").json()["annotations"]["results"]
+    assert [r["label"] for r in results] == ["animal"]
+
+
+def test_visual_prompting_job(client):
+    job_id = submit(client, make_image(), task="visual_prompting", visual_prompt_boxes="[[1, 2, 30, 40]]", categories=["cup"])
+    job = wait_for(client, job_id)
+    assert job["status"] == "completed", job["error"]
+    results = client.get(f"/api/jobs/{job_id}/result").json()["annotations"]["results"]
+    assert results == [{"label": "cup", "bbox": [1.0, 2.0, 30.0, 40.0], "score": 1.0}]
+
+
+def test_multi_job_with_rexomni_params(client):
+    response = client.post(
+        "/api/jobs/multi",
+        files={"file": ("image.png", make_image(), "image/png")},
+        data={
+            "model": "rexomni",
+            # The same task twice, with different prompts
+            "tasks": '[{"task": "detection", "categories": ["cat"]},'
+                     ' {"task": "detection_keypoint", "categories": ["person"], "max_boxes": 1},'
+                     ' {"task": "detection", "categories": ["dog"]}]',
+        },
+    )
+    assert response.status_code == 200, response.text
+    job = wait_for(client, response.json()["job_id"])
+    assert job["status"] == "completed", job["error"]
+
+    results = client.get(f"/api/jobs/{job['id']}/result").json()["annotations"]["results"]
+    assert [step["task"] for step in results] == ["detection", "detection_keypoint", "detection"]
+    assert results[0]["results"]["labels"] == ["cat"]
+    assert len(results[1]["results"][0]["persons"]) == 1
+    assert results[2]["results"]["labels"] == ["dog"]
+    # Stored per step, so repeated tasks don't overwrite each other
+    job_dir = ARTIFACT_ROOT / job["id"]
+    assert json.loads((job_dir / "2_annotations.json").read_text())["results"][0]["label"] == "dog"
+
+
+@pytest.mark.parametrize("form, detail", [
+    ({"task": "visual_prompting"}, "visual_prompt_boxes is required"),
+    ({"task": "visual_prompting", "visual_prompt_boxes": "[[1, 2, 3]]"}, "[x0, y0, x1, y1]"),
+    ({"task": "visual_prompting", "visual_prompt_boxes": "not json"}, "valid JSON"),
+    ({"task": "detection", "keypoint_type": "hand"}, "does not take keypoint_type"),
+    ({"task": "detection_keypoint", "crop_padding": "2"}, "between 0 and 1"),
+    ({"task": "detection_keypoint", "max_boxes": "0"}, "positive integer"),
+])
+def test_invalid_rexomni_params_rejected(client, form, detail):
+    response = client.post("/api/jobs", files={"file": ("image.png", make_image(), "image/png")}, data={"model": "rexomni", **form})
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+
+def test_concurrent_jobs_are_batched_into_one_engine_call(client):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from inference.registry.model_registry import ModelType
+    from inference.registry.model_residency import residency
+
+    # Load up front so every job hits the same long-lived engine
+    stub = residency.get(ModelType.REXOMNI).service.model.model
+    calls, images = stub.calls, stub.images
+
+    sizes = [(40 + 8 * i, 40) for i in range(4)]
+    with ThreadPoolExecutor(len(sizes)) as pool:
+        job_ids = list(pool.map(
+            lambda size: submit(client, make_image(*size), task="detection", categories=["box"]),
+            sizes,
+        ))
+
+    for job_id, (width, height) in zip(job_ids, sizes):
+        job = wait_for(client, job_id)
+        assert job["status"] == "completed", job["error"]
+        bboxes = client.get(f"/api/jobs/{job_id}/result").json()["annotations"]["results"]["bboxes"]
+        # Each job gets the prediction for its own image back
+        assert bboxes == [[width * 0.25, height * 0.25, width * 0.75, height * 0.75]]
+
+    assert stub.images - images == len(sizes)
+    assert stub.calls - calls < len(sizes)